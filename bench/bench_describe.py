@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""Benchmarks GCC-XML class description time against the number of class
+members and the size of the XML tree.  Synthetic GCC-XML is used so that
+gccxml itself need not be installed.  The index is built once per tree, so
+describe times should grow with the member count and stay flat as unrelated
+padding is added to the tree.
+
+usage: python bench/bench_describe.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from xdress import autodescribe as ad
+from synthgccxml import gccxml_string
+
+
+def time_describe(nmembers, npadding, repeat=3):
+    """Returns (index build time, best describe time) in seconds."""
+    xml = gccxml_string(nmembers=nmembers, npadding=npadding)
+    root = ad.etree.ElementTree(ad.etree.fromstring(xml))
+    t0 = time.time()
+    index = ad.GccxmlIndex(root)
+    tindex = time.time() - t0
+    best = None
+    for i in range(repeat):
+        t0 = time.time()
+        describer = ad.GccxmlClassDescriber('Target', root, onlyin='target.h',
+                                            index=index)
+        describer.visit()
+        t = time.time() - t0
+        best = t if best is None else min(best, t)
+    assert len(describer.desc['attrs']) == (nmembers + 1) // 2
+    return tindex, best
+
+
+def main():
+    print "{0:>8} {1:>8} {2:>12} {3:>12}".format("members", "padding",
+                                                 "index [s]", "describe [s]")
+    for nmembers in (10, 100, 1000):
+        for npadding in (1000, 10000, 100000):
+            tindex, tdesc = time_describe(nmembers, npadding)
+            print "{0:>8} {1:>8} {2:>12.5f} {3:>12.5f}".format(nmembers, npadding,
+                                                               tindex, tdesc)
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
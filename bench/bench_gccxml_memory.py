@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""Reports the peak resident set size (RSS) of loading a large synthetic
+GCC-XML file whole versus with the streaming, file-filtered loader.  Each
+measurement runs in a fresh subprocess so that the peaks do not mix.
+
+usage: python bench/bench_gccxml_memory.py [npadding]
+"""
+import os
+import sys
+import time
+import resource
+import tempfile
+import subprocess
+
+BENCHDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHDIR, '..'))
+
+from synthgccxml import gccxml_string
+
+
+def child(mode, filename):
+    """Loads, indexes and describes the file, then prints peak RSS [MiB]
+    and wall time [s]."""
+    from xdress import autodescribe as ad
+    t0 = time.time()
+    onlyin = set(['target.cpp', 'target.h'])
+    root = ad.gccxml_parse(filename, onlyin=(onlyin if mode == 'reduced' else None))
+    tu = ad.GccxmlTranslationUnit('target.cpp', root=root)
+    desc = tu.describe('Target', 'class')
+    assert 0 < len(desc['attrs'])
+    t = time.time() - t0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print rss, t
+
+
+def measure(mode, filename):
+    out = subprocess.check_output([sys.executable, __file__, '--child', mode,
+                                   filename])
+    rss, t = map(float, out.split())
+    return rss, t
+
+
+def main():
+    npadding = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.NamedTemporaryFile(suffix='.xml') as f:
+        xml = gccxml_string(nmembers=100, npadding=npadding, filename='target.h')
+        xml = xml.replace('<File id="f2"', '<File id="f0" name="target.cpp"/>\n'
+                                           '  <File id="f2"')
+        f.write(xml)
+        f.flush()
+        size = len(xml) / 2.0**20
+        del xml
+        print "synthetic GCC-XML: {0} padding classes, {1:.1f} MiB".format(npadding,
+                                                                          size)
+        print "{0:>10} {1:>14} {2:>10}".format("loader", "peak RSS [MiB]", "time [s]")
+        for mode in ('full', 'reduced'):
+            rss, t = measure(mode, f.name)
+            print "{0:>10} {1:>14.1f} {2:>10.2f}".format(mode, rss, t)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+"""Benchmarks the wall time and peak memory of the describe, typesystem,
+cythongen and stlwrap stages of xdress on synthetic C++ projects of growing
+size.  By default the GCC-XML output is read from fixtures written along with
+the project, so that GCC-XML need not be installed; pass --gccxml to run it
+for real.  Each size runs in a fresh subprocess.
+
+For each stage the scaling exponent between consecutive sizes is reported,
+i.e. log(t2 / t1) / log(n2 / n1), which is about 1 for stages that are linear
+in the number of classes.  With --check, the exit status is nonzero when any
+exponent exceeds the given limit, which catches superlinear regressions.
+
+usage: python bench/bench_generator.py [-n 10 40 160] [-m METHODS] [-k STL]
+                                       [-d DEPTH] [-p PADDING] [--gccxml]
+                                       [--json FILE] [--check LIMIT]
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+BENCHDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHDIR, '..'))
+
+from synthproject import SynthProject, fixture_path
+
+STAGES = ('describe', 'typesystem', 'cythongen', 'stlwrap')
+
+
+def _peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _types(x, types):
+    """Adds every type found in a description to types."""
+    for key, rtn in x['methods'].items():
+        for arg in key[1:]:
+            types.add(arg[1])
+        if rtn is not None:
+            types.add(rtn)
+    types.update(x['attrs'].values())
+    return types
+
+
+def child(ns):
+    """Runs the stages on one project size and prints the results as JSON."""
+    from xdress import main, autodescribe as ad, typesystem as ts, stlwrap
+    from xdress.cythongen import gencpppxd, genpxd, genpyx
+
+    class FixtureTranslationUnit(ad.GccxmlTranslationUnit):
+        """Reads recorded GCC-XML output rather than running GCC-XML."""
+        def __init__(self, filename, xmlfile):
+            super(FixtureTranslationUnit, self).__init__(filename)
+            self.xmlfile = xmlfile
+
+        def parse(self):
+            self._root = ad.gccxml_parse(self.xmlfile, onlyin=self.onlyin)
+            self._index = None
+
+    project = SynthProject(nclasses=ns.nclasses[0], nmethods=ns.methods,
+                           nstl=ns.stl, depth=ns.depth, npadding=ns.padding)
+    projdir = tempfile.mkdtemp()
+    results = {'nclasses': project.nclasses, 'peak_rss_start': _peak_rss()}
+    try:
+        project.write(projdir, fixtures=not ns.gccxml)
+        os.chdir(projdir)
+        rc = dict(main.defaultrc)
+        execfile('xdressrc.py', rc, rc)
+        rc = argparse.Namespace(includes=[], **rc)
+        rc.builddir = 'build'
+        xdns = argparse.Namespace(includes=[], verbose=False)
+        main.cache = main.DescriptionCache(os.path.join('build', 'desccache'))
+        for i, (name, srcname) in enumerate(rc.classes):
+            cpp = os.path.join(rc.sourcedir, srcname + '.cpp')
+            main.pysrcenv[srcname] = {}
+            if not ns.gccxml:
+                tu = FixtureTranslationUnit(cpp, fixture_path('.', i))
+                main.cache.translation_units[cpp, ()] = tu
+
+        # C++ descriptions, including GCC-XML (or reading its output)
+        t0 = time.time()
+        classes, env = {}, {}
+        for name, srcname in rc.classes:
+            desc = classes[name] = main.compute_desc(name, srcname, srcname, 'class',
+                                                     xdns, rc)
+            main._adddesc2env(desc, env, name, srcname, srcname)
+        main.cache.translation_units.clear()
+        results['describe'] = (time.time() - t0, _peak_rss())
+
+        # registering and converting every type used
+        t0 = time.time()
+        for t in rc.stlcontainers:
+            if t[0] == 'vector':
+                ts.register_numpy_dtype(t[1])
+        for name, srcname in rc.classes:
+            main.register_class_type(name, srcname, srcname, rc)
+        types = set()
+        for desc in classes.values():
+            _types(desc, types)
+        for t in sorted(types, key=repr):
+            ts.canon(t)
+            ts.cython_ctype(t)
+            ts.cython_cytype(t)
+            ts.cython_pytype(t)
+            ts.cython_cimport_tuples(t)
+            ts.cython_import_tuples(t)
+            ts.cython_c2py('x', t)
+            ts.cython_py2c('x', t)
+        results['typesystem'] = (time.time() - t0, _peak_rss())
+
+        # code generation, starting from cold memos as in a real run
+        ts.clearmemo()
+        t0 = time.time()
+        cpppxds = gencpppxd(env)
+        pxds = genpxd(env)
+        pyxs = genpyx(env, classes)
+        results['cythongen'] = (time.time() - t0, _peak_rss())
+        results['nbytes'] = sum(map(len, cpppxds.values() + pxds.values() +
+                                    pyxs.values()))
+
+        t0 = time.time()
+        stlwrap.genpyx(rc.stlcontainers)
+        stlwrap.genpxd(rc.stlcontainers)
+        stlwrap.gentest(rc.stlcontainers, package=rc.package)
+        results['stlwrap'] = (time.time() - t0, _peak_rss())
+    finally:
+        shutil.rmtree(projdir)
+    print json.dumps(results)
+
+
+def measure(ns, nclasses):
+    args = [sys.executable, __file__, '--child', '-n', str(nclasses),
+            '-m', str(ns.methods), '-k', str(ns.stl), '-d', str(ns.depth),
+            '-p', str(ns.padding)]
+    if ns.gccxml:
+        args.append('--gccxml')
+    return json.loads(subprocess.check_output(args).splitlines()[-1])
+
+
+def exponents(runs, mintime=0.05):
+    """Scaling exponents of each stage between consecutive runs.  These are
+    None where the stage is too quick to time reliably."""
+    exps = []
+    for a, b in zip(runs[:-1], runs[1:]):
+        r = float(b['nclasses']) / a['nclasses']
+        exp = {}
+        for stage in STAGES:
+            ta, tb = a[stage][0], b[stage][0]
+            if tb < mintime or ta <= 0.0:
+                exp[stage] = None
+            else:
+                exp[stage] = math.log(tb / ta) / math.log(r)
+        exps.append(exp)
+    return exps
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmarks xdress on synthetic projects")
+    parser.add_argument('-n', dest='nclasses', type=int, nargs='+',
+                        default=[10, 40, 160], help="numbers of classes")
+    parser.add_argument('-m', dest='methods', type=int, default=20,
+                        help="methods per class")
+    parser.add_argument('-k', dest='stl', type=int, default=4,
+                        help="number of STL container types")
+    parser.add_argument('-d', dest='depth', type=int, default=3,
+                        help="inheritance depth")
+    parser.add_argument('-p', dest='padding', type=int, default=2000,
+                        help="unrelated classes in each GCC-XML file")
+    parser.add_argument('--gccxml', action='store_true', default=False,
+                        help="run GCC-XML rather than reading fixtures")
+    parser.add_argument('--json', dest='json', default=None,
+                        help="file to write the results to")
+    parser.add_argument('--check', dest='check', type=float, default=None,
+                        help="fail if a scaling exponent exceeds this")
+    parser.add_argument('--child', action='store_true', default=False,
+                        help=argparse.SUPPRESS)
+    ns = parser.parse_args()
+    if ns.child:
+        child(ns)
+        return
+
+    print "{0} methods, {1} STL types, depth {2}, {3} padding classes, {4}".format(
+          ns.methods, ns.stl, ns.depth, ns.padding,
+          "GCC-XML" if ns.gccxml else "fixtures")
+    print "{0:>8} ".format("classes") + " ".join(["{0:>12} {1:>9}".format(
+          stage + " [s]", "RSS [MiB]") for stage in STAGES])
+    runs = []
+    for nclasses in ns.nclasses:
+        run = measure(ns, nclasses)
+        runs.append(run)
+        print "{0:>8} ".format(nclasses) + " ".join(["{0:>12.3f} {1:>9.1f}".format(
+              *run[stage]) for stage in STAGES])
+        sys.stdout.flush()
+    exps = exponents(runs)
+    print "\nscaling exponents (1 is linear):"
+    for a, b, e in zip(runs[:-1], runs[1:], exps):
+        print "{0:>8} ".format("{0}->{1}".format(a['nclasses'], b['nclasses'])) + \
+              " ".join(["{0:>22}".format('-' if e[stage] is None else
+                                         "{0:.2f}".format(e[stage]))
+                        for stage in STAGES])
+    if ns.json is not None:
+        with open(ns.json, 'w') as f:
+            json.dump({'params': {'methods': ns.methods, 'stl': ns.stl,
+                                  'depth': ns.depth, 'padding': ns.padding,
+                                  'gccxml': ns.gccxml},
+                       'runs': runs, 'exponents': exps}, f, indent=1)
+    if ns.check is not None:
+        worst = max([x for e in exps for x in e.values() if x is not None] or [0.0])
+        if worst > ns.check:
+            print "FAILED: scaling exponent {0:.2f} exceeds {1}".format(worst,
+                                                                       ns.check)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""Times generating the STL container wrappers for the container list of
+tests/xdressrc.py.  The type system memos are cleared before each repeat so
+that every conversion, and every registry lookup beneath it, is computed
+afresh, as in a single xdress run.
+
+usage: python bench/bench_stlwrap.py [-r REPEAT] [--rc RCFILE]
+"""
+import os
+import sys
+import time
+import argparse
+
+BENCHDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHDIR, '..'))
+
+from xdress import typesystem as ts
+from xdress import stlwrap
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmarks the STL container wrappers")
+    parser.add_argument('-r', dest='repeat', type=int, default=10,
+                        help="number of repeats")
+    parser.add_argument('--rc', dest='rc', default=os.path.join(BENCHDIR, '..',
+                        'tests', 'xdressrc.py'), help="run control file")
+    ns = parser.parse_args()
+    rc = {}
+    execfile(ns.rc, rc, rc)
+    ts.EXTRA_TYPES = rc['extra_types']
+    ts.STLCONTAINERS = rc['stlcontainers_module']
+    template = rc['stlcontainers']
+    for t in template:
+        if t[0] == 'vector':
+            ts.register_numpy_dtype(t[1])
+
+    print "{0} containers, best of {1}".format(len(template), ns.repeat)
+    print "{0:>10} {1:>10}".format("stage", "time [ms]")
+    for name, f in [('genpyx', lambda: stlwrap.genpyx(template)),
+                    ('genpxd', lambda: stlwrap.genpxd(template)),
+                    ('gentest', lambda: stlwrap.gentest(template,
+                                                        package=rc['package']))]:
+        times = []
+        for i in range(ns.repeat):
+            ts.clearmemo()
+            t0 = time.time()
+            f()
+            times.append(time.time() - t0)
+        print "{0:>10} {1:>10.2f}".format(name, min(times) * 1e3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""Times the type system conversions that code generation makes for every
+argument and return type, in the default type system, with a fork of it
+entered, and from a thread while the default type system is current.  Each
+is timed cold, right after the memos are cleared, and warm, when every call
+is a memo hit.
+
+usage: python bench/bench_typesystem.py [-r REPEAT] [-n NTYPES]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+BENCHDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHDIR, '..'))
+
+from xdress import typesystem as ts
+
+BASES = ['int32', 'float64', 'float32', 'str', 'bool', 'char']
+
+
+def types(n):
+    """Returns n distinct types built from the base types and containers."""
+    rtn = list(BASES)
+    rtn += [('set', t) for t in BASES] + [('vector', t) for t in BASES]
+    for t in BASES:
+        for u in BASES:
+            rtn += [('map', t, u), ('map', t, ('vector', u))]
+    return rtn[:n]
+
+
+def convert(tys):
+    for t in tys:
+        ts.cython_ctype(t)
+        ts.cython_pytype(t)
+        ts.cython_cimport_tuples(t)
+        ts.cython_import_tuples(t)
+        ts.cython_c2py('x', t)
+        ts.cython_py2c('x', t)
+
+
+def default():
+    return lambda f: f()
+
+
+def entered():
+    fork = ts.current().fork()
+    def run(f):
+        with fork:
+            f()
+    return run
+
+
+def threaded():
+    def run(f):
+        th = threading.Thread(target=f)
+        th.start()
+        th.join()
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmarks the type system contexts")
+    parser.add_argument('-r', dest='repeat', type=int, default=10,
+                        help="number of repeats")
+    parser.add_argument('-n', dest='ntypes', type=int, default=90,
+                        help="number of types")
+    ns = parser.parse_args()
+    ts.EXTRA_TYPES = 'xdress_extra_types'
+    ts.STLCONTAINERS = 'stlcontainers'
+    for t in BASES:
+        ts.register_numpy_dtype(t)
+    tys = types(ns.ntypes)
+
+    print "{0} types, best of {1}".format(len(tys), ns.repeat)
+    print "{0:>10} {1:>10} {2:>10}".format("context", "cold [ms]", "warm [ms]")
+    for name, context in [('default', default), ('entered', entered),
+                          ('threaded', threaded)]:
+        cold, warm = [], []
+        for i in range(ns.repeat):
+            ts.clearmemo()
+            run = context()
+            t0 = time.time()
+            run(lambda: convert(tys))
+            t1 = time.time()
+            run(lambda: convert(tys))
+            cold.append(t1 - t0)
+            warm.append(time.time() - t1)
+        print "{0:>10} {1:>10.2f} {2:>10.2f}".format(name, min(cold) * 1e3,
+                                                     min(warm) * 1e3)
+
+
+if __name__ == '__main__':
+    main()
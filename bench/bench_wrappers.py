@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""Benchmarks the per-call overhead of the extension modules that xdress
+generates, using the xdtest project in tests/.  Build and install it first::
+
+    cd tests && ./run.sh
+
+The cases cover methods and constructors taking and returning scalars,
+strings, sets and maps; property access with cached views (repeated gets)
+and without them (a set before each get, which drops the view); dispatch
+between overloads; and the stlwrap containers (construction, iteration and
+lookup, plus the numpy dtypes for vectors).  xdtest has no methods with
+vector arguments, so vectors are covered through the vector dtypes and maps
+with vector values.
+
+The times are the best of several repeats, in nanoseconds per call.  They are
+written to JSON with --json, along with the xdress and Python versions, and a
+previous JSON file may be given to --compare to report the ratios against it,
+e.g. to track regressions between xdress versions.
+
+usage: python bench/bench_wrappers.py [--sitepath DIR] [-k PATTERN]
+                                      [-r REPEAT] [--json FILE]
+                                      [--compare FILE]
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+import platform
+
+BENCHDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHDIR, '..'))
+
+from xdress.version import xdress_version
+
+SITEPATH = os.path.join(BENCHDIR, '..', 'tests', 'inst', 'lib',
+                        'python{0}.{1}'.format(*sys.version_info[:2]),
+                        'site-packages')
+
+SETUP = """
+import numpy as np
+from xdtest import xdstlc
+from xdtest.fccomp import FCComp
+from xdtest.enrichment import Enrichment
+from xdtest.reprocess import Reprocess, func
+fc = FCComp('fc')
+enr = Enrichment('enr')
+comp = dict([(922350, 0.05), (922380, 0.95), (10010, 1e-6)])
+sepeff = {'U': 0.999, 'PU': 0.99, 'AM': 0.9}
+params = set(['Mass', 'Enrichment', 'SWU'])
+fc.mat_feed = comp
+fc.track_params = params
+ints = range(100)
+strs = [str(i) for i in ints]
+seti = xdstlc.SetInt(ints)
+sets = xdstlc.SetStr(strs)
+mapid = xdstlc.MapIntDouble(dict(zip(ints, map(float, ints))))
+mapsi = xdstlc.MapStrInt(dict(zip(strs, ints)))
+mapivd = xdstlc.MapIntVectorDouble({1: np.arange(10.0)})
+vecd = np.arange(100.0)
+"""
+
+# (group, name, statement)
+CASES = [
+    # methods and constructors
+    ('method', 'scalar args, scalar return', "enr.PoverF(0.0072, 0.05, 0.0025)"),
+    ('method', 'int arg, scalar return', "enr.xP_i(922350)"),
+    ('method', 'no args, int return', "fc.calc()"),
+    ('method', 'str arg constructor', "Enrichment('enr')"),
+    ('method', 'set arg constructor', "FCComp(params, 'fc')"),
+    ('method', 'map arg constructor', "Reprocess(sepeff, 'rep')"),
+    # properties
+    ('property', 'int get', "fc.pass_num"),
+    ('property', 'int set', "fc.pass_num = 1"),
+    ('property', 'double get', "enr.Mstar"),
+    ('property', 'str get', "fc.name"),
+    ('property', 'str set', "fc.name = 'fc'"),
+    ('property', 'map get, cached view', "fc.mat_feed"),
+    ('property', 'map get, no cached view', "fc.mat_feed = comp; fc.mat_feed"),
+    ('property', 'map set', "fc.mat_feed = comp"),
+    ('property', 'map get lookup, cached view', "fc.mat_feed[922350]"),
+    ('property', 'set get, cached view', "fc.track_params"),
+    ('property', 'set get, no cached view', "fc.track_params = params; "
+                                            "fc.track_params"),
+    ('property', 'set set', "fc.track_params = params"),
+    # overloaded dispatch, against the single signature of calc()
+    ('dispatch', 'no args', "func()"),
+    ('dispatch', 'double, int args', "func(1.0, 2)"),
+    ('dispatch', 'str, double args', "func('U', 2.0)"),
+    ('dispatch', 'default arg', "func(1.0)"),
+    ('dispatch', 'constructor, no args', "FCComp()"),
+    ('dispatch', 'constructor, str arg', "FCComp('fc')"),
+    # stlwrap containers
+    ('stlwrap', 'SetInt construct 100', "xdstlc.SetInt(ints)"),
+    ('stlwrap', 'SetInt iterate 100', "for x in seti: pass"),
+    ('stlwrap', 'SetInt contains', "42 in seti"),
+    ('stlwrap', 'SetStr construct 100', "xdstlc.SetStr(strs)"),
+    ('stlwrap', 'SetStr contains', "'42' in sets"),
+    ('stlwrap', 'MapIntDouble construct 100', "xdstlc.MapIntDouble(mapid)"),
+    ('stlwrap', 'MapIntDouble iterate 100', "for x in mapid: pass"),
+    ('stlwrap', 'MapIntDouble lookup', "mapid[42]"),
+    ('stlwrap', 'MapIntDouble setitem', "mapid[42] = 1.0"),
+    ('stlwrap', 'MapStrInt lookup', "mapsi['42']"),
+    ('stlwrap', 'MapStrInt items 100', "mapsi.items()"),
+    ('stlwrap', 'MapIntVectorDouble lookup', "mapivd[1]"),
+    ('stlwrap', 'vector double dtype construct 100',
+                "np.array(vecd, dtype=xdstlc.xd_double)"),
+    ('stlwrap', 'vector str dtype construct 100',
+                "np.array(strs, dtype=xdstlc.xd_str)"),
+    ]
+
+
+def measure(stmt, repeat=5, mintime=0.2):
+    """Best time per call [ns] of a statement, with the number of calls per
+    repeat chosen so that each repeat takes at least mintime seconds."""
+    timer = timeit.Timer(stmt, SETUP)
+    number = 1
+    while True:
+        t = timer.timeit(number)
+        if mintime <= t:
+            break
+        number *= 10 if t < mintime / 10 else 2
+    times = [t] + timer.repeat(repeat - 1, number)
+    return min(times) / number * 1e9, number
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmarks the wrappers generated for xdtest")
+    parser.add_argument('--sitepath', dest='sitepath', default=SITEPATH,
+                        help="directory in which xdtest is installed")
+    parser.add_argument('-k', dest='pattern', default=None,
+                        help="only run cases whose group or name contain this")
+    parser.add_argument('-r', dest='repeat', type=int, default=5,
+                        help="number of repeats of each case")
+    parser.add_argument('--json', dest='json', default=None,
+                        help="file to write the results to")
+    parser.add_argument('--compare', dest='compare', default=None,
+                        help="previous results to compare against")
+    ns = parser.parse_args()
+    sys.path.insert(0, os.path.abspath(ns.sitepath))
+    try:
+        import xdtest.xdstlc
+    except ImportError as e:
+        sys.exit("xdtest could not be imported from {0} ({1}), build it with "
+                 "tests/run.sh first".format(ns.sitepath, e))
+
+    old = {}
+    if ns.compare is not None:
+        with open(ns.compare) as f:
+            old = dict([((r['group'], r['name']), r['ns']) for r in
+                        json.load(f)['results']])
+    print "{0:<10} {1:<36} {2:>12} {3:>10}".format("group", "case", "ns/call",
+          "vs old" if old else "")
+    results = []
+    for group, name, stmt in CASES:
+        if ns.pattern is not None and ns.pattern not in group + ' ' + name:
+            continue
+        t, number = measure(stmt, repeat=ns.repeat)
+        results.append({'group': group, 'name': name, 'stmt': stmt, 'ns': t,
+                        'number': number})
+        ratio = "{0:>10.2f}".format(t / old[group, name]) if (group, name) in old \
+                else ""
+        print "{0:<10} {1:<36} {2:>12.1f} {3}".format(group, name, t, ratio)
+        sys.stdout.flush()
+
+    if ns.json is not None:
+        with open(ns.json, 'w') as f:
+            json.dump({'xdress_version': xdress_version,
+                       'python_version': platform.python_version(),
+                       'platform': platform.platform(),
+                       'results': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
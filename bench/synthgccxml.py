@@ -0,0 +1,96 @@
+"""Generates synthetic GCC-XML output so that the describers may be benchmarked
+without GCC-XML installed.  The generated trees mimic the structure of real
+GCC-XML files: a flat list of id-referenced nodes, a target class living in
+its own header, and an arbitrary amount of unrelated 'padding' nodes (such as
+those which come from including the standard library) in other files.
+"""
+from cStringIO import StringIO
+
+_fundamentals = ['int', 'double', 'float', 'unsigned int', 'char', 'bool']
+
+
+def gccxml_string(nmembers=10, npadding=0, classname='Target',
+                  filename='target.h', nclasses=1):
+    """Returns a string of synthetic GCC-XML output.
+
+    Parameters
+    ----------
+    nmembers : int, optional
+        Number of public members (alternating fields and methods) per target
+        class.
+    npadding : int, optional
+        Number of unrelated classes (each with a field and a method) that live
+        in another file and are never referenced by the target classes.
+    classname : str, optional
+        Name of the target class.  When there are many target classes,
+        they are named classname0, classname1, etc.
+    filename : str, optional
+        Name of the file the target classes live in.
+    nclasses : int, optional
+        Number of target classes.
+
+    Returns
+    -------
+    xml : str
+        GCC-XML document.
+
+    """
+    out = StringIO()
+    w = out.write
+    w('<?xml version="1.0"?>\n<GCC_XML cvs_revision="1.135">\n')
+    ids = iter(xrange(1, 2**62))
+    newid = lambda: '_{0}'.format(next(ids))
+    ns, std = newid(), newid()
+    fund = dict([(f, newid()) for f in _fundamentals])
+    for fname, fid in sorted(fund.items()):
+        w('  <FundamentalType id="{0}" name="{1}" size="32" align="32"/>\n'.format(
+          fid, fname))
+    nsmembers = []
+    # target classes
+    names = [classname] if nclasses == 1 else \
+            [classname + str(i) for i in range(nclasses)]
+    for name in names:
+        cid = newid()
+        nsmembers.append(cid)
+        members = []
+        body = []
+        ctor = newid()
+        members.append(ctor)
+        body.append('  <Constructor id="{0}" name="{1}" context="{2}" '
+                    'access="public" file="f1" line="1"/>\n'.format(ctor, name, cid))
+        for i in range(nmembers):
+            mid = newid()
+            members.append(mid)
+            ftype = fund[_fundamentals[i % len(_fundamentals)]]
+            if i % 2 == 0:
+                body.append('  <Field id="{0}" name="field{1}" type="{2}" '
+                            'context="{3}" access="public" file="f1" line="1"/>\n'\
+                            .format(mid, i, ftype, cid))
+            else:
+                body.append('  <Method id="{0}" name="method{1}" returns="{2}" '
+                            'context="{3}" access="public" file="f1" line="1">\n'
+                            '    <Argument name="x" type="{2}" file="f1" line="1"/>\n'
+                            '    <Argument name="y" type="{4}" default="1" '
+                            'file="f1" line="1"/>\n'
+                            '  </Method>\n'.format(mid, i, ftype, cid, fund['int']))
+        w('  <Class id="{0}" name="{1}" context="{2}" file="f1" line="1" '
+          'members="{3}" bases=""/>\n'.format(cid, name, ns, " ".join(members)))
+        w("".join(body))
+    # padding that lives somewhere else
+    for i in range(npadding):
+        cid, fid, mid = newid(), newid(), newid()
+        w('  <Class id="{0}" name="Pad{1}" context="{2}" file="f2" line="1" '
+          'members="{3} {4}" bases=""/>\n'.format(cid, i, std, fid, mid))
+        w('  <Field id="{0}" name="x" type="{1}" context="{2}" access="public" '
+          'file="f2" line="1"/>\n'.format(fid, fund['double'], cid))
+        w('  <Method id="{0}" name="f" returns="{1}" context="{2}" '
+          'access="public" file="f2" line="1">\n'
+          '    <Argument name="a" type="{1}" file="f2" line="1"/>\n'
+          '  </Method>\n'.format(mid, fund['int'], cid))
+    w('  <Namespace id="{0}" name="::" members="{1}" mangled="_Z2::"/>\n'.format(
+      ns, " ".join(nsmembers + [std])))
+    w('  <Namespace id="{0}" name="std" context="{1}" members=""/>\n'.format(std, ns))
+    w('  <File id="f1" name="{0}"/>\n'.format(filename))
+    w('  <File id="f2" name="/usr/include/c++/bits/padding.h"/>\n')
+    w('</GCC_XML>\n')
+    return out.getvalue()
@@ -0,0 +1,228 @@
+"""Generates synthetic C++ projects for benchmarking xdress, along with the
+GCC-XML output that GCC-XML would produce for them, so that the benchmarks may
+be run without GCC-XML installed.  A project has N classes with M methods each
+whose argument and return types cycle through a few scalar types and K STL
+container types.  Classes inherit from one another in chains of a given depth.
+Each class lives in its own header and source file, and is its own target.
+"""
+import os
+from cStringIO import StringIO
+
+# (C++ spelling, type system spelling)
+SCALARS = [('int', 'int32'), ('double', 'float64'), ('bool', 'bool'),
+           ('std::string', 'str')]
+
+# (C++ spelling, template name, C++ template args, type system spelling)
+STL = [('std::vector<double>', 'vector', ('double',), ('vector', 'float64')),
+       ('std::vector<int>', 'vector', ('int',), ('vector', 'int32')),
+       ('std::set<int>', 'set', ('int',), ('set', 'int32')),
+       ('std::map<int, double>', 'map', ('int', 'double'), ('map', 'int32', 'float64')),
+       ('std::vector<std::string>', 'vector', ('std::string',), ('vector', 'str')),
+       ('std::map<std::string, int>', 'map', ('std::string', 'int'),
+        ('map', 'str', 'int32')),
+       ('std::set<std::string>', 'set', ('std::string',), ('set', 'str')),
+       ('std::map<int, int>', 'map', ('int', 'int'), ('map', 'int32', 'int32')),]
+
+_template_args = {'vector': ('value_type',), 'set': ('key_type',),
+                  'map': ('key_type', 'mapped_type')}
+
+
+class SynthProject(object):
+    """A synthetic C++ project."""
+
+    def __init__(self, nclasses=10, nmethods=10, nstl=4, depth=3, npadding=1000):
+        """Parameters
+        -------------
+        nclasses : int, optional
+            Number of classes.
+        nmethods : int, optional
+            Number of methods per class.
+        nstl : int, optional
+            Number of distinct STL container types used, at most len(STL).
+        depth : int, optional
+            Length of the inheritance chains, 1 means no inheritance.
+        npadding : int, optional
+            Number of unrelated classes, standing in for the bulk of the
+            standard library headers, in each GCC-XML file.
+
+        """
+        self.nclasses = nclasses
+        self.nmethods = nmethods
+        self.stl = STL[:nstl]
+        self.depth = depth
+        self.npadding = npadding
+        self.types = [s[0] for s in SCALARS] + [s[0] for s in self.stl]
+
+    def parent(self, i):
+        """Index of the parent of class i, or None."""
+        return None if i % self.depth == 0 else i - 1
+
+    def ancestors(self, i):
+        """Indices of class i and its ancestors, root first."""
+        chain = [i]
+        while self.parent(chain[-1]) is not None:
+            chain.append(self.parent(chain[-1]))
+        return chain[::-1]
+
+    def signature(self, k):
+        """(return type, argument type) of method k."""
+        return self.types[k % len(self.types)], self.types[(k + 1) % len(self.types)]
+
+    def header(self, i):
+        p = self.parent(i)
+        s = ['#ifndef SYNTH_CLS{0}_H'.format(i), '#define SYNTH_CLS{0}_H'.format(i),
+             '#include <string>', '#include <vector>', '#include <set>',
+             '#include <map>']
+        if p is not None:
+            s.append('#include "cls{0}.h"'.format(p))
+        s.append('')
+        s.append('class C{0}{1} {{'.format(i, '' if p is None else
+                                           ' : public C{0}'.format(p)))
+        s.append('public:')
+        s.append('  C{0}();'.format(i))
+        s.append('  int field0;')
+        s.append('  double field1;')
+        for k in range(self.nmethods):
+            rtn, arg = self.signature(k)
+            s.append('  {0} method{1}({2} x);'.format(rtn, k, arg))
+        s.append('};')
+        s.append('')
+        s.append('#endif')
+        return '\n'.join(s) + '\n'
+
+    def source(self, i):
+        s = ['#include "cls{0}.h"'.format(i), '',
+             'C{0}::C{0}() {{}}'.format(i)]
+        for k in range(self.nmethods):
+            rtn, arg = self.signature(k)
+            s.append('{0} C{1}::method{2}({3} x) {{ return {0}(); }}'.format(rtn, i,
+                                                                           k, arg))
+        return '\n'.join(s) + '\n'
+
+    def rc(self):
+        """Contents of the xdressrc.py run control file."""
+        s = ["package = 'synth'", "sourcedir = 'src'", "packagedir = 'synth'",
+             "stlcontainers = {0!r}".format([t[3] for t in self.stl
+                                             if t[1] != 'vector'] +
+                                            [t[3] for t in self.stl
+                                             if t[1] == 'vector']),
+             "classes = {0!r}".format([('C{0}'.format(i), 'cls{0}'.format(i))
+                                       for i in range(self.nclasses)]),
+             "functions = []"]
+        return '\n'.join(s) + '\n'
+
+    def gccxml(self, i):
+        """The GCC-XML output for the translation unit of class i."""
+        out = StringIO()
+        w = out.write
+        ids = iter(xrange(1, 2**62))
+        newid = lambda: '_{0}'.format(next(ids))
+        w('<?xml version="1.0"?>\n<GCC_XML cvs_revision="1.135">\n')
+        ns, std = newid(), newid()
+        fund = dict([(t, newid()) for t in ('int', 'double', 'bool', 'char', 'void')])
+        for t, tid in sorted(fund.items()):
+            w('  <FundamentalType id="{0}" name="{1}" size="32" align="32"/>\n'.format(
+              tid, t))
+        # std::string
+        strcls, strctor, strtd = newid(), newid(), newid()
+        w('  <Class id="{0}" name="basic_string&lt;char, std::char_traits&lt;char&gt;, '
+          'std::allocator&lt;char&gt; &gt;" context="{1}" file="fs" line="1" '
+          'members="{2}" bases=""/>\n'.format(strcls, std, strctor))
+        w('  <Constructor id="{0}" name="basic_string" context="{1}" access="public" '
+          'file="fs" line="1"/>\n'.format(strctor, strcls))
+        w('  <Typedef id="{0}" name="string" type="{1}" context="{2}" file="fs" '
+          'line="1"/>\n'.format(strtd, strcls, std))
+        types = {'int': fund['int'], 'double': fund['double'], 'bool': fund['bool'],
+                 'std::string': strtd}
+        # STL instantiations
+        for cpp, tname, targs, _ in self.stl:
+            cid, ctor = newid(), newid()
+            tds = [newid() for a in targs]
+            name = '{0}&lt;{1}&gt;'.format(tname, ', '.join(targs)).replace('<',
+                                                                            '&lt;')
+            w('  <Class id="{0}" name="{1}" context="{2}" file="fs" line="1" '
+              'members="{3}" bases=""/>\n'.format(cid, name, std,
+                                                  ' '.join([ctor] + tds)))
+            w('  <Constructor id="{0}" name="{1}" context="{2}" access="public" '
+              'file="fs" line="1"/>\n'.format(ctor, tname, cid))
+            for td, tdname, targ in zip(tds, _template_args[tname], targs):
+                w('  <Typedef id="{0}" name="{1}" type="{2}" context="{3}" '
+                  'access="public" file="fs" line="1"/>\n'.format(td, tdname,
+                                                                  types[targ], cid))
+            types[cpp] = cid
+        # project classes
+        nsmembers = []
+        clsids = {}
+        chain = self.ancestors(i)
+        for j in chain:
+            cid = clsids[j] = newid()
+            nsmembers.append(cid)
+            members, body = [], []
+            ctor = newid()
+            members.append(ctor)
+            body.append('  <Constructor id="{0}" name="C{1}" context="{2}" '
+                        'access="public" file="f{1}" line="1"/>\n'.format(ctor, j, cid))
+            for fname, ftype in (('field0', 'int'), ('field1', 'double')):
+                fid = newid()
+                members.append(fid)
+                body.append('  <Field id="{0}" name="{1}" type="{2}" context="{3}" '
+                            'access="public" file="f{4}" line="1"/>\n'.format(fid,
+                            fname, types[ftype], cid, j))
+            for k in range(self.nmethods):
+                mid = newid()
+                members.append(mid)
+                rtn, arg = self.signature(k)
+                body.append('  <Method id="{0}" name="method{1}" returns="{2}" '
+                            'context="{3}" access="public" file="f{4}" line="1">\n'
+                            '    <Argument name="x" type="{5}" file="f{4}" '
+                            'line="1"/>\n  </Method>\n'.format(mid, k, types[rtn],
+                            cid, j, types[arg]))
+            p = self.parent(j)
+            w('  <Class id="{0}" name="C{1}" context="{2}" file="f{1}" line="1" '
+              'members="{3}" bases="{4}"/>\n'.format(cid, j, ns, ' '.join(members),
+              '' if p is None else clsids[p]))
+            w(''.join(body))
+        # padding from the standard library
+        for k in range(self.npadding):
+            cid, fid, mid = newid(), newid(), newid()
+            w('  <Class id="{0}" name="Pad{1}" context="{2}" file="fs" line="1" '
+              'members="{3} {4}" bases=""/>\n'.format(cid, k, std, fid, mid))
+            w('  <Field id="{0}" name="x" type="{1}" context="{2}" access="public" '
+              'file="fs" line="1"/>\n'.format(fid, fund['double'], cid))
+            w('  <Method id="{0}" name="f" returns="{1}" context="{2}" '
+              'access="public" file="fs" line="1">\n'
+              '    <Argument name="a" type="{1}" file="fs" line="1"/>\n'
+              '  </Method>\n'.format(mid, fund['int'], cid))
+        w('  <Namespace id="{0}" name="::" members="{1}" mangled="_Z2::"/>\n'.format(
+          ns, " ".join(nsmembers + [std])))
+        w('  <Namespace id="{0}" name="std" context="{1}" members=""/>\n'.format(std, ns))
+        w('  <File id="f" name="src/cls{0}.cpp"/>\n'.format(i))
+        for j in chain:
+            w('  <File id="f{0}" name="src/cls{0}.h"/>\n'.format(j))
+        w('  <File id="fs" name="/usr/include/c++/4.7/bits/stl_synth.h"/>\n')
+        w('</GCC_XML>\n')
+        return out.getvalue()
+
+    def write(self, projdir, fixtures=True):
+        """Writes the project out to a directory: the sources to src/, the run
+        control file, and, if fixtures is True, the GCC-XML output for each
+        source file to fixtures/."""
+        for d in ('src', 'fixtures'):
+            if not os.path.isdir(os.path.join(projdir, d)):
+                os.makedirs(os.path.join(projdir, d))
+        with open(os.path.join(projdir, 'xdressrc.py'), 'w') as f:
+            f.write(self.rc())
+        for i in range(self.nclasses):
+            base = os.path.join(projdir, 'src', 'cls{0}'.format(i))
+            with open(base + '.h', 'w') as f:
+                f.write(self.header(i))
+            with open(base + '.cpp', 'w') as f:
+                f.write(self.source(i))
+            if fixtures:
+                with open(fixture_path(projdir, i), 'w') as f:
+                    f.write(self.gccxml(i))
+
+
+def fixture_path(projdir, i):
+    """Path to the recorded GCC-XML output for the source file of class i."""
+    return os.path.join(projdir, 'fixtures', 'cls{0}.xml'.format(i))
@@ -9,8 +9,12 @@ from distutils.dir_util import mkpath, remove_tree
 from copy import deepcopy
 
 
+VERSION = {}
+execfile(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xdress', 
+                      'version.py'), VERSION)
+
 INFO = {
-    'version': '0.1-dev',
+    'version': VERSION['xdress_version'],
     }
 
 
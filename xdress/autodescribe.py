@@ -129,11 +129,18 @@ Automatic Descriptions API
 """
 import os
 import re
+import time
 from copy import deepcopy
+import zlib
 import linecache
 import subprocess
 import itertools
+from hashlib import md5
 from pprint import pprint, pformat
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 
 # CLang conditional imports
 #try:
@@ -166,13 +173,17 @@ except ImportError:
                 except ImportError:
                     pass
 import tempfile
+from xml.parsers import expat
+
+from utils import atomicwrite, filedigest, lruevict
+from profiling import profiler
 
 RE_INT = re.compile('^\d+$')
 RE_FLOAT = re.compile('^[+-]?\.?\d+\.?\d*?(e[+-]?\d+)?$')
 
 
 def describe(filename, name=None, kind='class', includes=(), parser='gccxml', 
-    verbose=False):
+    verbose=False, builddir=None, closure=None, units=None):
     """Automatically describes a class in a file.  This is the main entry point.
 
     Parameters
@@ -192,6 +203,16 @@ def describe(filename, name=None, kind='class', includes=(), parser='gccxml',
         implemented in the future.
     verbose : bool, optional
         Flag to diplay extra information while describing the class.
+    builddir : str or None, optional
+        Build directory where parsed syntax trees may be persisted between 
+        runs.  If None, nothing is persisted.
+    closure : dict or None, optional
+        Digests of the files in the include closure of the file as last 
+        recorded, which the persisted trees are looked up by, see 
+        GccxmlStore.key().
+    units : dict or None, optional
+        The parsed translation units of this run, which are shared by the
+        names described from the same file, see gccxml_translation_unit().
 
     Returns
     -------
@@ -201,7 +222,11 @@ def describe(filename, name=None, kind='class', includes=(), parser='gccxml',
     """
     if name is None:
         name = os.path.split(filename)[-1].rsplit('.', 1)[0].capitalize()
-    describers = {'clang': clang_describe, 'gccxml': gccxml_describe}
+    if parser == 'gccxml':
+        return gccxml_describe(filename, name, kind, includes=includes, 
+                               verbose=verbose, builddir=builddir, closure=closure,
+                               units=units)
+    describers = {'clang': clang_describe}
     describer = describers[parser]
     desc = describer(filename, name, kind, includes=includes, verbose=verbose)
     return desc
@@ -212,8 +237,12 @@ def describe(filename, name=None, kind='class', includes=(), parser='gccxml',
 #
 
 
-def gccxml_describe(filename, name, kind, includes=(), verbose=False):
-    """Use GCC-XML to describe the class.
+def gccxml_describe(filename, name, kind, includes=(), verbose=False, builddir=None,
+                    closure=None, units=None):
+    """Use GCC-XML to describe the class.  Given the units of a run, GCC-XML 
+    is run at most once per translation unit (filename and includes); later 
+    calls describing other names from the same file reuse the already parsed 
+    tree.
 
     Parameters
     ----------
@@ -228,6 +257,14 @@ def gccxml_describe(filename, name, kind, includes=(), verbose=False):
         The list of extra include directories to search for header files.
     verbose : bool, optional
         Flag to diplay extra information while describing the class.
+    builddir : str or None, optional
+        Build directory for the persistent GccxmlStore.  If None, the store
+        is not used.
+    closure : dict or None, optional
+        Digests of the files in the include closure of the file as last 
+        recorded, see GccxmlStore.key().
+    units : dict or None, optional
+        The parsed translation units of this run, see gccxml_translation_unit().
 
     Returns
     -------
@@ -235,20 +272,462 @@ def gccxml_describe(filename, name, kind, includes=(), verbose=False):
         A dictionary describing the class which may be used to generate
         API bindings.
     """
-    f = tempfile.NamedTemporaryFile()
-    cmd = ['gccxml', filename, '-fxml=' + f.name]
-    cmd += map(lambda i: '-I' + i,  includes)
-    if verbose:
-        print " ".join(cmd)
-    subprocess.call(cmd)
-    f.seek(0)
-    root = etree.parse(f)
-    onlyin = set([filename, filename.replace('.cpp', '.h')])
-    describers = {'class': GccxmlClassDescriber, 'func': GccxmlFuncDescriber}
-    describer = describers[kind](name, root, onlyin=onlyin, verbose=verbose)
-    describer.visit()
-    f.close()
-    return describer.desc
+    store = None if builddir is None else GccxmlStore(os.path.join(builddir, 'gccxml'))
+    tu = gccxml_translation_unit(filename, includes=includes, verbose=verbose, 
+                                 store=store, closure=closure, units=units)
+    return tu.describe(name, kind)
+
+
+_gccxml_template_member_tags = frozenset(['Constructor', 'Typedef'])
+
+def gccxml_parse(source, onlyin=None):
+    """Parses a GCC-XML output file.  When onlyin is given, the file is 
+    streamed rather than loaded whole, and only the nodes that a describer may 
+    visit are kept: the nodes living in the onlyin files plus the transitive 
+    closure of the references that the describers read from them (see 
+    GccxmlBaseDescriber._ref_attrs).  Members of classes from other files are 
+    only followed for the constructors and typedefs needed to identify template
+    instantiations.  All File nodes are kept.  A single pass records the 
+    references and where each node starts in the file, without building any
+    elements, then the nodes to keep are read back from there.
+
+    Parameters
+    ----------
+    source : str
+        Path to the GCC-XML file.
+    onlyin : set of str or None, optional
+        Names of the files whose nodes are of interest.  If None, the whole 
+        tree is parsed.
+
+    Returns
+    -------
+    root : element tree
+        The (possibly reduced) GCC-XML tree.
+
+    """
+    if onlyin is None:
+        return etree.parse(source)
+    ref_attrs = GccxmlBaseDescriber._ref_attrs
+    func_tags = GccxmlBaseDescriber._func_tags
+    starts = []  # offsets of the top-level nodes, and of the closing root tag
+    positions = {}
+    refs = {}
+    members = {}
+    tmembers = set()  # the members identifying template instantiations
+    fileids = set()
+    files = []
+    roots = []
+    state = {'depth': 0, 'id': None}
+    parser = expat.ParserCreate()
+    parser.returns_unicode = False
+
+    def start_element(tag, attrib):
+        depth = state['depth']
+        state['depth'] = depth + 1
+        if depth == 0:
+            state['root'] = (tag, attrib)
+        elif depth == 2:
+            # the arguments of a function
+            id = state['id']
+            if tag == 'Argument' and 'type' in attrib and id is not None:
+                refs[id] = refs.get(id, '') + ' ' + attrib['type']
+        elif depth == 1:
+            starts.append(parser.CurrentByteIndex)
+            id = attrib.get('id', None)
+            state['id'] = id if tag in func_tags else None
+            if tag == 'File':
+                files.append(len(starts) - 1)
+                if attrib.get('name', None) in onlyin:
+                    fileids.add(id)
+            elif id is not None:
+                positions[id] = len(starts) - 1
+                r = [attrib[a] for a in ref_attrs.get(tag, ()) if a in attrib]
+                if 0 < len(r):
+                    refs[id] = " ".join(r)
+                if tag in ('Class', 'Struct') and 'members' in attrib:
+                    members[id] = attrib['members']
+                if tag in _gccxml_template_member_tags:
+                    tmembers.add(id)
+                if 'file' in attrib:
+                    roots.append((id, attrib['file']))
+
+    def end_element(tag):
+        state['depth'] -= 1
+        if state['depth'] == 0:
+            starts.append(parser.CurrentByteIndex)
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    with open(source, 'rb') as f:
+        parser.ParseFile(f)
+    # compute the reachable nodes
+    stack = [id for id, file in roots if file in fileids]
+    infile = set(stack)
+    keep = set()
+    while 0 < len(stack):
+        id = stack.pop()
+        if id in keep:
+            continue
+        keep.add(id)
+        stack += [ref.rsplit(':', 1)[-1] for ref in refs.get(id, '').split()]
+        if id in infile:
+            stack += members.get(id, '').split()
+        else:
+            # only keep what identifies a template instantiation
+            stack += [m for m in members.get(id, '').split() 
+                      if m in tmembers]
+    kept = sorted(files + [positions[id] for id in keep if id in positions])
+    for x in (refs, members, tmembers, positions, keep):
+        x.clear()
+    # read back the kept nodes, a run of consecutive ones at a time
+    roottag, rootattrib = state['root']
+    newroot = etree.Element(roottag, rootattrib)
+    with open(source, 'rb') as f:
+        i = 0
+        while i < len(kept):
+            j = i
+            while j + 1 < len(kept) and kept[j + 1] == kept[j] + 1:
+                j += 1
+            f.seek(starts[kept[i]])
+            chunk = f.read(starts[kept[j] + 1] - starts[kept[i]])
+            newroot.extend(list(etree.fromstring('<run>' + chunk + '</run>')))
+            i = j + 1
+    return etree.ElementTree(newroot)
+
+
+def _tree2tuples(node):
+    return (node.tag, dict(node.attrib), [_tree2tuples(c) for c in node])
+
+def _tuples2tree(t, parent=None):
+    tag, attrib, children = t
+    node = etree.Element(tag, attrib) if parent is None else \
+           etree.SubElement(parent, tag, attrib)
+    for child in children:
+        _tuples2tree(child, node)
+    return node
+
+
+def include_closure(filename, files, digest=None):
+    """Maps the files of a translation unit to the digests of their contents,
+    or None for missing files.  These are the files in its include closure, as
+    GCC-XML reports them, plus the source file and the header next to it.  The
+    digest defaults to utils.filedigest()."""
+    if digest is None:
+        digest = lambda f: filedigest(f) if os.path.isfile(f) else None
+    files = set(files)
+    files.add(filename)
+    files.add(os.path.splitext(filename)[0] + '.h')
+    return dict([(f, digest(f)) for f in files])
+
+
+class GccxmlStore(object):
+    """A persistent, content-addressed store of reduced GCC-XML trees.  Trees 
+    are keyed by a hash of the include flags and the contents of the files in 
+    the include closure of the translation unit, see key(), so an unchanged 
+    file never needs to be run through GCC-XML again, even to describe names 
+    that have not been seen before.  Each tree is kept 
+    as a compressed pickle of nested (tag, attrib, children) tuples in its own 
+    file, which is written atomically.  The modification time of a tree file
+    is the last time the tree was used, which gc() relies upon to evict the 
+    least recently used trees.
+    """
+
+    def __init__(self, storedir=os.path.join('build', 'gccxml')):
+        """Parameters
+        -------------
+        storedir : str, optional
+            Directory to keep the trees in.
+
+        """
+        self.storedir = storedir
+
+    def key(self, filename, includes=(), verbose=False, closure=None):
+        """Computes the store key for a translation unit from the include 
+        flags and the closure, a dict mapping the files of the translation 
+        unit to their digests as include_closure() does.  This is how the
+        description cache records the dependencies of a source file.  If no 
+        closure is known, the key is computed by running only the GCC-XML 
+        preprocessor on the file instead."""
+        if closure is not None:
+            return md5(repr((filename, tuple(includes), sorted(closure.items()))
+                            )).hexdigest()
+        cmd = ['gccxml', filename, '--preprocess']
+        cmd += map(lambda i: '-I' + i,  includes)
+        if verbose:
+            print " ".join(cmd)
+        p = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        preprocessed = p.communicate()[0]
+        h = md5(filename)
+        h.update('\0'.join(['-I' + i for i in includes]) + '\0')
+        h.update(preprocessed)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.storedir, key + '.gccxml.pkl.z')
+
+    def __contains__(self, key):
+        return os.path.isfile(self._path(key))
+
+    def load(self, key):
+        """Returns the tree stored under key, or None if there isn't one."""
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            t = pickle.loads(zlib.decompress(f.read()))
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass  # removed by a concurrent gc
+        return etree.ElementTree(_tuples2tree(t))
+
+    def dump(self, key, root):
+        """Stores a tree under key."""
+        root = root.getroot() if hasattr(root, 'getroot') else root
+        s = zlib.compress(pickle.dumps(_tree2tuples(root), pickle.HIGHEST_PROTOCOL))
+        atomicwrite(s, self._path(key))
+
+    def gc(self, maxsize=None, maxage=None):
+        """Garbage collects the store, removing the trees beyond the size and
+        age bounds as well as temporary files left behind by killed processes.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Maximum total size of the trees [bytes].  The least recently 
+            used trees are evicted until the store fits.
+        maxage : float, optional
+            Maximum time since a tree was last used [seconds].
+
+        Returns
+        -------
+        reclaimed : list of (key, nbytes, reason) tuples
+            The trees that were removed.
+
+        """
+        if not os.path.isdir(self.storedir):
+            return []
+        now = time.time()
+        trees = []
+        for fname in os.listdir(self.storedir):
+            path = os.path.join(self.storedir, fname)
+            try:
+                st = os.stat(path)
+                if fname.endswith('.tmp') and st.st_mtime < now - 3600.0:
+                    os.remove(path)
+            except OSError:
+                continue
+            if fname.endswith('.gccxml.pkl.z'):
+                trees.append((st.st_mtime, st.st_size, fname[:-13], path))
+        reclaimed = lruevict(trees, maxsize=maxsize, maxage=maxage, 
+                             bound='store size bound')
+        for key, size, reason, path in reclaimed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # removed by a concurrent gc
+        return [(key, size, reason) for key, size, reason, path in reclaimed]
+
+
+class GccxmlTranslationUnit(object):
+    """A GCC-XML session for a single translation unit.  GCC-XML is run and 
+    its output parsed and indexed only once, the first time that a 
+    description is requested.  The tree is then shared by all of the class 
+    and function describers for names in this file."""
+
+    def __init__(self, filename, includes=(), verbose=False, root=None, store=None,
+                 closure=None):
+        """Parameters
+        -------------
+        filename : str
+            The path to the file.
+        includes: list of str, optional
+            The list of extra include directories to search for header files.
+        verbose : bool, optional
+            Flag to diplay extra information while describing.
+        root : element tree, optional
+            An already parsed GCC-XML tree for this file.  If None, GCC-XML 
+            is run on first use.
+        store : GccxmlStore, optional
+            Persistent store to look the tree up in before running GCC-XML,
+            and to save newly parsed trees to.
+        closure : dict, optional
+            Digests of the files in the include closure of this translation 
+            unit as last recorded, which the tree is looked up in the store by.
+            If None, the file is preprocessed to look it up instead.
+
+        """
+        self.filename = filename
+        self.includes = tuple(includes)
+        self.verbose = verbose
+        self.store = store
+        self.closure = closure
+        self.onlyin = set([filename, filename.replace('.cpp', '.h')])
+        self._root = root
+        self._index = None
+
+    @property
+    def root(self):
+        """The parsed GCC-XML tree, running GCC-XML if needed."""
+        if self._root is None:
+            self.parse()
+        return self._root
+
+    @property
+    def index(self):
+        """The GccxmlIndex of the tree."""
+        if self._index is None:
+            root = self.root
+            with profiler.stage('index ' + self.filename, 'index'):
+                self._index = GccxmlIndex(root)
+        return self._index
+
+    @property
+    def files(self):
+        """Sorted list of the names of all files that GCC-XML reports as part
+        of this translation unit, i.e. the file itself and everything that it 
+        includes, transitively.  Pseudo-files such as '<built-in>' are skipped.
+        """
+        root = self.root
+        root = root.getroot() if hasattr(root, 'getroot') else root
+        files = set([n.attrib['name'] for n in root.iterfind('File')])
+        return sorted([f for f in files if not f.startswith('<')])
+
+    def parse(self):
+        """Runs GCC-XML on the file and parses its output, unless the tree is
+        already in the store."""
+        if self.store is not None:
+            if self.closure is None:
+                with profiler.stage('preprocess ' + self.filename, 'gccxml preprocess'):
+                    key = self.store.key(self.filename, self.includes, self.verbose)
+            else:
+                key = self.store.key(self.filename, self.includes, closure=self.closure)
+            with profiler.stage('load ' + self.filename, 'store'):
+                self._root = self.store.load(key)
+            self._index = None
+            if self._root is not None:
+                return
+        f = tempfile.NamedTemporaryFile()
+        cmd = ['gccxml', self.filename, '-fxml=' + f.name]
+        cmd += map(lambda i: '-I' + i,  self.includes)
+        if self.verbose:
+            print " ".join(cmd)
+        with profiler.stage('gccxml ' + self.filename, 'gccxml'):
+            subprocess.call(cmd)
+        with profiler.stage('parse ' + self.filename, 'parse'):
+            self._root = gccxml_parse(f.name, onlyin=self.onlyin)
+        self._index = None
+        f.close()
+        if self.store is not None:
+            # also under the closure of the new tree, which the next run knows
+            closure = include_closure(self.filename, self.files)
+            keys = set([key, self.store.key(self.filename, self.includes, 
+                                            closure=closure)])
+            with profiler.stage('dump ' + self.filename, 'store'):
+                for key in keys:
+                    self.store.dump(key, self._root)
+
+    def describe(self, name, kind='class'):
+        """Describes a class or function from this translation unit.
+
+        Parameters
+        ----------
+        name : str
+            The class or function name.
+        kind : str, optional
+            The kind of type to describe, currently valid flags are 'class' 
+            and 'func'.
+
+        Returns
+        -------
+        desc : dict
+            Description dictionary.
+
+        """
+        describers = {'class': GccxmlClassDescriber, 'func': GccxmlFuncDescriber}
+        describer = describers[kind](name, self.root, onlyin=self.onlyin, 
+                                     verbose=self.verbose, index=self.index)
+        with profiler.stage('visit ' + name, 'visit', file=self.filename):
+            describer.visit()
+        return describer.desc
+
+
+_gccxml_version = []
+
+def gccxml_version():
+    """Returns the version string reported by 'gccxml --version', or None if
+    GCC-XML could not be run.  GCC-XML is only asked once per process."""
+    if len(_gccxml_version) == 0:
+        try:
+            p = subprocess.Popen(['gccxml', '--version'], stdout=subprocess.PIPE, 
+                                 stderr=subprocess.PIPE)
+            version = p.communicate()[0].strip() or None
+        except OSError:
+            version = None
+        _gccxml_version.append(version)
+    return _gccxml_version[0]
+
+
+def gccxml_translation_unit(filename, includes=(), verbose=False, store=None, 
+                            closure=None, units=None):
+    """Returns the GccxmlTranslationUnit for a file and include directories.
+    The units of a run are kept in a dict keyed by (filename, includes) tuples,
+    which is owned by the caller, e.g. the description cache of main(), and is
+    cleared when the run is done with them.  The unit is taken from there if 
+    this is not the first request for this file, otherwise a new one is made 
+    (and added).  Without units, a new one is made every time."""
+    key = (filename, tuple(includes))
+    tu = None if units is None else units.get(key, None)
+    if tu is None:
+        tu = GccxmlTranslationUnit(filename, includes=includes, verbose=verbose, 
+                                   store=store, closure=closure)
+        if units is not None:
+            units[key] = tu
+    return tu
+
+
+class GccxmlIndex(object):
+    """Lookup tables for a parsed GCC-XML tree.  GCC-XML cross references 
+    nodes by their 'id' attributes, so resolving an id by searching the tree
+    costs time proportional to the size of the tree.  This index is built once 
+    per tree, after which id and top-level name lookups are dictionary accesses.
+    """
+
+    def __init__(self, root):
+        """Parameters
+        -------------
+        root : element tree or element tree node
+            The parsed GCC-XML tree (or its root node) to index.
+
+        """
+        root = root.getroot() if hasattr(root, 'getroot') else root
+        self.ids = {}
+        self.names = {}
+        for node in root.iter():
+            id = node.attrib.get('id', None)
+            if id is not None:
+                self.ids[id] = node
+        for node in root:
+            name = node.attrib.get('name', None)
+            if name is not None:
+                self.names.setdefault((node.tag, name), []).append(node)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id):
+        return id in self.ids
+
+    def __getitem__(self, id):
+        return self.ids[id]
+
+    def get(self, id, default=None):
+        return self.ids.get(id, default)
+
+    def named(self, tag, name):
+        """Returns the list of top-level nodes with the given tag and name,
+        in document order."""
+        return self.names.get((tag, name), [])
 
 
 class GccxmlBaseDescriber(object):
@@ -259,7 +738,23 @@ class GccxmlBaseDescriber(object):
     _funckey = None
     _integer_types = frozenset(['int32', 'int64', 'uint32', 'uint64'])
 
-    def __init__(self, name, root=None, onlyin=None, verbose=False):
+    # the attributes referring to other nodes which the visitors below read,
+    # by tag, along with the types of the arguments of the functions which 
+    # they visit; gccxml_parse() keeps only what is reachable through these
+    _ref_attrs = {
+        'Class': ('bases', 'context'),
+        'Struct': ('bases', 'context'),
+        'Function': ('returns', 'context'),
+        'Method': ('returns',),
+        'Field': ('type', 'context'),
+        'Typedef': ('type',),
+        'ArrayType': ('type',),
+        'ReferenceType': ('type',),
+        'PointerType': ('type',),
+        }
+    _func_tags = frozenset(['Function', 'Method', 'Constructor', 'Destructor'])
+
+    def __init__(self, name, root=None, onlyin=None, verbose=False, index=None):
         """Parameters
         -------------
         name : str
@@ -271,15 +766,19 @@ class GccxmlBaseDescriber(object):
             finding classes of the same name coming from other libraries.
         verbose : bool, optional
             Flag to display extra information while visiting the class.
+        index : GccxmlIndex, optional
+            Lookup tables for root.  If None, these are built here.  Pass in
+            a shared index when describing many names from the same tree.
 
         """
         self.desc = {'name': name}
         self.name = name
         self.verbose = verbose
         self._root = root
+        self._index = GccxmlIndex(root) if index is None else index
         onlyin = [onlyin] if isinstance(onlyin, basestring) else onlyin
         onlyin = set() if onlyin is None else set(onlyin)
-        self.onlyin = set([root.find("File[@name='{0}']".format(oi)).attrib['id'] \
+        self.onlyin = set([self._index.named('File', oi)[0].attrib['id'] \
                            for oi in onlyin])
         self._currfunc = []  # this must be a stack to handle nested functions
         self._currfuncsig = None
@@ -317,8 +816,7 @@ class GccxmlBaseDescriber(object):
     def _visit_template(self, node):
         name = node.attrib['name']
         members = node.attrib.get('members', '').strip().split()
-        children = [child for m in members for child in \
-                                self._root.iterfind(".//*[@id='{0}']".format(m))]
+        children = [self._index[m] for m in members if m in self._index]
         tags = [child.tag for child in children]
         template_name = children[tags.index('Constructor')].attrib['name']  # 'map'
         if template_name == 'basic_string':
@@ -429,7 +927,7 @@ class GccxmlBaseDescriber(object):
     def visit_field(self, node):
         """visits a member variable."""
         self._pprint(node)
-        context = self._root.find(".//*[@id='{0}']".format(node.attrib['context']))
+        context = self._index[node.attrib['context']]
         if context.attrib['name'] == self.name:
             # assert this field is member of the class we are trying to parse
             name = node.attrib['name']
@@ -491,7 +989,7 @@ class GccxmlBaseDescriber(object):
 
     def type(self, id):
         """Resolves the type from its id and information in the root element tree."""
-        node = self._root.find(".//*[@id='{0}']".format(id))
+        node = self._index[id]
         tag = node.tag.lower()
         meth_name = 'visit_' + tag
         meth = getattr(self, meth_name, None)
@@ -510,7 +1008,7 @@ class GccxmlBaseDescriber(object):
 
     def context(self, id):
         """Resolves the context from its id and information in the element tree."""
-        node = self._root.find(".//*[@id='{0}']".format(id))
+        node = self._index[id]
         tag = node.tag.lower()
         meth_name = 'visit_' + tag
         meth = getattr(self, meth_name, None)
@@ -527,7 +1025,7 @@ class GccxmlClassDescriber(GccxmlBaseDescriber):
 
     _funckey = 'methods'
 
-    def __init__(self, name, root=None, onlyin=None, verbose=False):
+    def __init__(self, name, root=None, onlyin=None, verbose=False, index=None):
         """Parameters
         -------------
         name : str
@@ -539,10 +1037,12 @@ class GccxmlClassDescriber(GccxmlBaseDescriber):
             finding classes of the same name coming from other libraries.
         verbose : bool, optional
             Flag to display extra information while visiting the class.
+        index : GccxmlIndex, optional
+            Lookup tables for root.  If None, these are built here.
 
         """
         super(GccxmlClassDescriber, self).__init__(name, root=root, onlyin=onlyin, 
-                                                   verbose=verbose)
+                                                   verbose=verbose, index=index)
         self.desc['attrs'] = {}
         self.desc[self._funckey] = {}
 
@@ -558,13 +1058,13 @@ class GccxmlClassDescriber(GccxmlBaseDescriber):
 
         """
         if node is None:
-            node = self._root.find("Class[@name='{0}']".format(self.name))
-            if node is None:
-                node = self._root.find("Struct[@name='{0}']".format(self.name))
+            nodes = self._index.named('Class', self.name) or \
+                    self._index.named('Struct', self.name)
+            node = nodes[0] if 0 < len(nodes) else None
             assert node.attrib['file'] in self.onlyin
             self.visit_class(node)
         members = node.attrib.get('members', '').strip().split()
-        children = [self._root.find(".//*[@id='{0}']".format(m)) for m in members]
+        children = [self._index[m] for m in members]
         children = [c for c in children if c.attrib['access'] == 'public']
         self._level += 1
         for child in children:
@@ -580,7 +1080,7 @@ class GccxmlFuncDescriber(GccxmlBaseDescriber):
 
     _funckey = 'signatures'
 
-    def __init__(self, name, root=None, onlyin=None, verbose=False):
+    def __init__(self, name, root=None, onlyin=None, verbose=False, index=None):
         """Parameters
         -------------
         name : str
@@ -592,10 +1092,12 @@ class GccxmlFuncDescriber(GccxmlBaseDescriber):
             finding classes of the same name coming from other libraries.
         verbose : bool, optional
             Flag to display extra information while visiting the class.
+        index : GccxmlIndex, optional
+            Lookup tables for root.  If None, these are built here.
 
         """
         super(GccxmlFuncDescriber, self).__init__(name, root=root, onlyin=onlyin, 
-                                                   verbose=verbose)
+                                                   verbose=verbose, index=index)
         self.desc[self._funckey] = {}
 
     def visit(self, node=None):
@@ -609,11 +1111,15 @@ class GccxmlFuncDescriber(GccxmlBaseDescriber):
             top-level class node is found and visited.
 
         """
-        root = node or self._root
-        for n in root.iterfind("Function[@name='{0}']".format(self.name)):
+        if node is None:
+            funcs = self._index.named('Function', self.name)
+        else:
+            funcs = node.iterfind("Function[@name='{0}']".format(self.name))
+        for n in funcs:
             if n.attrib['file'] in self.onlyin:
                 self.visit_function(n)
 
+
 #
 # Clang Describers
 #
@@ -13,6 +13,7 @@ Cython Generation API
 """
 import math
 from copy import deepcopy
+from cStringIO import StringIO
 
 from utils import indent, indentstr, expand_default_args, isclassdesc, isfuncdesc
 import typesystem as ts
@@ -75,8 +76,26 @@ def modcpppxd(mod, exception_type='+'):
         Cython cpp_*.pxd header file as in-memory string.
 
     """
-    m = {'extra': mod.get('extra', ''), 
-         "cpppxd_filename": mod.get("cpppxd_filename", "")}
+    f = StringIO()
+    emitcpppxd(mod, f, exception_type)
+    return f.getvalue()
+
+
+def emitcpppxd(mod, f, exception_type='+'):
+    """Writes the cpp_*.pxd Cython header file of a module, see modcpppxd(), to
+    the file-like object f, one class or function at a time.
+
+    Parameters
+    ----------
+    mod : dict
+        Module description dictonary.
+    f : file-like
+        Where the header file is written to.
+    exception_type : str, optional
+        Cython exception annotation.  Set to None when exceptions should not 
+        be included.
+
+    """
     attrs = []
     cimport_tups = set()
     for name, desc in mod.iteritems():
@@ -88,11 +107,19 @@ def modcpppxd(mod, exception_type='+'):
             continue
         cimport_tups |= ci_tup
         attrs.append(attr_str)
-    m['cimports'] = "\n".join(sorted(cython_cimports(cimport_tups)))
-    m['attrs_block'] = "\n".join(attrs)
-    t = '\n\n'.join([AUTOGEN_WARNING, '{cimports}', '{attrs_block}', '{extra}'])
-    cpppxd = t.format(**m)
-    return cpppxd
+    f.write(AUTOGEN_WARNING + '\n\n')
+    f.write("\n".join(sorted(cython_cimports(cimport_tups))) + '\n\n')
+    _writeblock(f, attrs)
+    f.write('\n\n' + mod.get('extra', ''))
+
+
+def _writeblock(f, attrs):
+    """Writes the snippets of the classes and functions of a module to f, one
+    per line, without joining them first."""
+    for i, attr_str in enumerate(attrs):
+        if 0 < i:
+            f.write('\n')
+        f.write(attr_str)
 
 
 _cpppxd_class_template = \
@@ -284,8 +311,23 @@ def modpxd(mod):
         Cython .pxd header file as in-memory string.
 
     """
-    m = {'extra': mod.get('extra', ''), 
-         "pxd_filename": mod.get("pxd_filename", "")}
+    f = StringIO()
+    emitpxd(mod, f)
+    return f.getvalue()
+
+
+def emitpxd(mod, f):
+    """Writes the pxd Cython header file of a module, see modpxd(), to the 
+    file-like object f, one class at a time.
+
+    Parameters
+    ----------
+    mod : dict
+        Module description dictonary.
+    f : file-like
+        Where the header file is written to.
+
+    """
     attrs = []
     cimport_tups = set()
     for name, desc in mod.iteritems():
@@ -296,11 +338,10 @@ def modpxd(mod):
             continue
         cimport_tups |= ci_tup
         attrs.append(attr_str)
-    m['cimports'] = "\n".join(sorted(cython_cimports(cimport_tups)))
-    m['attrs_block'] = "\n".join(attrs)
-    t = '\n\n'.join([AUTOGEN_WARNING, '{cimports}', '{attrs_block}', '{extra}'])
-    pxd = t.format(**m)
-    return pxd
+    f.write(AUTOGEN_WARNING + '\n\n')
+    f.write("\n".join(sorted(cython_cimports(cimport_tups))) + '\n\n')
+    _writeblock(f, attrs)
+    f.write('\n\n' + mod.get('extra', ''))
 
 
 _pxd_class_template = \
@@ -402,16 +443,13 @@ def genpyx(env, classes=None):
     return pyxs
 
 
-_pyx_mod_template = AUTOGEN_WARNING + \
+_pyx_mod_header = AUTOGEN_WARNING + \
 '''"""{docstring}
 """
 {cimports}
 
 {imports}
 
-{attrs_block}
-
-{extra}
 '''
 
 def modpyx(mod, classes=None):
@@ -433,9 +471,28 @@ def modpyx(mod, classes=None):
         Cython pyx header file as in-memory string.
 
     """
-    m = {'extra': mod.get('extra', ''), 
-         'docstring': mod.get('docstring', "no docstring, please file a bug report!"), 
-         "pyx_filename": mod.get("pyx_filename", "")}
+    f = StringIO()
+    emitpyx(mod, f, classes)
+    return f.getvalue()
+
+
+def emitpyx(mod, f, classes=None):
+    """Writes the pyx Cython implementation file of a module, see modpyx(), to
+    the file-like object f, one class or function at a time.
+
+    Parameters
+    ----------
+    mod : dict
+        Module description dictonary.
+    f : file-like
+        Where the implementation file is written to.
+    classes : dict, optional
+        Dictionary which maps all class names that are required to 
+        their own descriptions.  This is required for resolving class heirarchy
+        dependencies.
+
+    """
+    m = {'docstring': mod.get('docstring', "no docstring, please file a bug report!")}
     attrs = []
     import_tups = set()
     cimport_tups = set()
@@ -453,10 +510,9 @@ def modpyx(mod, classes=None):
     m['cimports'] = "\n".join(sorted(cython_cimports(cimport_tups)))
     if 'numpy' in m['cimports']:
         m['imports'] += "\n\nnp.import_array()"
-    m['attrs_block'] = "\n".join(attrs)
-    t = '\n\n'.join([AUTOGEN_WARNING, '{cimports}', '{attrs_block}', '{extra}'])
-    pyx = _pyx_mod_template.format(**m)
-    return pyx
+    f.write(_pyx_mod_header.format(**m))
+    _writeblock(f, attrs)
+    f.write('\n\n' + mod.get('extra', '') + '\n')
 
 
 def _gen_property_get(name, t, cached_names=None, inst_name="self._inst"):
@@ -18,7 +18,10 @@ This has the following usage::
     path/to/proj/ $ xdress -h 
     usage: Generates XDress API [-h] [--rc RC] [--debug] [--no-extratypes]
                                 [--no-stlcont] [--no-cython] [--no-cyclus]
-                                [--dump-desc] [-I INCLUDES [INCLUDES ...]] [-v]
+                                [--dump-desc] [--plan] [--gc-cache]
+                                [-I INCLUDES [INCLUDES ...]] [-v] [-j JOBS]
+                                [--timings] [--trace TRACE]
+                                [--memprofile MEMPROFILE] [--memo-stats]
 
     optional arguments:
       -h, --help            show this help message and exit
@@ -29,9 +32,18 @@ This has the following usage::
       --no-cython           don't make cython bindings
       --no-cyclus           don't make cyclus bindings
       --dump-desc           print description cache
+      --plan                print what would be regenerated and why
+      --gc-cache            garbage collect description cache
       -I INCLUDES [INCLUDES ...]
                             additional include dirs
       -v, --verbose         print more output
+      -j JOBS, --jobs JOBS  number of concurrent gccxml and code generation
+                            processes
+      --timings             print a summary of stage timings
+      --trace TRACE         write a Chrome trace event file of the stages
+      --memprofile MEMPROFILE
+                            write a memory profile of the stages
+      --memo-stats          print type system memoization statistics
 
 .. warning:: 
 
@@ -65,7 +77,13 @@ following top-level keys:
     module level.
 
 Sidecar files are guaranteed to be executed only once.  (Note that they are 
-execfile'd rather than imported.)  Furthermore, the description dictionaries
+execfile'd rather than imported.)  With the typesystem_snapshot rc option 
+set, sidecars are not executed at all when neither they nor the run control 
+file have changed since the last run: their modules and type system 
+registrations are restored from the snapshot that the last run left in the 
+build directory.  Only the sidecar files themselves are checked for changes, so
+leave this option off for sidecars which import other modules of the project or
+have effects beyond the type system.  Furthermore, the description dictionaries
 that live under the name keys are merged with the automatically generated 
 descriptions.  The sidecar descriptions take precedence over the automatically
 generated ones.
@@ -122,7 +140,11 @@ Main API
 ========
 """
 import os
+import time
 import argparse
+import multiprocessing
+from stat import S_ISREG
+from distutils.spawn import find_executable
 from pprint import pprint
 from hashlib import md5
 try:
@@ -130,72 +152,443 @@ try:
 except ImportError:
     import pickle
 
-from utils import newoverwrite, newcopyover, ensuredirs
+from utils import newoverwrite, newcopyover, ensuredirs, atomicwrite, stablerepr, \
+    Emitter, manifest, lruevict
 import typesystem as ts
 import stlwrap
-from cythongen import gencpppxd, genpxd, genpyx
+import cythongen
+from cythongen import emitcpppxd, emitpxd, emitpyx
 import autodescribe 
+from profiling import profiler, memprofiler
+from version import xdress_version
 
 
 class DescriptionCache(object):
     """A quick persistent cache for descriptions from files.  
-    The keys are (classname, filename) tuples.  The values are 
-    (hashes-of-the-file, description-dictionary) tuples."""
-
-    def __init__(self, cachefile=os.path.join('build', 'desc.cache')):
+    The keys are (classname, filename, kind) tuples.  The values are 
+    (dependencies, description-dictionary) tuples.  The dependencies 
+    are a dictionary holding the hashes of every file in the include closure
+    of the source file (as reported by GCC-XML), the include directories, and 
+    the versions of GCC-XML and xdress.  An entry is valid only when all of 
+    these match the current state of the system.
+
+    On disk, the cache is a directory with one pickle file per entry plus a 
+    table of file stats.  Entries are content addressed: an entry file is 
+    named by the hash of its key, the contents of the source file and its 
+    header, the include directories and the GCC-XML and xdress versions.  
+    The cache directory may therefore be shared by many checkouts of a project (see the 
+    desc_cache_dir rc option), each of which finds the descriptions of 
+    sources identical to its own.  Entries are read only when they are first 
+    asked for and only new or changed entries are written out by dump().  
+    All files are written to a temporary file and atomically renamed into 
+    place, so concurrent xdress processes never see partial entries and an 
+    interrupted run can not corrupt the cache.  The modification time of an 
+    entry file is the last time the entry was used, which gc() relies upon
+    to evict the least recently used entries."""
+
+    def __init__(self, cachedir=os.path.join('build', 'desccache'), statsfile=None):
         """Parameters
         -------------
-        cachefile : str, optional
-            Path to description cachefile.
+        cachedir : str, optional
+            Path to description cache directory.
+        statsfile : str, optional
+            Path to the tables of file stats and of the entries last used, 
+            which are specific to a checkout.  Defaults to a file in cachedir.
 
         """
-        self.cachefile = cachefile
-        if os.path.isfile(cachefile):
-            with open(cachefile, 'r') as f:
-                self.cache = pickle.load(f)
+        self.cachedir = cachedir
+        self.statsfile = statsfile or os.path.join(cachedir, 'stats.pkl')
+        self.owner = os.getcwd()
+        self.cache = {}
+        self.stats = {}
+        self.index = {}
+        self._digests = {}
+        self._addresses = {}
+        self._dirty = set()
+        self._used = set()
+        self._stats_dirty = False
+        self._gccxml = None
+        self._gccxml_version = []
+        # the GCC-XML translation units parsed by this run, which are shared by
+        # the names described from the same file until the run is done with them
+        self.translation_units = {}
+        if os.path.isfile(self.statsfile):
+            with open(self.statsfile, 'rb') as f:
+                tables = pickle.load(f)
+            if isinstance(tables, dict) and 'index' in tables:
+                self.stats, self.index = tables['stats'], tables['index']
+                self._gccxml = tables.get('gccxml', None)
+
+    def address(self, key, includes=()):
+        """The content address of a (name, filename, kind) key given the 
+        current contents of the source file and its header and the include 
+        directories it is compiled with.  These are the only preprocessor flags
+        given to GCC-XML, so sources preprocessed differently have different 
+        addresses."""
+        name, filename, kind = key
+        header = os.path.splitext(filename)[0] + '.h'
+        s = repr((key, tuple(includes), self.hash(filename), self.hash(header), 
+                  self.gccxml_version(), xdress_version))
+        return md5(s).hexdigest()
+
+    def _entryfile(self, key):
+        address = self._addresses.get(key, None) or self.address(key)
+        return os.path.join(self.cachedir, 'entries', address[:2], address + '.pkl')
+
+    def _entryfiles(self, suffix='.pkl'):
+        """Lists the paths to all of the entry files on disk."""
+        entryfiles = []
+        for d, dirnames, fnames in os.walk(os.path.join(self.cachedir, 'entries')):
+            entryfiles += [os.path.join(d, f) for f in fnames if f.endswith(suffix)]
+        return sorted(entryfiles)
+
+    def _readkey(self, entryfile):
+        """Reads the key and owner (the checkout which wrote it) of an entry
+        file, or returns None if the file has gone away."""
+        try:
+            with open(entryfile, 'rb') as f:
+                return pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _load(self, key, includes=()):
+        """Returns the (dependencies, description) entry for a key compiled 
+        with the include directories, reading it from disk if needed, or None 
+        if there is no such entry.  Once read, the entry for the key is kept 
+        for the rest of the run, whose include directories do not change."""
+        if key in self.cache:
+            return self.cache[key]
+        entry = None
+        self._addresses[key] = self.address(key, includes)
+        entryfile = self._entryfile(key)
+        try:
+            with open(entryfile, 'rb') as f:
+                # the key is pickled on its own ahead of the entry
+                if pickle.load(f)[0] == key:
+                    entry = pickle.load(f)
+                    self._used.add(key)
+                    self._index(key)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            # missing, or removed by a concurrent gc
+            pass
+        self.cache[key] = entry
+        return entry
+
+    def _index(self, key):
+        """Records the address of the entry last used for a key."""
+        if self.index.get(key, None) != self._addresses[key]:
+            self.index[key] = self._addresses[key]
+            self._stats_dirty = True
+
+    def keys(self):
+        """Returns a list of all keys in the cache."""
+        keys = set([k for k, v in self.cache.items() if v is not None])
+        for entryfile in self._entryfiles():
+            header = self._readkey(entryfile)
+            if header is not None and header[0] not in self.cache:
+                keys.add(header[0])
+        return sorted(keys)
+
+    def hash(self, filename):
+        """The hash of a file's contents, None if the file does not exist.  
+        The file is stat'd first; its contents are only read and hashed if 
+        its (mtime, size, inode) differ from when it was last hashed.  
+        Hashes are also remembered for the rest of the run, so each file
+        is looked at no more than once."""
+        if filename in self._digests:
+            return self._digests[filename]
+        try:
+            st = os.stat(filename)
+        except OSError:
+            st = None
+        if st is None or not S_ISREG(st.st_mode):
+            digest = None
         else:
-            self.cache = {}
+            stat = (st.st_mtime, st.st_size, st.st_ino)
+            known = self.stats.get(filename, None)
+            if known is not None and known[0] == stat:
+                digest = known[1]
+            else:
+                with open(filename, 'rb') as f:
+                    digest = md5(f.read()).hexdigest()
+                # a file modified within the timestamp resolution of now may
+                # change again without changing its stat, so don't trust it
+                if st.st_mtime < time.time() - 2.0:
+                    self.stats[filename] = (stat, digest)
+                    self._stats_dirty = True
+        self._digests[filename] = digest
+        return digest
+
+    def _gccxml_stat(self):
+        """The (path, mtime, size, inode) of the gccxml executable, or None if 
+        it is not on the path."""
+        path = find_executable('gccxml')
+        try:
+            st = os.stat(path) if path is not None else None
+        except OSError:
+            st = None
+        return None if st is None else (path, st.st_mtime, st.st_size, st.st_ino)
+
+    def gccxml_version(self):
+        """The GCC-XML version, see autodescribe.gccxml_version().  It is kept
+        in the stats file along with the stat of the gccxml executable, so 
+        GCC-XML is only asked again once the executable changes."""
+        if len(self._gccxml_version) == 0:
+            stat = self._gccxml_stat()
+            if stat is None:
+                version = None
+            elif self._gccxml is not None and self._gccxml[0] == stat:
+                version = self._gccxml[1]
+            else:
+                version = autodescribe.gccxml_version()
+                if stat[1] < time.time() - 2.0:
+                    self._gccxml = (stat, version)
+                    self._stats_dirty = True
+            self._gccxml_version.append(version)
+        return self._gccxml_version[0]
+
+    def knows_gccxml_version(self):
+        """Whether the GCC-XML version is known without running GCC-XML: it 
+        was asked for already, gccxml is not on the path, or the version is
+        kept in the stats file for the current executable."""
+        if 0 < len(self._gccxml_version):
+            return True
+        stat = self._gccxml_stat()
+        return stat is None or (self._gccxml is not None and self._gccxml[0] == stat)
+
+    def forget_hashes(self):
+        """Forgets the hashes remembered during this run, e.g. after files 
+        have been modified."""
+        self._digests.clear()
+
+    def dependencies(self, filename, includes=(), files=()):
+        """Computes the current dependencies of a source file.
+
+        Parameters
+        ----------
+        filename : str
+            Path to the source file.
+        includes : sequence of str, optional
+            Include directories the file is compiled with.
+        files : sequence of str, optional
+            Paths to other files the source depends on, i.e. its include 
+            closure.  The header next to the source is always included.
+
+        Returns
+        -------
+        deps : dict
+            Dependency dictionary.
+
+        """
+        return {'files': autodescribe.include_closure(filename, files, self.hash), 
+                'includes': tuple(includes), 
+                'gccxml': self.gccxml_version(), 
+                'xdress': xdress_version}
 
-    def isvalid(self, name, filename, kind):
+    def isvalid(self, name, filename, kind, includes=()):
         """Boolean on whether the cach value for a (name, filename, kind)
-        tuple matches the state of the file on the system."""
-        key = (name, filename, kind)
-        if key not in self.cache:
+        tuple matches the state of the system: the contents of every file
+        the source depends on, the include directories and the versions of 
+        GCC-XML and xdress."""
+        entry = self._load((name, filename, kind), includes)
+        if entry is None:
             return False
-        cachehash = self.cache[key][0]
-        with open(filename, 'r') as f:
-            filestr = f.read()
-        currhash = md5(filestr).hexdigest()
-        return cachehash == currhash
+        cachedeps = entry[0]
+        currdeps = self.dependencies(filename, includes, cachedeps['files'])
+        return cachedeps == currdeps
+
+    def changes(self, name, filename, kind, includes=()):
+        """Lists the reasons why the cache value for a (name, filename, kind) 
+        tuple is not valid, see isvalid().  This is empty if it is valid.  
+        The reasons are found by comparing against the entry last used by this
+        checkout."""
+        entry = self._load_last((name, filename, kind), includes)
+        if entry is None:
+            return ['not in cache']
+        cachedeps = entry[0]
+        currdeps = self.dependencies(filename, includes, cachedeps['files'])
+        reasons = []
+        for f in sorted(currdeps['files']):
+            if currdeps['files'][f] == cachedeps['files'].get(f, None):
+                continue
+            elif currdeps['files'][f] is None:
+                reasons.append(f + ' removed')
+            else:
+                reasons.append(f + ' changed')
+        for dep, what in [('includes', 'include directories'), 
+                          ('gccxml', 'GCC-XML version'), ('xdress', 'xdress version')]:
+            if currdeps[dep] != cachedeps[dep]:
+                reasons.append(what + ' changed')
+        return reasons
+
+    def entry_dependencies(self, key):
+        """The dependencies recorded with the cache value of a key, see 
+        dependencies(), or None if there is no such entry."""
+        entry = self._load(key)
+        return None if entry is None else entry[0]
+
+    def _load_last(self, key, includes=()):
+        """Returns the entry for a key compiled with the include directories, 
+        or else the one last used by this checkout (e.g. before its sources 
+        changed), or None if there is neither."""
+        entry = self._load(key, includes)
+        if entry is None and key in self.index:
+            entryfile = os.path.join(self.cachedir, 'entries', self.index[key][:2], 
+                                     self.index[key] + '.pkl')
+            try:
+                with open(entryfile, 'rb') as f:
+                    if pickle.load(f)[0] == key:
+                        entry = pickle.load(f)
+            except (IOError, OSError, EOFError, pickle.UnpicklingError):
+                pass
+        return entry
+
+    def closure(self, key, includes=()):
+        """The current digests of the files in the include closure last 
+        recorded for a key, or None if there is no record.  The store of 
+        GCC-XML trees is keyed by these, see autodescribe.GccxmlStore.key()."""
+        entry = self._load_last(key, includes)
+        if entry is None:
+            return None
+        return autodescribe.include_closure(key[1], entry[0]['files'], self.hash)
+
+    def __contains__(self, key):
+        return self._load(key) is not None
 
     def __getitem__(self, key):
-        return self.cache[key][1]  # return the description only
+        entry = self._load(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry[1]  # return the description only
 
     def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def set(self, key, value, includes=(), files=()):
+        """Sets the description for a (name, filename, kind) key along with 
+        the dependencies of the source file, see dependencies()."""
         name, filename, kind = key
-        with open(filename, 'r') as f:
-            filestr = f.read()
-        currhash = md5(filestr).hexdigest()
-        self.cache[key] = (currhash, value)
+        self.cache[key] = (self.dependencies(filename, includes, files), value)
+        self._addresses[key] = self.address(key, includes)
+        self._index(key)
+        self._dirty.add(key)
 
     def __delitem__(self, key):
-        del self.cache[key]
+        if self._load(key) is None:
+            raise KeyError(key)
+        entryfile = self._entryfile(key)
+        self.cache[key] = None
+        self._dirty.discard(key)
+        if os.path.isfile(entryfile):
+            os.remove(entryfile)
 
     def dump(self):
-        """Writes the cache out to the filesystem."""
-        if not os.path.exists(self.cachefile):
-            pardir = os.path.split(self.cachefile)[0]
-            if not os.path.exists(pardir):
-                os.makedirs(pardir)
-        with open(self.cachefile, 'w') as f:
-            pickle.dump(self.cache, f, pickle.HIGHEST_PROTOCOL)
+        """Writes new and changed entries out to the filesystem."""
+        for key in sorted(self._dirty):
+            s = pickle.dumps((key, self.owner), pickle.HIGHEST_PROTOCOL) + \
+                pickle.dumps(self.cache[key], pickle.HIGHEST_PROTOCOL)
+            atomicwrite(s, self._entryfile(key))
+        # mark entries which were read as recently used
+        for key in self._used - self._dirty:
+            try:
+                os.utime(self._entryfile(key), None)
+            except OSError:
+                pass  # removed by a concurrent gc
+        self._dirty.clear()
+        self._used.clear()
+        if self._stats_dirty:
+            s = pickle.dumps({'stats': self.stats, 'index': self.index, 
+                              'gccxml': self._gccxml}, pickle.HIGHEST_PROTOCOL)
+            atomicwrite(s, self.statsfile)
+            self._stats_dirty = False
+
+    def gc(self, keep=None, maxsize=None, maxage=None, includes=()):
+        """Garbage collects the cache on disk.  Entries written by this 
+        checkout whose source files no longer exist or have since changed are 
+        always removed, as are the stats of missing files and temporary files
+        left behind by killed processes.  Entries written by other checkouts 
+        sharing the cache are only subject to the size and age bounds.
+
+        Parameters
+        ----------
+        keep : set of (name, filename, kind) tuples, optional
+            If given, entries written by this checkout whose keys are not in 
+            this set are removed, e.g. classes which have been renamed or 
+            dropped from the rc file.
+        maxsize : int, optional
+            Maximum total size of the entries [bytes].  The least recently 
+            used entries are evicted until the cache fits.
+        maxage : float, optional
+            Maximum time since an entry was last used [seconds].
+        includes : sequence of str, optional
+            Include directories the sources are compiled with, which the 
+            addresses of their current entries follow from, see address().
+
+        Returns
+        -------
+        reclaimed : list of (key, nbytes, reason) tuples
+            The entries that were removed.
+
+        """
+        self.dump()
+        now = time.time()
+        for tmpfile in self._entryfiles(suffix='.tmp'):
+            try:
+                if os.path.getmtime(tmpfile) < now - 3600.0:
+                    os.remove(tmpfile)
+            except OSError:
+                pass
+        entries = []
+        for entryfile in self._entryfiles():
+            header = self._readkey(entryfile)
+            try:
+                st = os.stat(entryfile)
+            except OSError:
+                continue
+            if header is not None:
+                entries.append((st.st_mtime, st.st_size, header, entryfile))
+        entries.sort()
+        reclaimed = []
+        live = []
+        for mtime, size, (key, owner), entryfile in entries:
+            mine = (owner == self.owner)
+            if mine and not os.path.isfile(key[1]):
+                reason = 'source file missing'
+            elif mine and keep is not None and key not in keep:
+                reason = 'no longer requested'
+            elif mine and os.path.basename(entryfile) != \
+                          self.address(key, includes) + '.pkl':
+                reason = 'source changed'
+            else:
+                live.append((mtime, size, key, entryfile))
+                continue
+            reclaimed.append((key, size, reason, entryfile))
+        reclaimed += lruevict(live, maxsize=maxsize, maxage=maxage, 
+                              bound='cache size bound')
+        for key, size, reason, entryfile in reclaimed:
+            try:
+                os.remove(entryfile)
+            except OSError:
+                pass  # removed by a concurrent gc
+            if self._addresses.get(key, None) is not None and \
+               self._entryfile(key) == entryfile:
+                self.cache[key] = None
+            if self.index.get(key, None) == os.path.basename(entryfile)[:-4]:
+                del self.index[key]
+                self._stats_dirty = True
+        for filename in self.stats.keys():
+            if not os.path.isfile(filename):
+                del self.stats[filename]
+                self._stats_dirty = True
+        self.dump()
+        return [(key, size, reason) for key, size, reason, entryfile in reclaimed]
 
     def __str__(self):
         from pprint import pformat
-        return pformat(self.cache)
+        return pformat(dict([(k, self._load(k)) for k in self.keys()]))
 
 
-# singleton
+# singleton, replaced in main() according to the run control settings
 cache = DescriptionCache()
 
 pysrcenv = {}
@@ -208,13 +601,14 @@ def load_pysrcmod(srcname, ns, rc):
     if os.path.isfile(pyfilename):
         glbs = globals()
         locs = {}
-        execfile(pyfilename, glbs, locs)
-        if 'mod' not in locs:
-            pymod = {}
-        elif callable(locs['mod']):
-            pymod = eval('mod()', glbs, locs)
-        else:
-            pymod = locs['mod']
+        with profiler.stage('sidecar ' + pyfilename, 'sidecar'):
+            execfile(pyfilename, glbs, locs)
+            if 'mod' not in locs:
+                pymod = {}
+            elif callable(locs['mod']):
+                pymod = eval('mod()', glbs, locs)
+            else:
+                pymod = locs['mod']
     else:
         pymod = {}
     pysrcenv[srcname] = pymod
@@ -245,13 +639,21 @@ def compute_desc(name, srcname, tarname, kind, ns, rc):
     """
     # C++ description
     cppfilename = os.path.join(rc.sourcedir, srcname + '.cpp')
-    if cache.isvalid(name, cppfilename, kind):
+    includes = ns.includes + rc.includes
+    if cache.isvalid(name, cppfilename, kind, includes):
         cppdesc = cache[name, cppfilename, kind]
     else:
+        t0 = time.time()
+        closure = cache.closure((name, cppfilename, kind), includes)
+        units = cache.translation_units
         cppdesc = autodescribe.describe(cppfilename, name=name, kind=kind,
-                                        includes=ns.includes + rc.includes,
-                                        verbose=ns.verbose)
-        cache[name, cppfilename, kind] = cppdesc
+                                        includes=includes, verbose=ns.verbose, 
+                                        builddir=rc.builddir, closure=closure, 
+                                        units=units)
+        files = autodescribe.gccxml_translation_unit(cppfilename, includes, 
+                                                     units=units).files
+        timings['describe', (name, cppfilename, kind)] = time.time() - t0
+        cache.set((name, cppfilename, kind), cppdesc, includes, files)
 
     # python description
     pydesc = pysrcenv[srcname].get(name, {})
@@ -259,18 +661,233 @@ def compute_desc(name, srcname, tarname, kind, ns, rc):
     #if tarname is None:
     #    tarname = "<dont-build>"
 
-    desc = autodescribe.merge_descriptions([cppdesc, pydesc])
+    with profiler.stage('merge ' + name, 'merge'):
+        desc = autodescribe.merge_descriptions([cppdesc, pydesc])
     desc['cpp_filename'] = '{0}.cpp'.format(srcname)
     desc['header_filename'] = '{0}.h'.format(srcname)
     desc['metadata_filename'] = '{0}.py'.format(srcname)
-    if tarname is None:
-        desc['pxd_filename'] = desc['pyx_filename'] = desc['cpppxd_filename'] = None
-    else:
-        desc['pxd_filename'] = '{0}.pxd'.format(tarname)
-        desc['pyx_filename'] = '{0}.pyx'.format(tarname)
-        desc['cpppxd_filename'] = 'cpp_{0}.pxd'.format(tarname)
+    desc.update(_target_filenames(tarname))
+    _intern_types(desc)
     return desc
 
+def _target_filenames(tarname):
+    """The names of the files the bindings of a target are generated into."""
+    if tarname is None:
+        return {'cpppxd_filename': None, 'pxd_filename': None, 'pyx_filename': None}
+    return {'cpppxd_filename': 'cpp_{0}.pxd'.format(tarname), 
+            'pxd_filename': '{0}.pxd'.format(tarname), 
+            'pyx_filename': '{0}.pyx'.format(tarname)}
+
+def _intern_types(desc):
+    """Replaces the types in a description with their interned instances, see
+    typesystem.intern_type(), so that they are compared by identity during code
+    generation and are shared between descriptions."""
+    for key in ('attrs', 'methods', 'signatures'):
+        if key in desc:
+            desc[key] = dict([(ts.intern_type(k), ts.intern_type(v)) 
+                              for k, v in desc[key].items()])
+
+def _init_worker():
+    """Process pool initializer which drops the profiling records and manifest
+    updates that a forked worker inherits from the main process, so that it 
+    sends back only its own."""
+    profiler.pop_events()
+    memprofiler.records = []
+    manifest.pop_updates()
+
+def worker_pool(processes, **kwargs):
+    """Returns a pool of worker processes, see _init_worker()."""
+    return multiprocessing.Pool(processes=processes, initializer=_init_worker, 
+                                **kwargs)
+
+def _describe_srcfile(args):
+    """Process pool worker which describes all of the requested names coming 
+    from a single source file.  Returns a list of ((name, filename, kind), 
+    description, time) tuples in the requested order, the include closure 
+    of the file, and the events recorded by the profiler."""
+    cppfilename, names, includes, verbose, builddir, closure = args
+    descs = []
+    units = {}
+    for name, kind in names:
+        t0 = time.time()
+        with profiler.stage('describe ' + name, 'describe', file=cppfilename):
+            desc = autodescribe.describe(cppfilename, name=name, kind=kind, 
+                                         includes=includes, verbose=verbose, 
+                                         builddir=builddir, closure=closure, 
+                                         units=units)
+        descs.append(((name, cppfilename, kind), desc, time.time() - t0))
+    files = autodescribe.gccxml_translation_unit(cppfilename, includes, 
+                                                 units=units).files
+    return descs, files, profiler.pop_events()
+
+def describe_parallel(ns, rc):
+    """Computes the C++ descriptions of all classes and functions which are not
+    already in the description cache, one source file per task, using a pool of
+    ns.jobs worker processes.  Each worker runs at most one gccxml subprocess at
+    a time, so ns.jobs also bounds the number of concurrent gccxml runs.  Workers 
+    are replaced after every source file so that the memory held by parsed trees
+    is returned.  The results are stored in the cache in source file order; 
+    compute_desc() then finds them there, so the output is the same as for a 
+    serial run.
+    """
+    todo = {}
+    includes = ns.includes + rc.includes
+    items = [(name, srcname, 'class') for name, srcname, _ in rc.classes] + \
+            [(name, srcname, 'func') for name, srcname, _ in rc.functions]
+    for name, srcname, kind in items:
+        cppfilename = os.path.join(rc.sourcedir, srcname + '.cpp')
+        if cache.isvalid(name, cppfilename, kind, includes):
+            continue
+        names = todo.setdefault(cppfilename, [])
+        if (name, kind) not in names:
+            names.append((name, kind))
+    if len(todo) == 0:
+        return
+    # the names from a source file share its include closure
+    tasks = [(f, todo[f], includes, ns.verbose, rc.builddir, 
+              cache.closure((todo[f][0][0], f, todo[f][0][1]), includes)) 
+             for f in sorted(todo)]
+    print("describing {0} source files with {1} jobs".format(len(tasks), ns.jobs))
+    pool = worker_pool(min(ns.jobs, len(tasks)), maxtasksperchild=1)
+    try:
+        for descs, files, events in pool.imap(_describe_srcfile, tasks):
+            profiler.events += events
+            for key, desc, t in descs:
+                timings['describe', key] = t
+                cache.set(key, desc, includes, files)
+    finally:
+        pool.close()
+        pool.join()
+    cache.dump()
+
+# wall times [s] of past runs, keyed by ('describe', (name, filename, kind)) 
+# and ('generate', target) tuples
+timings = {}
+
+def load_fingerprints(rc):
+    """Loads the fingerprints of the targets generated by previous runs."""
+    fpfile = os.path.join(rc.builddir, 'fingerprints.pkl')
+    if not os.path.isfile(fpfile):
+        return {}
+    with open(fpfile, 'rb') as f:
+        return pickle.load(f)
+
+def dump_fingerprints(fps, rc):
+    """Writes out the fingerprints of the generated targets."""
+    fpfile = os.path.join(rc.builddir, 'fingerprints.pkl')
+    atomicwrite(pickle.dumps(fps, pickle.HIGHEST_PROTOCOL), fpfile)
+
+def load_timings(rc):
+    """Loads the timings of previous runs into the timings dict."""
+    tfile = os.path.join(rc.builddir, 'timings.pkl')
+    if os.path.isfile(tfile):
+        with open(tfile, 'rb') as f:
+            timings.update(pickle.load(f))
+
+def dump_timings(rc):
+    """Writes out the timings dict."""
+    tfile = os.path.join(rc.builddir, 'timings.pkl')
+    atomicwrite(pickle.dumps(timings, pickle.HIGHEST_PROTOCOL), tfile)
+
+def _strings(x, strs):
+    """Adds all of the strings in a nested description to strs."""
+    if isinstance(x, basestring):
+        strs.add(x)
+    elif isinstance(x, dict):
+        for k, v in x.items():
+            _strings(k, strs)
+            _strings(v, strs)
+    elif isinstance(x, (list, tuple, set, frozenset)):
+        for y in x:
+            _strings(y, strs)
+    return strs
+
+def fingerprint(x, names, rc, sidecars=()):
+    """Computes the fingerprint of generated code from the object it is 
+    generated from (and the package it is generated into), the sidecar files
+    that went into it, the type system registrations of the type names it 
+    uses, and xdress itself (its version and the source of its code 
+    generators).  Code which has the same fingerprint as when it was last 
+    written out need not be generated again.  The fingerprint is a dict 
+    with a digest for each of these parts, so that what changed may be told.
+    """
+    return {'descriptions': md5(stablerepr((x, rc.package))).hexdigest(), 
+            'sidecars': md5(repr([(f, cache.hash(f)) for f in sidecars])).hexdigest(),
+            'typesystem': ts.fingerprint(names), 
+            'xdress': _xdress_digest(),}
+
+def _xdress_digest():
+    """Digests the xdress version and the source of its code generators."""
+    srcs = [os.path.splitext(m.__file__)[0] + '.py' for m in (cythongen, stlwrap, ts)]
+    return md5(repr((xdress_version, [cache.hash(src) for src in srcs]))).hexdigest()
+
+def _ancestors(mod, classes):
+    """Lists the names of the classes which the classes of a target module 
+    inherit from, as far as they are described."""
+    ancestors = []
+    parents = [desc['parents'] for desc in mod.values() 
+               if isinstance(desc, dict) and desc.get('parents', None)]
+    seen = set()
+    while 0 < len(parents):
+        for p in parents.pop():
+            if p in seen or p not in classes:
+                continue
+            seen.add(p)
+            ancestors.append(p)
+            parents.append(classes[p]['parents'] or ())
+    return ancestors
+
+def target_fingerprint(mod, classes, rc):
+    """Computes the fingerprint of a target module from its merged descriptions 
+    (and so the sidecar contents) and those of the classes it inherits from, see
+    fingerprint()."""
+    descs = [mod] + [classes[p] for p in _ancestors(mod, classes)]
+    sidecars = sorted(set([os.path.join(rc.sourcedir, desc['metadata_filename']) 
+                           for desc in mod.values() if isinstance(desc, dict) 
+                           and 'metadata_filename' in desc]))
+    return fingerprint(descs, _strings(descs, set()), rc, sidecars)
+
+def target_inputs(mod, classes, rc):
+    """Records what a target module is generated from in a form which plan()
+    can check without running GCC-XML or the sidecars: the dependencies of the
+    cached C++ descriptions of its classes and functions and of the classes 
+    they inherit from (see DescriptionCache.dependencies()), and the digest of 
+    the run control settings and the sidecars (see typesystem_snapshot_key()).
+    This is kept with the fingerprint of the target, but is coarser than it."""
+    items = [(name, desc, 'class' if classes.get(name, None) is desc else 'func') 
+             for name, desc in mod.items() if isinstance(desc, dict)]
+    items += [(p, classes[p], 'class') for p in _ancestors(mod, classes)]
+    keys = [(name, os.path.join(rc.sourcedir, desc['cpp_filename']), kind) 
+            for name, desc, kind in items if 'cpp_filename' in desc]
+    return {'sources': dict([(key, cache.entry_dependencies(key)) for key in keys]),
+            'project': typesystem_snapshot_key(rc)}
+
+def _inputs_changes(old, includes, rc):
+    """Lists the reasons why a target generated from the inputs recorded in its 
+    old fingerprint is out of date, as far as target_inputs() tells, or an empty
+    list if it is not.  The GCC-XML version must be known, see 
+    DescriptionCache.knows_gccxml_version()."""
+    if old is None:
+        return ['not generated before']
+    elif 'sources' not in old:
+        return ['unknown (no cache)']
+    reasons = []
+    for (name, filename, kind), deps in sorted(old['sources'].items()):
+        if deps is None or deps != cache.dependencies(filename, includes, deps['files']):
+            reasons.append('description of {0} changed'.format(name))
+    if old['project'] != typesystem_snapshot_key(rc):
+        reasons.append('run control or sidecars changed')
+    if old['xdress'] != _xdress_digest():
+        reasons.append('xdress changed')
+    return reasons
+
+def fingerprint_changes(old, new):
+    """Lists the reasons why generated code with the old fingerprint is out
+    of date, or an empty list if it is not."""
+    if old is None:
+        return ['not generated before']
+    return [part + ' changed' for part in sorted(new) if old.get(part, None) != new[part]]
+
 def genextratypes(ns, rc):
     d = os.path.split(__file__)[0]
     srcs = [os.path.join(d, 'xdress_extra_types.h'), 
@@ -285,14 +902,37 @@ def genextratypes(ns, rc):
             s = s.format(extra_types=rc.extra_types)
             newoverwrite(s, tar)
 
+def stlcontainers_fingerprint(rc):
+    """Computes the fingerprint of the STL container wrappers, see fingerprint(),
+    and lists their output files."""
+    fname = os.path.join(rc.packagedir, rc.stlcontainers_module)
+    testname = os.path.join(rc.packagedir, 'tests', 'test_' + rc.stlcontainers_module)
+    for t in rc.stlcontainers:
+        if t[0] == 'vector':
+            ts.register_numpy_dtype(t[1])
+    fp = fingerprint((rc.stlcontainers, fname, testname), 
+                     _strings(rc.stlcontainers, set()), rc)
+    return fp, [fname + '.pyx', fname + '.pxd', testname + '.py']
+
 def genstlcontainers(ns, rc):
-    print "generating C++ standard library wrappers & converters"
     fname = os.path.join(rc.packagedir, rc.stlcontainers_module)
-    ensuredirs(fname)
     testname = os.path.join(rc.packagedir, 'tests', 'test_' + rc.stlcontainers_module)
+    fps = load_fingerprints(rc)
+    fp, outputs = stlcontainers_fingerprint(rc)
+    if fps.get('stlcontainers', None) == fp and not _outputs_changes(outputs):
+        return
+    print "generating C++ standard library wrappers & converters"
+    memprofiler.snapshot('before stlwrap')
+    t0 = time.time()
+    ensuredirs(fname)
     ensuredirs(testname)
-    stlwrap.genfiles(rc.stlcontainers, fname=fname, testname=testname, 
-                     package=rc.package)
+    with profiler.stage('stlwrap ' + rc.stlcontainers_module, 'stlwrap'):
+        stlwrap.genfiles(rc.stlcontainers, fname=fname, testname=testname, 
+                         package=rc.package)
+    memprofiler.snapshot('after stlwrap')
+    timings['generate', 'stlcontainers'] = time.time() - t0
+    fps['stlcontainers'] = fp
+    dump_fingerprints(fps, rc)
 
 
 def _adddesc2env(desc, env, name, srcname, tarname):
@@ -310,85 +950,319 @@ def _adddesc2env(desc, env, name, srcname, tarname):
         env[tarname].update(mod)
         env[tarname]['extra'] += pysrcenv[srcname].get('extra', '')
 
-def genbindings(ns, rc):
-    """Generates bidnings using the command line setting specified in ns.
-    """
-    ns.cyclus = False  # FIXME cyclus bindings don't exist yet!
+def _fill_targets(rc):
+    """Fills in the target names of rc.classes and rc.functions which are only 
+    given their source names."""
     for i, cls in enumerate(rc.classes):
         if len(cls) == 2:
             rc.classes[i] = (cls[0], cls[1], cls[1])
-        load_pysrcmod(cls[1], ns, rc)        
     for i, fnc in enumerate(rc.functions):
         if len(fnc) == 2:
             rc.functions[i] = (fnc[0], fnc[1], fnc[1])
-        load_pysrcmod(fnc[1], ns, rc)
+
+def resolve_targets(ns, rc):
+    """Fills in the target names of rc.classes and rc.functions, then loads the
+    sidecars of their source files and registers the dtypes of the STL vectors,
+    unless all of this is restored from a type system snapshot (see 
+    load_typesystem_snapshot()).  Returns whether it was restored, in which case
+    the classes need not be registered either."""
+    _fill_targets(rc)
+    if load_typesystem_snapshot(rc):
+        return True
+    for x in rc.classes + rc.functions:
+        load_pysrcmod(x[1], ns, rc)        
     # register dtypes
     for t in rc.stlcontainers:
         if t[0] == 'vector':
             ts.register_numpy_dtype(t[1])
+    return False
+
+def typesystem_snapshot_key(rc):
+    """Computes a digest of everything that the type system registrations of a
+    run follow from: the run control settings, the sidecars, and xdress itself
+    (its version and the source of the type system and of this module)."""
+    settings = [getattr(rc, k, None) for k in ('package', 'packagedir', 'sourcedir', 
+                'classes', 'functions', 'extra_types', 'stlcontainers', 
+                'stlcontainers_module')]
+    srcnames = sorted(set([x[1] for x in rc.classes + rc.functions]))
+    sidecars = [os.path.join(rc.sourcedir, srcname + '.py') for srcname in srcnames]
+    srcs = [os.path.splitext(f)[0] + '.py' for f in (ts.__file__, __file__)]
+    return md5(stablerepr((ts.SNAPSHOT_VERSION, xdress_version, 
+                           [cache.hash(src) for src in srcs], settings, 
+                           [(f, cache.hash(f)) for f in sidecars]))).hexdigest()
+
+def load_typesystem_snapshot(rc):
+    """Restores the type system registries (and memos) and the sidecar modules 
+    from the snapshot written by a previous run, if it was taken with the same
+    key, see typesystem_snapshot_key().  Returns whether it was restored."""
+    if not rc.typesystem_snapshot:
+        return False
+    snapfile = os.path.join(rc.builddir, 'typesystem.snapshot')
+    try:
+        with open(snapfile, 'rb') as f:
+            # the key is pickled on its own ahead of the snapshot
+            if pickle.load(f) != typesystem_snapshot_key(rc):
+                return False
+            snap = pickle.load(f)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError):
+        return False
+    with profiler.stage('restore typesystem snapshot', 'snapshot'):
+        if not ts.restore(snap['typesystem']):
+            return False
+        if snap['pysrcenv'] is None:
+            for x in rc.classes + rc.functions:
+                load_pysrcmod(x[1], None, rc)
+        else:
+            pysrcenv.update(snap['pysrcenv'])
+    return True
+
+def dump_typesystem_snapshot(rc):
+    """Writes out a snapshot of the type system, with the memoized results if 
+    rc.typesystem_snapshot_memo is set, and of the sidecar modules, which may 
+    be restored by the next run with the same key."""
+    if not rc.typesystem_snapshot:
+        return
+    snapfile = os.path.join(rc.builddir, 'typesystem.snapshot')
+    with profiler.stage('dump typesystem snapshot', 'snapshot'):
+        snap = {'typesystem': ts.snapshot(memo=rc.typesystem_snapshot_memo), 
+                'pysrcenv': pysrcenv}
+        try:
+            s = pickle.dumps(snap, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # sidecar modules holding functions and such are run again instead
+            snap['pysrcenv'] = None
+            s = pickle.dumps(snap, pickle.HIGHEST_PROTOCOL)
+        ensuredirs(snapfile)
+        atomicwrite(pickle.dumps(typesystem_snapshot_key(rc), 
+                                 pickle.HIGHEST_PROTOCOL) + s, snapfile)
+
+def register_class_type(classname, srcname, tarname, rc):
+    """Registers a wrapped class with the type system."""
+    #pxd_base = desc['pxd_filename'].rsplit('.', 1)[0]         # eg, fccomp
+    pxd_base = tarname or srcname  # eg, fccomp
+    #cpppxd_base = desc['cpppxd_filename'].rsplit('.', 1)[0]   # eg, cpp_fccomp
+    cpppxd_base = 'cpp_' + (tarname or srcname)   # eg, cpp_fccomp
+    class_c2py = ('{pytype}({var})', 
+                  ('{proxy_name} = {pytype}()\n'
+                   '(<{ctype} *> {proxy_name}._inst)[0] = {var}'),
+                  ('if {cache_name} is None:\n'
+                   '    {proxy_name} = {pytype}()\n'
+                   '    {proxy_name}._free_inst = False\n'
+                   '    {proxy_name}._inst = &{var}\n'
+                   '    {cache_name} = {proxy_name}\n')
+                 )
+    class_py2c = ('{proxy_name} = <{cytype}> {var}', '(<{ctype} *> {proxy_name}._inst)[0]')
+    class_cimport = (rc.package, cpppxd_base) 
+    ts.register_class(classname,                              # FCComp
+        cython_c_type=cpppxd_base + '.' + classname,          # cpp_fccomp.FCComp
+        cython_cimport=class_cimport,  
+        cython_cy_type=pxd_base + '.' + classname,            # fccomp.FCComp   
+        cython_py_type=pxd_base + '.' + classname,            # fccomp.FCComp   
+        cython_template_class_name=classname.replace('_', '').capitalize(),
+        cython_cyimport=pxd_base,                             # fccomp
+        cython_pyimport=pxd_base,                             # fccomp
+        cython_c2py=class_c2py,
+        cython_py2c=class_py2c,
+        )
+
+def _emit(emit, filename, package, emitters):
+    """Streams the source of a target into a new emitter by calling 
+    emit(emitter), unless the target has no such file."""
+    if filename is None:
+        return
+    e = Emitter(os.path.join(package, filename))
+    emitters.append((filename, e))
+    emit(e)
+    e.close()
+
+def _emit_target(key, mod, classes, package):
+    """Generates the Cython sources of a single target straight into emitters, 
+    one at a time and without joining each of them into a string first.  
+    Returns the (filename, emitter) pairs, which are closed but not yet 
+    committed."""
+    emitters = []
+    try:
+        with profiler.stage('gencpppxd ' + str(key), 'gencpppxd'):
+            _emit(lambda e: emitcpppxd(mod, e), mod['cpppxd_filename'], 
+                  package, emitters)
+        with profiler.stage('genpxd ' + str(key), 'genpxd'):
+            _emit(lambda e: emitpxd(mod, e), mod['pxd_filename'], 
+                  package, emitters)
+        with profiler.stage('genpyx ' + str(key), 'genpyx'):
+            _emit(lambda e: emitpyx(mod, e, classes), mod['pyx_filename'], 
+                  package, emitters)
+    except:
+        for filename, e in emitters:
+            e.discard()
+        raise
+    return emitters
+
+def _commit_target(emitters):
+    """Commits the emitters of a target, leaving unchanged files untouched."""
+    try:
+        for filename, e in emitters:
+            with profiler.stage('write ' + filename, 'write'):
+                e.commit()
+    finally:
+        for filename, e in emitters:
+            e.discard()  # no-op once committed
+
+def generate_serial(targets, classes, rc):
+    """Generates the Cython sources of the targets, a dict mapping target names
+    to module descriptions, and writes them out into rc.package.  The sources 
+    are streamed to temporary files as they are generated, which replace the 
+    targets only once all of them have been generated, so that an error leaves 
+    none of the targets half written.
+    """
+    emitters = {}
+    try:
+        for key in sorted(targets):
+            t0 = time.time()
+            emitters[key] = _emit_target(key, targets[key], classes, rc.package)
+            timings['generate', key] = time.time() - t0
+        memprofiler.snapshot('after generating cython')
+        for key in sorted(targets):
+            _commit_target(emitters.pop(key))
+    finally:
+        for es in emitters.values():
+            for filename, e in es:
+                e.discard()
+
+# the targets and classes of generate_parallel(), which its forked workers
+# inherit rather than unpickling them for every target
+_codegen = {}
+
+def _generate_target(key):
+    """Process pool worker which generates the Cython sources of a single 
+    target and writes them out.  Returns the target name, the generation time,
+    the events recorded by the profiler, and the updates to the manifest."""
+    mod = _codegen['targets'][key]
+    t0 = time.time()
+    emitters = _emit_target(key, mod, _codegen['classes'], _codegen['package'])
+    t = time.time() - t0
+    _commit_target(emitters)
+    return key, t, profiler.pop_events(), manifest.pop_updates()
+
+def generate_parallel(targets, classes, ns, rc):
+    """Generates the Cython sources of the targets, a dict mapping target names
+    to module descriptions, and writes them out into rc.package, using a pool 
+    of ns.jobs worker processes.  Each target depends only on its own 
+    description and the classes, so each worker generates and writes out whole
+    targets, slowest first according to the timings of past runs.  The files 
+    are the same as for a serial run and the timings and profiler events are 
+    merged in target order.  The workers are forked, so that they inherit the 
+    type system registrations, but their memoized results are not sent back.
+    """
+    keys = sorted(targets, key=lambda k: (-timings.get(('generate', k), 0.0), k))
+    print("generating {0} targets with {1} jobs".format(len(keys), ns.jobs))
+    _codegen.update(targets=targets, classes=classes, package=rc.package)
+    pool = worker_pool(min(ns.jobs, len(keys)))
+    try:
+        results = sorted(pool.imap_unordered(_generate_target, keys))
+    finally:
+        pool.close()
+        pool.join()
+        _codegen.clear()
+    for key, t, events, updates in results:
+        timings['generate', key] = t
+        profiler.events += events
+        manifest.merge(updates)
+    memprofiler.snapshot('after generating cython')
+
+def _target_outputs(mod, rc):
+    return [os.path.join(rc.package, mod[k]) for k in ('cpppxd_filename', 
+            'pxd_filename', 'pyx_filename') if mod[k] is not None]
+
+def _outputs_changes(outputs):
+    """Lists the reasons why the generated output files are not as they were 
+    written, or an empty list if they are.  Modified files are told from the 
+    manifest, without reading those whose stat has not changed."""
+    reasons = []
+    if not all(map(os.path.isfile, outputs)):
+        reasons.append('outputs missing')
+    if any([manifest.ismodified(f) for f in outputs if os.path.isfile(f)]):
+        reasons.append('outputs modified')
+    return reasons
+
+def genbindings(ns, rc):
+    """Generates bidnings using the command line setting specified in ns.
+    """
+    ns.cyclus = False  # FIXME cyclus bindings don't exist yet!
+    memprofiler.snapshot('start genbindings')
+    restored = resolve_targets(ns, rc)
+    memprofiler.snapshot('after sidecars', sidecars=pysrcenv)
+
+    # describe independent source files concurrently, filling the cache
+    if ns.jobs > 1:
+        describe_parallel(ns, rc)
+        memprofiler.snapshot('after parallel describe')
 
     # compute all class descriptions first 
     classes = {}
     env = {}  # target environment, not source one
     for classname, srcname, tarname in rc.classes:
         print("parsing " + classname)
-        desc = classes[classname] = compute_desc(classname, srcname, tarname, 
-                                                 'class', ns, rc)
+        with profiler.stage('describe ' + classname, 'describe', file=srcname):
+            desc = classes[classname] = compute_desc(classname, srcname, tarname, 
+                                                     'class', ns, rc)
         if ns.verbose:
             pprint(desc)
 
-        print("registering " + classname)
-        #pxd_base = desc['pxd_filename'].rsplit('.', 1)[0]         # eg, fccomp
-        pxd_base = tarname or srcname  # eg, fccomp
-        #cpppxd_base = desc['cpppxd_filename'].rsplit('.', 1)[0]   # eg, cpp_fccomp
-        cpppxd_base = 'cpp_' + (tarname or srcname)   # eg, cpp_fccomp
-        class_c2py = ('{pytype}({var})', 
-                      ('{proxy_name} = {pytype}()\n'
-                       '(<{ctype} *> {proxy_name}._inst)[0] = {var}'),
-                      ('if {cache_name} is None:\n'
-                       '    {proxy_name} = {pytype}()\n'
-                       '    {proxy_name}._free_inst = False\n'
-                       '    {proxy_name}._inst = &{var}\n'
-                       '    {cache_name} = {proxy_name}\n')
-                     )
-        class_py2c = ('{proxy_name} = <{cytype}> {var}', '(<{ctype} *> {proxy_name}._inst)[0]')
-        class_cimport = (rc.package, cpppxd_base) 
-        ts.register_class(classname,                              # FCComp
-            cython_c_type=cpppxd_base + '.' + classname,          # cpp_fccomp.FCComp
-            cython_cimport=class_cimport,  
-            cython_cy_type=pxd_base + '.' + classname,            # fccomp.FCComp   
-            cython_py_type=pxd_base + '.' + classname,            # fccomp.FCComp   
-            cython_template_class_name=classname.replace('_', '').capitalize(),
-            cython_cyimport=pxd_base,                             # fccomp
-            cython_pyimport=pxd_base,                             # fccomp
-            cython_c2py=class_c2py,
-            cython_py2c=class_py2c,
-            )
+        if not restored:
+            print("registering " + classname)
+            with profiler.stage('register ' + classname, 'register_class'):
+                register_class_type(classname, srcname, tarname, rc)
         cache.dump()
         _adddesc2env(desc, env, classname, srcname, tarname)
 
     # then compute all function descriptions
     for funcname, srcname, tarname in rc.functions:
-        print("parsing " + classname)
-        desc = compute_desc(funcname, srcname, tarname, 'func', ns, rc)
+        print("parsing " + funcname)
+        with profiler.stage('describe ' + funcname, 'describe', file=srcname):
+            desc = compute_desc(funcname, srcname, tarname, 'func', ns, rc)
         if ns.verbose:
             pprint(desc)
         cache.dump()
         _adddesc2env(desc, env, funcname, srcname, tarname)
-
-    # next, make cython bindings
-    # generate first, then write out to ensure this is atomic per-class
+    memprofiler.snapshot('after describe', descriptions=env)
+    # all descriptions are in hand, release the parsed GCC-XML trees
+    cache.translation_units.clear()
+    memprofiler.snapshot('after releasing GCC-XML trees')
+    if rc.desc_cache_maxsize is not None or rc.desc_cache_maxage is not None:
+        cache.gc(maxsize=rc.desc_cache_maxsize, maxage=rc.desc_cache_maxage, 
+                 includes=ns.includes + rc.includes)
+    if rc.gccxml_store_maxsize is not None or rc.gccxml_store_maxage is not None:
+        gccxml_store(rc).gc(maxsize=rc.gccxml_store_maxsize, 
+                            maxage=rc.gccxml_store_maxage)
+
+    # next, make cython bindings for the targets which have changed
     if ns.cython:
-        print("making cython bindings")
-        cpppxds = gencpppxd(env)
-        pxds = genpxd(env)
-        pyxs = genpyx(env, classes)
-        for key, cpppxd in cpppxds.iteritems():
-            newoverwrite(cpppxd, os.path.join(rc.package, env[key]['cpppxd_filename']))
-        for key, pxd in pxds.iteritems():
-            newoverwrite(pxd, os.path.join(rc.package, env[key]['pxd_filename']))
-        for key, pyx in pyxs.iteritems():
-            newoverwrite(pyx, os.path.join(rc.package, env[key]['pyx_filename']))
+        fps = load_fingerprints(rc)
+        newfps = {}
+        changed = {}
+        for key, mod in env.iteritems():
+            fp = target_fingerprint(mod, classes, rc)
+            if fingerprint_changes(fps.get(key, None), fp) or \
+               _outputs_changes(_target_outputs(mod, rc)):
+                changed[key] = mod
+            newfps[key] = dict(fp, **target_inputs(mod, classes, rc))
+        if 0 < len(changed):
+            print("making cython bindings")
+        if ns.jobs > 1 and 1 < len(changed) and hasattr(os, 'fork'):
+            # the workers inherit the type system registrations by forking
+            generate_parallel(changed, classes, ns, rc)
+        else:
+            generate_serial(changed, classes, rc)
+        # every target is now up to date with its inputs, keep them for plan()
+        fps = load_fingerprints(rc)
+        if any([fps.get(key, None) != fp for key, fp in newfps.items()]):
+            fps.update(newfps)
+            dump_fingerprints(fps, rc)
+        memprofiler.snapshot('after writing cython')
+
+    # the registries, and the memos warmed up by generating, for the next run
+    if not restored or (ns.cython and 0 < len(changed)):
+        dump_typesystem_snapshot(rc)
 
     # next, make cyclus bindings
     if ns.cyclus:
@@ -397,12 +1271,131 @@ def genbindings(ns, rc):
 def dumpdesc(ns):
     """Prints the current contents of the description cache using ns.
     """
-    print str(DescriptionCache())
+    print str(cache)
+
+def _estimate(keys):
+    """Sums the past timings of keys, returning the total and the number of 
+    keys for which there is no timing."""
+    known = [timings[k] for k in keys if k in timings]
+    return sum(known), len(keys) - len(known)
+
+def _fmtestimate(t, nunknown):
+    if 0 == nunknown:
+        return "{0:.2f} s".format(t)
+    elif 0.0 == t:
+        return "unknown"
+    return "{0:.2f} s + {1} unknown".format(t, nunknown)
+
+def plan(ns, rc):
+    """Prints what a run would do and why without running GCC-XML or the 
+    sidecars, or writing any files: which classes and functions would be 
+    re-described, which targets would be regenerated, and an estimate of the 
+    time this will take based on the timings of past runs.  This is told from
+    the description cache, and the fingerprints and inputs recorded for the 
+    targets by the last run (see target_inputs()).  Where the GCC-XML version 
+    is not known without running it, the answer is 'unknown (no cache)'.
+    """
+    # the STL containers are generated ahead of the bindings, before the 
+    # targets are resolved, so fingerprint them in the same order
+    regenerate = []
+    fps = load_fingerprints(rc)
+    if ns.stlcont:
+        fp, outputs = stlcontainers_fingerprint(rc)
+        reasons = fingerprint_changes(fps.get('stlcontainers', None), fp)
+        reasons += _outputs_changes(outputs)
+        if 0 < len(reasons):
+            regenerate.append(('stlcontainers', reasons))
+
+    _fill_targets(rc)
+    includes = ns.includes + rc.includes
+    known = cache.knows_gccxml_version()
+    redescribe = []
+    targets = set()
+    pending = {}  # targets with descriptions to be computed
+    items = [(name, srcname, tarname, 'class') for name, srcname, tarname in rc.classes] + \
+            [(name, srcname, tarname, 'func') for name, srcname, tarname in rc.functions]
+    for name, srcname, tarname, kind in items:
+        cppfilename = os.path.join(rc.sourcedir, srcname + '.cpp')
+        if known:
+            reasons = cache.changes(name, cppfilename, kind, includes)
+        else:
+            reasons = ['unknown (no cache)']
+        if 0 < len(reasons):
+            redescribe.append(((name, cppfilename, kind), reasons))
+            pending.setdefault(tarname, []).append(name)
+        targets.add(tarname)
+
+    if ns.cython:
+        for key in sorted(targets):
+            if not known:
+                reasons = ['unknown (no cache)']
+            elif key in pending:
+                reasons = ['descriptions of {0} will be recomputed'.format(
+                           ", ".join(pending[key]))]
+            else:
+                reasons = _inputs_changes(fps.get(key, None), includes, rc)
+                outputs = _target_outputs(_target_filenames(key), rc)
+                reasons += _outputs_changes(outputs)
+            if 0 < len(reasons):
+                regenerate.append((key, reasons))
+
+    print("re-describe {0} of {1} classes and functions:".format(len(redescribe), 
+                                                               len(items)))
+    for (name, filename, kind), reasons in redescribe:
+        t, nunknown = _estimate([('describe', (name, filename, kind))])
+        print("  {0} {1} from {2}: {3} [{4}]".format(kind, name, filename, 
+              ", ".join(reasons), _fmtestimate(t, nunknown)))
+    print("regenerate {0} targets:".format(len(regenerate)))
+    for key, reasons in regenerate:
+        t, nunknown = _estimate([('generate', key)])
+        print("  {0}: {1} [{2}]".format(key, ", ".join(reasons), 
+                                        _fmtestimate(t, nunknown)))
+    t, nunknown = _estimate([('describe', k) for k, r in redescribe] + 
+                            [('generate', k) for k, r in regenerate])
+    print("estimated time: " + _fmtestimate(t, nunknown))
+
+def gccxml_store(rc):
+    """Returns the store of GCC-XML trees in the build directory."""
+    return autodescribe.GccxmlStore(os.path.join(rc.builddir, 'gccxml'))
+
+def gccache(ns, rc):
+    """Garbage collects the description cache, removing the entries of classes
+    and functions which are no longer in the rc file or whose source files are
+    gone, and applying the cache size and age bounds.  The store of GCC-XML 
+    trees is held to its own size and age bounds.  Prints what was reclaimed.
+    """
+    keep = set()
+    for items, kind in [(rc.classes, 'class'), (rc.functions, 'func')]:
+        for item in items:
+            keep.add((item[0], os.path.join(rc.sourcedir, item[1] + '.cpp'), kind))
+    reclaimed = cache.gc(keep=keep, maxsize=rc.desc_cache_maxsize, 
+                         maxage=rc.desc_cache_maxage, includes=ns.includes + rc.includes)
+    for (name, filename, kind), nbytes, reason in reclaimed:
+        print("removed {0} {1} from {2} ({3} bytes): {4}".format(kind, name, 
+              filename, nbytes, reason))
+    print("reclaimed {0} description cache entries, {1:.1f} KiB".format(
+          len(reclaimed), sum([r[1] for r in reclaimed]) / 1024.0))
+    reclaimed = gccxml_store(rc).gc(maxsize=rc.gccxml_store_maxsize, 
+                                    maxage=rc.gccxml_store_maxage)
+    for key, nbytes, reason in reclaimed:
+        print("removed GCC-XML tree {0} ({1} bytes): {2}".format(key, nbytes, 
+                                                                 reason))
+    print("reclaimed {0} GCC-XML trees, {1:.1f} KiB".format(
+          len(reclaimed), sum([r[1] for r in reclaimed]) / 1024.0))
 
 
 defaultrc = dict(
     package='<xdtest-pkg>',
     packagedir='<xdtest-pkgdir>',
+    builddir='build',
+    desc_cache_dir=None,
+    desc_cache_maxsize=None,
+    desc_cache_maxage=None,
+    gccxml_store_maxsize=None,
+    gccxml_store_maxage=None,
+    memo_maxsize=None,
+    typesystem_snapshot=False,
+    typesystem_snapshot_memo=True,
     extra_types='xdress_extra_types',
     stlcontainers=[],
     stlcontainers_module='stlcontainers',
@@ -425,10 +1418,26 @@ def main():
                         default=True, help="don't make cyclus bindings")
     parser.add_argument('--dump-desc', action='store_true', dest='dumpdesc', 
                         default=False, help="print description cache")
+    parser.add_argument('--plan', action='store_true', dest='plan', default=False, 
+                        help="print what would be regenerated and why")
+    parser.add_argument('--gc-cache', action='store_true', dest='gccache', 
+                        default=False, help="garbage collect description cache")
     parser.add_argument('-I', action='store', dest='includes', nargs="+",
                         default=[], help="additional include dirs")
     parser.add_argument('-v', '--verbose', action='store_true', dest='verbose', 
                         default=False, help="print more output")
+    parser.add_argument('-j', '--jobs', action='store', dest='jobs', type=int, 
+                        default=1, help="number of concurrent gccxml and code "
+                        "generation processes")
+    parser.add_argument('--timings', action='store_true', dest='timings', 
+                        default=False, help="print a summary of stage timings")
+    parser.add_argument('--trace', action='store', dest='trace', default=None, 
+                        help="write a Chrome trace event file of the stages")
+    parser.add_argument('--memprofile', action='store', dest='memprofile', 
+                        default=None, help="write a memory profile of the stages")
+    parser.add_argument('--memo-stats', action='store_true', dest='memostats', 
+                        default=False, 
+                        help="print type system memoization statistics")
     ns = parser.parse_args()
 
     rc = dict(defaultrc)
@@ -439,19 +1448,62 @@ def main():
     # set typesystem defaults
     ts.EXTRA_TYPES = rc.extra_types
     ts.STLCONTAINERS = rc.stlcontainers_module
+    ts.set_memo_maxsize(rc.memo_maxsize)
+
+    # set up the description cache, which may be shared between checkouts
+    global cache
+    cachedir = rc.desc_cache_dir or os.path.join(rc.builddir, 'desccache')
+    cache = DescriptionCache(os.path.expanduser(cachedir), 
+                             statsfile=os.path.join(rc.builddir, 'desc.stats'))
+    load_timings(rc)
+    manifest.load(os.path.join(rc.builddir, 'manifest.pkl'))
 
     if ns.dumpdesc:
         dumpdesc(ns)
         return 
 
+    if ns.gccache:
+        gccache(ns, rc)
+        return 
+
+    if ns.plan:
+        plan(ns, rc)
+        return 
+
+    # the stages also tell which of them raised the peak RSS
+    if ns.timings or ns.trace is not None or ns.memprofile is not None:
+        profiler.enable()
+    if ns.memprofile is not None:
+        memprofiler.enable()
+        memprofiler.snapshot('start')
+
     if ns.extratypes:
-        genextratypes(ns, rc)
+        with profiler.stage('genextratypes', 'genextratypes'):
+            genextratypes(ns, rc)
 
     if ns.stlcont:
-        genstlcontainers(ns, rc)
+        with profiler.stage('genstlcontainers', 'genstlcontainers'):
+            genstlcontainers(ns, rc)
 
     if ns.cython or ns.cyclus:
-        genbindings(ns, rc)
+        with profiler.stage('genbindings', 'genbindings'):
+            genbindings(ns, rc)
+
+    dump_timings(rc)
+    for filename in manifest.modified:
+        print("warning: {0} was modified since it was generated and has been "
+              "regenerated".format(filename))
+    manifest.dump()
+    if ns.timings:
+        print(profiler.summary())
+    if ns.memostats:
+        print(ts.memo_summary())
+    if ns.trace is not None:
+        profiler.write_trace(ns.trace)
+    if ns.memprofile is not None:
+        memprofiler.snapshot('end')
+        print(memprofiler.summary(profiler.events))
+        memprofiler.write(ns.memprofile)
 
 
 if __name__ == '__main__':
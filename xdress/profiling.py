@@ -0,0 +1,244 @@
+"""Lightweight instrumentation of the stages of an xdress run.
+
+Profiling
+=========
+Stages of the pipeline (running GCC-XML, parsing its output, visiting the tree,
+executing sidecars, registering types, generating and writing code) are
+wrapped in ``profiler.stage()`` blocks.  These cost next to nothing unless the
+profiler has been enabled, as main() does for the ``--timings`` and ``--trace``
+command line options::
+
+    from profiling import profiler
+    with profiler.stage('describe FCComp', 'describe', file='fccomp.cpp'):
+        ...
+
+When enabled, each stage is recorded as a Chrome trace event, so that a
+run may be inspected in ``chrome://tracing`` (or any other trace event viewer)
+with one row per process.  Stages nest; the summary report gives inclusive times.
+Each event also carries the peak resident set size (RSS) of the process at the
+end of the stage and how much the stage raised it, from ``getrusage()``.
+
+Memory is profiled separately, by taking snapshots at stage boundaries with
+``memprofiler.snapshot()``, as main() does for the ``--memprofile`` option.  
+Each snapshot records the current and peak RSS of the process and of its 
+children (i.e. GCC-XML), the sizes of any large objects that the caller points
+out, and the top allocation sites.  Allocation sites come from ``tracemalloc``
+when it is available (Python 3.4+, or the pytracemalloc backport).  Otherwise
+there are none, and the summary says so; the stages which raised the peak RSS
+are listed instead.
+
+Profiling API
+=============
+"""
+import os
+import sys
+import json
+import time
+import thread
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+from contextlib import contextmanager
+
+
+class Profiler(object):
+    """Records the wall time of named stages as trace events."""
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.t0 = time.time()
+
+    def enable(self):
+        """Starts recording stages."""
+        self.enabled = True
+        self.t0 = time.time()
+
+    @contextmanager
+    def stage(self, name, cat, **args):
+        """A context manager which records the time spent in its block.
+
+        Parameters
+        ----------
+        name : str
+            Name of this particular stage, e.g. 'describe FCComp'.
+        cat : str
+            The kind of stage, e.g. 'describe'.  The summary aggregates stages
+            by their kind.
+        args : dict, optional
+            Extra information attached to the trace event.
+
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.time()
+        startrss = _peak_rss(resource and resource.RUSAGE_SELF)
+        try:
+            yield
+        finally:
+            end = time.time()
+            endrss = _peak_rss(resource and resource.RUSAGE_SELF)
+            if endrss is not None:
+                args = dict(args, peak_rss=endrss, peak_rss_growth=endrss - startrss)
+            self.events.append({'name': name, 'cat': cat, 'ph': 'X',
+                                'ts': (start - self.t0) * 1e6,
+                                'dur': (end - start) * 1e6,
+                                'pid': os.getpid(), 'tid': thread.get_ident(),
+                                'args': args})
+
+    def pop_events(self):
+        """Removes and returns the recorded events, e.g. for sending them from
+        a worker process back to the main one."""
+        events = self.events
+        self.events = []
+        return events
+
+    def summary(self, top=10):
+        """Returns a table of the total, mean and max times of each kind of
+        stage, and the slowest individual stages, as a string."""
+        cats = {}
+        for e in self.events:
+            cats.setdefault(e['cat'], []).append(e['dur'] / 1e6)
+        lines = ["{0:<20} {1:>7} {2:>10} {3:>10} {4:>10}".format("stage", "count",
+                 "total [s]", "mean [s]", "max [s]")]
+        for cat, durs in sorted(cats.items(), key=lambda x: -sum(x[1])):
+            lines.append("{0:<20} {1:>7} {2:>10.3f} {3:>10.4f} {4:>10.4f}".format(
+                         cat, len(durs), sum(durs), sum(durs) / len(durs), max(durs)))
+        lines.append("")
+        lines.append("slowest stages:")
+        for e in sorted(self.events, key=lambda e: -e['dur'])[:top]:
+            lines.append("  {0:>10.4f} s  {1}".format(e['dur'] / 1e6, e['name']))
+        return "\n".join(lines)
+
+    def write_trace(self, filename):
+        """Writes the recorded stages out as a Chrome trace event JSON file."""
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+
+def _peak_rss(who):
+    """Peak RSS [bytes] of this process or its children, if known."""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(who).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+def _current_rss():
+    """Current RSS [bytes] of this process, if known."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        return None
+
+
+class MemoryProfiler(object):
+    """Records the memory usage of a process at stage boundaries."""
+
+    def __init__(self, ntop=10):
+        """Parameters
+        -------------
+        ntop : int, optional
+            Number of top allocation sites to record in each snapshot.
+
+        """
+        self.enabled = False
+        self.ntop = ntop
+        self.records = []
+        self.t0 = time.time()
+
+    def enable(self):
+        """Starts tracing allocations, if tracemalloc is available, and 
+        taking snapshots."""
+        self.enabled = True
+        self.t0 = time.time()
+        if tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _top_sites(self):
+        snap = tracemalloc.take_snapshot()
+        srcs = [os.path.splitext(m.__file__)[0] + '.py' for m in (tracemalloc, json)]
+        srcs.append(os.path.splitext(__file__)[0] + '.py')
+        snap = snap.filter_traces([tracemalloc.Filter(False, src) for src in srcs])
+        return [{'site': str(stat.traceback), 'size': stat.size, 'count': stat.count}
+                for stat in snap.statistics('lineno')[:self.ntop]]
+
+    def snapshot(self, label, **held):
+        """Records the memory usage at this point.
+
+        Parameters
+        ----------
+        label : str
+            Name of the stage boundary, e.g. 'after genpyx'.
+        held : dict, optional
+            Maps names to objects of interest, such as the generated code, 
+            whose sizes are recorded.  Strings and containers of strings are 
+            measured by their lengths, everything else by sys.getsizeof().
+
+        """
+        if not self.enabled:
+            return
+        rec = {'label': label, 'time': time.time() - self.t0, 
+               'rss': _current_rss(), 
+               'peak_rss': _peak_rss(resource and resource.RUSAGE_SELF),
+               'peak_rss_children': _peak_rss(resource and resource.RUSAGE_CHILDREN),
+               'held': dict([(k, _heldsize(v)) for k, v in held.items()])}
+        if tracemalloc is not None:
+            rec['traced'], rec['traced_peak'] = tracemalloc.get_traced_memory()
+            rec['top'] = self._top_sites()
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        else:
+            rec['top'] = []
+        self.records.append(rec)
+
+    def summary(self, events=()):
+        """Returns a table of the memory usage at each snapshot [MiB], followed 
+        by the stages which raised the peak RSS the most, from the events of a 
+        Profiler, as a string."""
+        mib = lambda x: float('nan') if x is None else x / 2.0**20
+        lines = ["{0:<32} {1:>9} {2:>9} {3:>9}  {4}".format("stage boundary", 
+                 "RSS", "peak RSS", "children", "top site")]
+        for rec in self.records:
+            top = rec['top'][0]['site'].splitlines()[0] if rec['top'] else ''
+            lines.append("{0:<32} {1:>9.1f} {2:>9.1f} {3:>9.1f}  {4}".format(
+                         rec['label'], mib(rec['rss']), mib(rec['peak_rss']), 
+                         mib(rec['peak_rss_children']), top))
+        if tracemalloc is None:
+            lines.append("no allocation sites: tracemalloc is not available")
+        grown = [e for e in events if 0 < e['args'].get('peak_rss_growth', 0)]
+        if 0 < len(grown):
+            lines.append("")
+            lines.append("stages raising the peak RSS:")
+            grown.sort(key=lambda e: -e['args']['peak_rss_growth'])
+            for e in grown[:self.ntop]:
+                lines.append("  {0:>9.1f} MiB  {1}".format(
+                             mib(e['args']['peak_rss_growth']), e['name']))
+        return "\n".join(lines)
+
+    def write(self, filename):
+        """Writes the snapshots out to a JSON file."""
+        with open(filename, 'w') as f:
+            json.dump({'tracemalloc': tracemalloc is not None, 
+                       'snapshots': self.records}, f, indent=1)
+
+
+def _heldsize(x):
+    if isinstance(x, basestring):
+        return len(x)
+    elif isinstance(x, dict):
+        return sum([_heldsize(v) for v in x.values()])
+    elif isinstance(x, (list, tuple, set, frozenset)):
+        return sum([_heldsize(v) for v in x])
+    return sys.getsizeof(x)
+
+
+# singletons
+profiler = Profiler()
+memprofiler = MemoryProfiler()
@@ -2,8 +2,10 @@
 containters to the associated python types.
 """
 import pprint
+from cStringIO import StringIO
 
-from utils import newoverwrite, newcopyover, ensuredirs, indent, indentstr
+from utils import newoverwrite, newcopyover, ensuredirs, indent, indentstr, \
+    Emitter
 import typesystem as ts
 
 
@@ -201,13 +203,14 @@ def test_set_{fncname}():
     assert_true({3} not in s)
 
 """
-def gentest_set(t):
-    """Returns the test snippet for a set of type t."""
+def gentest_set(t, stlcontainers='stlcontainers'):
+    """Returns the test snippet for a set of type t, which imports the wrappers 
+    from the stlcontainers module."""
     t = ts.canon(t)
     return _testset.format(*[repr(i) for i in testvals[t]], 
                            clsname=ts.cython_classname(t)[1],
                            fncname=ts.cython_functionname(t)[1],
-                           stlcontainers=ts.STLCONTAINERS)
+                           stlcontainers=stlcontainers)
 
 #
 # Maps
@@ -456,8 +459,9 @@ def test_map_{tfncname}_{ufncname}():
         assert{array}_equal(m[{1}], {5})
 
 """
-def gentest_map(t, u):
-    """Returns the test snippet for a map of type t."""
+def gentest_map(t, u, stlcontainers='stlcontainers'):
+    """Returns the test snippet for a map of type t, which imports the wrappers 
+    from the stlcontainers module."""
     t = ts.canon(t)
     u = ts.canon(u)
     if t not in testvals or u not in testvals:
@@ -475,7 +479,7 @@ def gentest_map(t, u):
                            uclsname=ts.cython_classname(u)[1],
                            tfncname=ts.cython_functionname(t)[1], 
                            ufncname=ts.cython_functionname(u)[1], 
-                           array=a, stlcontainers=ts.STLCONTAINERS)
+                           array=a, stlcontainers=stlcontainers)
 
 
 #
@@ -726,8 +730,7 @@ def genpyx_vector(t):
     kw = dict(clsname=ts.cython_classname(t)[1], humname=ts.humanname(t)[1], 
               fncname=ts.cython_functionname(t)[1], 
               ctype=ts.cython_ctype(t), pytype=ts.cython_pytype(t), 
-              cytype=ts.cython_cytype(t), stlcontainers=ts.STLCONTAINERS, 
-              extra_types=ts.EXTRA_TYPES)
+              cytype=ts.cython_cytype(t),)
     t0 = t
     while not isinstance(t0, basestring):
         t0 = t[0]
@@ -786,14 +789,15 @@ def test_vector_{fncname}():
     print a
 
 """
-def gentest_vector(t):
-    """Returns the test snippet for a set of type t."""
+def gentest_vector(t, stlcontainers='stlcontainers'):
+    """Returns the test snippet for a set of type t, which imports the wrappers 
+    from the stlcontainers module."""
     t = ts.canon(t)
     if ('vector', t, 0) in testvals:
         s = _testvector.format(*[repr(i) for i in testvals['vector', t, 0]], 
                                clsname=ts.cython_classname(t)[1],
                                fncname=ts.cython_functionname(t)[1],
-                               stlcontainers=ts.STLCONTAINERS)
+                               stlcontainers=stlcontainers)
     else:
         s = ""
     return s
@@ -837,16 +841,26 @@ cimport {extra_types}
 dtypes = {{}}
 
 """
-def genpyx(template, header=None):
-    """Returns a string of a pyx file representing the given template."""
+def emitpyx(template, f, header=None, typesystem=None):
+    """Writes the pyx file representing the given template to the file-like 
+    object f, one container at a time, with the given type system or else the
+    current one."""
+    typesystem = ts.current() if typesystem is None else typesystem
     pyxfuncs = dict([(k[7:], v) for k, v in globals().items() \
                     if k.startswith('genpyx_') and callable(v)])
     pyx = _pyxheader if header is None else header
-    pyx = pyx.format(extra_types=ts.EXTRA_TYPES)
-    with ts.swap_stlcontainers(None):
+    f.write(pyx.format(extra_types=typesystem.extra_types))
+    # within the stlcontainers module, the wrappers are not qualified by it
+    with typesystem.fork(stlcontainers=None):
         for t in template:
-            pyx += pyxfuncs[t[0]](*t[1:]) + "\n\n" 
-    return pyx
+            f.write(pyxfuncs[t[0]](*t[1:]))
+            f.write("\n\n")
+
+def genpyx(template, header=None, typesystem=None):
+    """Returns a string of a pyx file representing the given template."""
+    f = StringIO()
+    emitpyx(template, f, header, typesystem)
+    return f.getvalue()
 
 
 _pxdheader = """###################
@@ -984,15 +998,25 @@ cdef extern from "{extra_types}.h" namespace "{extra_types}":
         void deall(T *) nogil except +
 
 """
-def genpxd(template, header=None):
-    """Returns a string of a pxd file representing the given template."""
+def emitpxd(template, f, header=None, typesystem=None):
+    """Writes the pxd file representing the given template to the file-like 
+    object f, one container at a time, with the given type system or else the
+    current one."""
+    typesystem = ts.current() if typesystem is None else typesystem
     pxdfuncs = dict([(k[7:], v) for k, v in globals().items() \
                     if k.startswith('genpxd_') and callable(v)])
     pxd = _pxdheader if header is None else header
-    pxd = pxd.format(extra_types=ts.EXTRA_TYPES)
-    for t in template:
-        pxd += pxdfuncs[t[0]](*t[1:]) + "\n\n" 
-    return pxd
+    f.write(pxd.format(extra_types=typesystem.extra_types))
+    with typesystem:
+        for t in template:
+            f.write(pxdfuncs[t[0]](*t[1:]))
+            f.write("\n\n")
+
+def genpxd(template, header=None, typesystem=None):
+    """Returns a string of a pxd file representing the given template."""
+    f = StringIO()
+    emitpxd(template, f, header, typesystem)
+    return f.getvalue()
 
 
 _testheader = '''"""Tests the part of stlconverters that is accessible from Python."""
@@ -1017,20 +1041,37 @@ from {package} import {stlcontainers}
 
 
 '''
-def gentest(template, header=None, package='..'):
-    """Returns a string of a test file representing the given template."""
+def emittest(template, f, header=None, package='..', typesystem=None):
+    """Writes the test file representing the given template to the file-like 
+    object f, one container at a time, with the given type system or else the
+    current one."""
+    typesystem = ts.current() if typesystem is None else typesystem
+    stlcontainers = typesystem.stlcontainers
     testfuncs = dict([(k[8:], v) for k, v in globals().items() \
                     if k.startswith('gentest_') and callable(v)])
     test = _testheader if header is None else header
-    test = test.format(stlcontainers=ts.STLCONTAINERS, package=package)
-    for t in template:
-        test += testfuncs[t[0]](*t[1:]) + "\n\n" 
-    return test
+    f.write(test.format(stlcontainers=stlcontainers, package=package))
+    with typesystem:
+        for t in template:
+            f.write(testfuncs[t[0]](*t[1:], stlcontainers=stlcontainers))
+            f.write("\n\n")
+
+def gentest(template, header=None, package='..', typesystem=None):
+    """Returns a string of a test file representing the given template."""
+    f = StringIO()
+    emittest(template, f, header, package, typesystem)
+    return f.getvalue()
 
 
 def genfiles(template, fname='temp', pxdname=None, testname=None, 
-             pyxheader=None, pxdheader=None, testheader=None, package='..'):
-    """Generates all cython source files needed to create the wrapper."""
+             pyxheader=None, pxdheader=None, testheader=None, package='..', 
+             typesystem=None):
+    """Generates all cython source files needed to create the wrapper, with the
+    given type system or else the current one.  They are streamed to temporary 
+    files as they are generated, which replace the targets only once all of 
+    them have been generated, so that an error leaves none of them half 
+    written.  Files whose contents have not changed are left untouched.
+    """
     # munge some filenames
     fname = fname[:-4] if fname.endswith('.pyx') else fname
     pxdname = fname if pxdname is None else pxdname
@@ -1040,17 +1081,26 @@ def genfiles(template, fname='temp', pxdname=None, testname=None,
     fname += '.pyx'
 
     # register dtypes
+    typesystem = ts.current() if typesystem is None else typesystem
     for t in template:
         if t[0] == 'vector':
-            ts.register_numpy_dtype(t[1])
-
-    pyx = genpyx(template, pyxheader)
-    pxd = genpxd(template, pxdheader)
-    test = gentest(template, testheader, package)
-
-    newoverwrite(pyx, fname)
-    newoverwrite(pxd, pxdname)
-    newoverwrite(test, testname)
+            typesystem.register_numpy_dtype(t[1])
+
+    emitters = []
+    try:
+        for filename, emit, args in [(fname, emitpyx, (pyxheader, typesystem)), 
+                                     (pxdname, emitpxd, (pxdheader, typesystem)), 
+                                     (testname, emittest, (testheader, package, 
+                                                           typesystem))]:
+            e = Emitter(filename)
+            emitters.append(e)
+            emit(template, e, *args)
+            e.close()
+        for e in emitters:
+            e.commit()
+    finally:
+        for e in emitters:
+            e.discard()  # no-op once committed
 
 if __name__ == "__main__":
     #t = [('set', 'int')]
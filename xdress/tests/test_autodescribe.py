@@ -1,8 +1,11 @@
 import os
+import time
+import shutil
+import tempfile
 
-from bright.apigen import typesystem as ts
-from bright.apigen import cythongen as cg
-from bright.apigen import autodescribe as ad
+from xdress import typesystem as ts
+from xdress import cythongen as cg
+from xdress import autodescribe as ad
 
 from nose.tools import assert_equal
 
@@ -81,3 +84,188 @@ def test_merge_descriptions():
     exp = full_toaster_desc
     assert_equal(obs, exp)
 
+
+
+toaster_gccxml = """<?xml version="1.0"?>
+<GCC_XML>
+  <Namespace id="_1" name="::" members="_2" mangled="_Z2::"/>
+  <Namespace id="_2" name="bright" context="_1" members="_3 _4"/>
+  <Class id="_3" name="FCComp" context="_2" file="f2" line="4" members="" bases=""/>
+  <Class id="_4" name="Toaster" context="_2" file="f1" line="5" members="_5 _6 _7 _8 _9 _10 _11 _21 _22" bases="_3"/>
+  <Constructor id="_5" name="Toaster" context="_4" access="public" file="f1" line="6"/>
+  <Destructor id="_6" name="Toaster" context="_4" access="public" file="f1" line="7"/>
+  <Field id="_7" name="nslices" type="_12" context="_4" access="public" file="f1" line="8"/>
+  <Field id="_8" name="toastiness" type="_14" context="_4" access="public" file="f1" line="9"/>
+  <Field id="_9" name="rate" type="_13" context="_4" access="public" file="f1" line="10"/>
+  <Method id="_10" name="make_toast" returns="_15" context="_4" access="public" file="f1" line="11">
+    <Argument name="when" type="_14" file="f1" line="11"/>
+    <Argument name="nslices" type="_12" default="1" file="f1" line="11"/>
+  </Method>
+  <Field id="_11" name="secret" type="_15" context="_4" access="private" file="f1" line="12"/>
+  <Method id="_21" name="butter" returns="_23" context="_4" access="public" file="f1" line="13">
+    <Argument name="amount" type="_24" file="f1" line="13"/>
+  </Method>
+  <Field id="_22" name="crumbs" type="_25" context="_4" access="public" file="f1" line="14"/>
+  <PointerType id="_23" type="_13" size="64" align="64"/>
+  <ReferenceType id="_24" type="_30" size="64" align="64"/>
+  <FundamentalType id="_30" name="long int" size="64" align="64"/>
+  <FundamentalType id="_26" name="double" size="64" align="64"/>
+  <Class id="_25" name="vector&lt;double&gt;" context="_1" file="f2" line="3" members="_27 _28 _29" bases=""/>
+  <Constructor id="_27" name="vector" context="_25" access="public" file="f2" line="3"/>
+  <Typedef id="_28" name="value_type" type="_26" context="_25" access="public" file="f2" line="3"/>
+  <Method id="_29" name="size" returns="_12" context="_25" access="public" file="f2" line="3"/>
+  <FundamentalType id="_12" name="unsigned int" size="32" align="32"/>
+  <FundamentalType id="_13" name="float" size="32" align="32"/>
+  <Typedef id="_14" name="string" type="_16" context="_1" file="f2" line="1"/>
+  <FundamentalType id="_15" name="int" size="32" align="32"/>
+  <Class id="_16" name="basic_string&lt;char&gt;" context="_1" file="f2" line="1" members="_17" bases=""/>
+  <Constructor id="_17" name="basic_string" context="_16" access="public" file="f2" line="1"/>
+  <Function id="_18" name="toast_all" returns="_15" context="_2" file="f0" line="3">
+    <Argument name="n" type="_12" file="f0" line="3"/>
+  </Function>
+  <Class id="_19" name="Unused" context="_1" file="f2" line="2" members="_20" bases=""/>
+  <Field id="_20" name="x" type="_13" context="_19" access="public" file="f2" line="2"/>
+  <File id="f0" name="toaster.cpp"/>
+  <File id="f1" name="toaster.h"/>
+  <File id="f2" name="/usr/include/string"/>
+</GCC_XML>
+"""
+
+def test_gccxml_index():
+    root = ad.etree.ElementTree(ad.etree.fromstring(toaster_gccxml))
+    index = ad.GccxmlIndex(root)
+    assert_equal(len(index), 33)
+    assert_equal(index['_10'].attrib['name'], 'make_toast')
+    assert_equal([n.attrib['id'] for n in index.named('Class', 'Toaster')], ['_4'])
+    assert_equal(index.named('Class', 'Grill'), [])
+
+def test_gccxml_class_describer():
+    root = ad.etree.ElementTree(ad.etree.fromstring(toaster_gccxml))
+    index = ad.GccxmlIndex(root)
+    describer = ad.GccxmlClassDescriber('Toaster', root, onlyin='toaster.h', 
+                                        index=index)
+    describer.visit()
+    obs = describer.desc
+    exp = {'name': 'Toaster', 'namespace': 'bright', 'parents': ['FCComp']}
+    exp['attrs'] = {'nslices': 'uint32', 'toastiness': 'str', 'rate': 'float32', 
+                    'crumbs': ('vector', 'float64')}
+    exp['methods'] = {('Toaster',): None, ('~Toaster',): None, 
+        ('make_toast', ('when', 'str'), ('nslices', 'uint32', 1)): 'int32', 
+        ('butter', ('amount', ('int64', '&'))): ('float32', '*')}
+    assert_equal(obs, exp)
+
+def test_gccxml_translation_unit():
+    root = ad.etree.ElementTree(ad.etree.fromstring(toaster_gccxml))
+    tu = ad.GccxmlTranslationUnit('toaster.cpp', root=root)
+    cls = tu.describe('Toaster', 'class')
+    index = tu.index
+    assert_equal(cls['attrs']['rate'], 'float32')
+    func = tu.describe('toast_all', 'func')
+    assert index is tu.index
+    exp = {'name': 'toast_all', 'namespace': 'bright', 
+           'signatures': {('toast_all', ('n', 'uint32')): 'int32'}}
+    assert_equal(func, exp)
+    # units are shared within the units of a run, and only there
+    units = {}
+    tu = ad.gccxml_translation_unit('toaster.cpp', units=units)
+    assert tu is ad.gccxml_translation_unit('toaster.cpp', units=units)
+    assert_equal(units.keys(), [('toaster.cpp', ())])
+    assert tu is not ad.gccxml_translation_unit('toaster.cpp', units={})
+    assert tu is not ad.gccxml_translation_unit('toaster.cpp')
+
+def test_gccxml_parse_onlyin():
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(toaster_gccxml)
+        f.flush()
+        full = ad.gccxml_parse(f.name)
+        reduced = ad.gccxml_parse(f.name, onlyin=set(['toaster.cpp', 'toaster.h']))
+    index = ad.GccxmlIndex(reduced)
+    assert_equal(len(index), 30)
+    for id in ['_19', '_20', '_29']:
+        assert id not in index
+    for name, kind in [('Toaster', 'class'), ('toast_all', 'func')]:
+        exp = ad.GccxmlTranslationUnit('toaster.cpp', root=full).describe(name, kind)
+        obs = ad.GccxmlTranslationUnit('toaster.cpp', root=reduced).describe(name, kind)
+        assert_equal(obs, exp)
+
+def test_gccxml_parse_onlyin_describers():
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(toaster_gccxml)
+        f.flush()
+        full = ad.gccxml_parse(f.name)
+        files = dict([(n.attrib['id'], n.attrib['name']) for n in full.iter('File')])
+        describers = [(n.attrib['name'], ad.GccxmlClassDescriber, n.attrib['file']) 
+                      for n in full.iter('Class')]
+        describers += [(n.attrib['name'], ad.GccxmlFuncDescriber, n.attrib['file']) 
+                       for n in full.iter('Function')]
+        assert_equal(len(describers), 6)
+        # every class and function is described the same from the reduced tree
+        for name, describer, fileid in describers:
+            onlyin = set([files[fileid]])
+            reduced = ad.gccxml_parse(f.name, onlyin=onlyin)
+            exp = describer(name, full, onlyin=onlyin)
+            exp.visit()
+            obs = describer(name, reduced, onlyin=onlyin)
+            obs.visit()
+            assert_equal(obs.desc, exp.desc)
+
+def test_gccxml_store():
+    root = ad.etree.ElementTree(ad.etree.fromstring(toaster_gccxml))
+    storedir = tempfile.mkdtemp()
+    try:
+        store = ad.GccxmlStore(storedir)
+        assert 'abc' not in store
+        assert store.load('abc') is None
+        store.dump('abc', root)
+        assert 'abc' in store
+        loaded = store.load('abc')
+    finally:
+        shutil.rmtree(storedir)
+    exp = ad.GccxmlTranslationUnit('toaster.cpp', root=root).describe('Toaster')
+    obs = ad.GccxmlTranslationUnit('toaster.cpp', root=loaded).describe('Toaster')
+    assert_equal(obs, exp)
+
+def test_gccxml_store_closure():
+    root = ad.etree.ElementTree(ad.etree.fromstring(toaster_gccxml))
+    storedir = tempfile.mkdtemp()
+    path = os.environ['PATH']
+    try:
+        store = ad.GccxmlStore(storedir)
+        closure = {'toaster.cpp': 'abc', 'toaster.h': 'def', 'bread.h': None}
+        key = store.key('toaster.cpp', ['inc'], closure=closure)
+        assert_equal(key, store.key('toaster.cpp', ['inc'], closure=dict(closure)))
+        assert key != store.key('toaster.cpp', ['other'], closure=closure)
+        assert key != store.key('toaster.cpp', ['inc'], 
+                                closure=dict(closure, **{'bread.h': 'ghi'}))
+        store.dump(key, root)
+        # the tree is found without running GCC-XML, not even to preprocess
+        os.environ['PATH'] = storedir
+        tu = ad.GccxmlTranslationUnit('toaster.cpp', includes=['inc'], store=store, 
+                                      closure=closure)
+        assert_equal(tu.describe('Toaster')['attrs']['rate'], 'float32')
+    finally:
+        os.environ['PATH'] = path
+        shutil.rmtree(storedir)
+
+def test_gccxml_store_gc():
+    root = ad.etree.ElementTree(ad.etree.fromstring(toaster_gccxml))
+    storedir = tempfile.mkdtemp()
+    try:
+        store = ad.GccxmlStore(storedir)
+        for key in ['old', 'used', 'new']:
+            store.dump(key, root)
+        now = time.time()
+        os.utime(store._path('old'), (1e9, 1e9))
+        os.utime(store._path('used'), (now - 120.0, now - 120.0))
+        os.utime(store._path('new'), (now - 60.0, now - 60.0))
+        # loading marks a tree as used
+        store.load('used')
+        size = os.path.getsize(store._path('new'))
+        reclaimed = store.gc(maxsize=2 * size, maxage=86400.0)
+        assert_equal([(k, n) for k, n, r in reclaimed], [('old', size)])
+        assert reclaimed[0][2].startswith('not used in')
+        assert_equal(store.gc(maxsize=size), [('new', size, 'store size bound')])
+        assert 'used' in store
+        assert_equal(store.gc(), [])
+    finally:
+        shutil.rmtree(storedir)
@@ -0,0 +1,570 @@
+import os
+import sys
+import shutil
+import tempfile
+import time
+from StringIO import StringIO
+
+from xdress import main
+from xdress.utils import filedigest
+
+from nose.tools import assert_equal, assert_true, assert_false, with_setup
+
+tmpdir = []
+
+def make_srcs():
+    d = tempfile.mkdtemp()
+    tmpdir.append(d)
+    for name, s in [('toaster.cpp', '#include "toaster.h"\n'),
+                    ('toaster.h', '#include "bread.h"\nclass Toaster {};\n'),
+                    ('bread.h', 'class Bread {};\n')]:
+        with open(os.path.join(d, name), 'w') as f:
+            f.write(s)
+
+def rm_srcs():
+    shutil.rmtree(tmpdir.pop())
+
+
+@with_setup(make_srcs, rm_srcs)
+def test_desc_cache_dependencies():
+    d = tmpdir[-1]
+    cpp = os.path.join(d, 'toaster.cpp')
+    bread = os.path.join(d, 'bread.h')
+    cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+    key = ('Toaster', cpp, 'class')
+    assert_false(cache.isvalid('Toaster', cpp, 'class', ['inc']))
+    cache.set(key, {'name': 'Toaster'}, ['inc'], [bread])
+    assert_true(cache.isvalid('Toaster', cpp, 'class', ['inc']))
+    assert_equal(cache[key], {'name': 'Toaster'})
+    # include flags are part of the key
+    assert_false(cache.isvalid('Toaster', cpp, 'class', ['inc', 'other']))
+    # so are transitively included headers
+    with open(bread, 'a') as f:
+        f.write('class Crumb {};\n')
+    cache.forget_hashes()
+    assert_false(cache.isvalid('Toaster', cpp, 'class', ['inc']))
+    cache.set(key, {'name': 'Toaster'}, ['inc'], [bread])
+    assert_true(cache.isvalid('Toaster', cpp, 'class', ['inc']))
+    # and the header next to the source, even when not reported
+    cache.set(key, {'name': 'Toaster'}, ['inc'])
+    with open(os.path.join(d, 'toaster.h'), 'a') as f:
+        f.write('class Oven {};\n')
+    cache.forget_hashes()
+    assert_false(cache.isvalid('Toaster', cpp, 'class', ['inc']))
+    # round trip
+    cache.set(key, {'name': 'Toaster'}, ['inc'], [bread])
+    cache.dump()
+    cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+    assert_true(cache.isvalid('Toaster', cpp, 'class', ['inc']))
+
+
+@with_setup(make_srcs, rm_srcs)
+def test_desc_cache_changes():
+    d = tmpdir[-1]
+    cpp = os.path.join(d, 'toaster.cpp')
+    bread = os.path.join(d, 'bread.h')
+    cachedir = os.path.join(d, 'desccache')
+    cache = main.DescriptionCache(cachedir)
+    assert_equal(cache.changes('Toaster', cpp, 'class', ['inc']), ['not in cache'])
+    cache.set(('Toaster', cpp, 'class'), {'name': 'Toaster'}, ['inc'], [bread])
+    cache.dump()
+    assert_equal(cache.changes('Toaster', cpp, 'class', ['inc']), [])
+    assert_equal(cache.changes('Toaster', cpp, 'class', ['other']), 
+                 ['include directories changed'])
+    # changes to the header move the entry, the old one is still found
+    with open(os.path.join(d, 'toaster.h'), 'a') as f:
+        f.write('class Oven {};\n')
+    os.remove(bread)
+    cache = main.DescriptionCache(cachedir)
+    assert_equal(cache.changes('Toaster', cpp, 'class', ['inc']), 
+                 [bread + ' removed', os.path.join(d, 'toaster.h') + ' changed'])
+    # as is the include closure it recorded, which the GCC-XML store is keyed by
+    closure = cache.closure(('Toaster', cpp, 'class'))
+    assert_equal(sorted(closure), sorted([cpp, os.path.join(d, 'toaster.h'), bread]))
+    assert_equal(closure[bread], None)
+    assert_equal(closure[cpp], filedigest(cpp))
+    assert_equal(cache.closure(('Oven', cpp, 'class')), None)
+
+
+@with_setup(make_srcs, rm_srcs)
+def test_desc_cache_stat_first():
+    d = tmpdir[-1]
+    bread = os.path.join(d, 'bread.h')
+    os.utime(bread, (1e9, 1e9))
+    cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+    h = cache.hash(bread)
+    assert_true(bread in cache.stats)
+    assert_equal(cache.stats[bread][1], h)
+    # recently modified files are not trusted by their stats
+    assert_false(os.path.join(d, 'toaster.h') in cache.stats)
+    cache.hash(os.path.join(d, 'toaster.h'))
+    assert_false(os.path.join(d, 'toaster.h') in cache.stats)
+    cache.dump()
+    # stats persist, and a changed stat means the file is hashed again
+    cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+    assert_equal(cache.stats[bread][1], h)
+    with open(bread, 'w') as f:
+        f.write('class Toast {};\n')
+    os.utime(bread, (1e9 + 1, 1e9 + 1))
+    assert_true(h != cache.hash(bread))
+    assert_equal(cache.hash(os.path.join(d, 'nothere.h')), None)
+
+
+@with_setup(make_srcs, rm_srcs)
+def test_desc_cache_shards():
+    d = tmpdir[-1]
+    cpp = os.path.join(d, 'toaster.cpp')
+    cachedir = os.path.join(d, 'desccache')
+    cache = main.DescriptionCache(cachedir)
+    for name in ['Toaster', 'Oven', 'Grill']:
+        cache[name, cpp, 'class'] = {'name': name}
+    cache.dump()
+    assert_equal(len(cache._entryfiles()), 3)
+    # only entries that are asked for are loaded
+    cache = main.DescriptionCache(cachedir)
+    assert_equal(cache[('Oven', cpp, 'class')], {'name': 'Oven'})
+    assert_equal(cache.cache.keys(), [('Oven', cpp, 'class')])
+    assert_false(('Stove', cpp, 'class') in cache)
+    # only dirty entries are written, entries which were read are touched
+    for f in cache._entryfiles():
+        os.utime(f, (1e9, 1e9))
+    cache[('Stove', cpp, 'class')] = {'name': 'Stove'}
+    cache.dump()
+    mtimes = [os.stat(f).st_mtime for f in cache._entryfiles()]
+    assert_equal(sorted(mtimes)[:2], [1e9] * 2)
+    assert_equal(len(mtimes), 4)
+    del cache[('Toaster', cpp, 'class')]
+    assert_equal(len(cache._entryfiles()), 3)
+    assert_equal(sorted(main.DescriptionCache(cachedir).keys()), 
+                 [(n, cpp, 'class') for n in ['Grill', 'Oven', 'Stove']])
+
+
+@with_setup(make_srcs, rm_srcs)
+def test_desc_cache_gc():
+    d = tmpdir[-1]
+    cpp = os.path.join(d, 'toaster.cpp')
+    gone = os.path.join(d, 'gone.cpp')
+    cachedir = os.path.join(d, 'desccache')
+    cache = main.DescriptionCache(cachedir)
+    for name in ['Toaster', 'Oven', 'Grill', 'Stove']:
+        cache[name, cpp, 'class'] = {'name': name * 100}
+    cache['Gone', gone, 'class'] = {'name': 'Gone'}
+    cache.dump()
+    # make Grill the least recently used and Stove ancient
+    entries = dict([(k, cache._entryfile(k)) for k in cache.keys()])
+    hourago = time.time() - 3600.0
+    os.utime(entries['Grill', cpp, 'class'], (hourago, hourago))
+    os.utime(entries['Stove', cpp, 'class'], (1e9, 1e9))
+    cache = main.DescriptionCache(cachedir)
+    assert_equal(cache[('Toaster', cpp, 'class')]['name'], 'Toaster' * 100)
+    keep = set([(n, cpp, 'class') for n in ['Toaster', 'Grill', 'Stove']])
+    reclaimed = cache.gc(keep=keep, maxage=86400.0)
+    reasons = dict([(k[0], r) for k, n, r in reclaimed])
+    assert_equal(sorted(reasons), ['Gone', 'Oven', 'Stove'])
+    assert_equal(reasons['Gone'], 'source file missing')
+    assert_equal(reasons['Oven'], 'no longer requested')
+    assert_true(reasons['Stove'].startswith('not used in'))
+    assert_equal(cache.keys(), [('Grill', cpp, 'class'), ('Toaster', cpp, 'class')])
+    # the size bound evicts least recently used first, Toaster was just read
+    size = os.path.getsize(entries['Toaster', cpp, 'class'])
+    reclaimed = cache.gc(maxsize=size)
+    assert_equal([(k, r) for k, n, r in reclaimed], 
+                 [(('Grill', cpp, 'class'), 'cache size bound')])
+    assert_equal(main.DescriptionCache(cachedir).keys(), [('Toaster', cpp, 'class')])
+
+
+@with_setup(make_srcs, rm_srcs)
+def test_desc_cache_shared():
+    a = tmpdir[-1]
+    b = os.path.join(a, 'b')
+    os.mkdir(b)
+    for name in ['toaster.cpp', 'toaster.h', 'bread.h']:
+        shutil.copy(os.path.join(a, name), os.path.join(b, name))
+    shared = os.path.join(a, 'shared')
+    key = ('Toaster', 'toaster.cpp', 'class')
+    cwd = os.getcwd()
+    try:
+        # checkout a describes, checkout b finds it in the shared cache
+        os.chdir(a)
+        cache = main.DescriptionCache(shared, statsfile='desc.stats')
+        cache.set(key, {'name': 'Toaster'}, ['inc'], ['bread.h'])
+        cache.dump()
+        os.chdir(b)
+        cache = main.DescriptionCache(shared, statsfile='desc.stats')
+        assert_true(cache.isvalid(*key, includes=['inc']))
+        assert_equal(cache[key], {'name': 'Toaster'})
+        # as are sources compiled with other include directories
+        other = main.DescriptionCache(shared, statsfile='desc.stats')
+        assert_true(other.address(key, ['other']) != cache.address(key, ['inc']))
+        assert_false(other.isvalid(*key, includes=['other']))
+        # different sources are different entries
+        with open('toaster.h', 'a') as f:
+            f.write('class Oven {};\n')
+        cache = main.DescriptionCache(shared, statsfile='desc.stats')
+        assert_false(cache.isvalid(*key, includes=['inc']))
+        cache.set(key, {'name': 'Toaster', 'oven': True}, ['inc'], ['bread.h'])
+        cache.dump()
+        assert_equal(len(cache._entryfiles()), 2)
+        # gc by one checkout leaves the entries of another alone
+        size = os.path.getsize(cache._entryfile(key))
+        assert_equal(cache.gc(keep=set()), [(key, size, 'no longer requested')])
+        os.chdir(a)
+        cache = main.DescriptionCache(shared, statsfile='desc.stats')
+        assert_equal(cache.gc(includes=['inc']), [])
+        assert_true(cache.isvalid(*key, includes=['inc']))
+        assert_equal(cache[key], {'name': 'Toaster'})
+    finally:
+        os.chdir(cwd)
+
+
+@with_setup(make_srcs, rm_srcs)
+def test_desc_cache_gccxml_version():
+    d = tmpdir[-1]
+    gccxml = os.path.join(d, 'gccxml')
+    def fake(version, mtime):
+        with open(gccxml, 'w') as f:
+            f.write('#!/bin/sh\necho {0}\n'.format(version))
+        os.chmod(gccxml, 0755)
+        os.utime(gccxml, (mtime, mtime))
+    fake('GCC-XML version 0.9.0', 100)
+    path = os.environ['PATH']
+    os.environ['PATH'] = d + os.pathsep + path
+    cachedir = os.path.join(d, 'desccache')
+    try:
+        del main.autodescribe._gccxml_version[:]
+        cache = main.DescriptionCache(cachedir)
+        assert_equal(cache.gccxml_version(), 'GCC-XML version 0.9.0')
+        cache.dump()
+        # gccxml is not run again while the executable is unchanged
+        fake('GCC-XML version 0.9.1', 100)
+        del main.autodescribe._gccxml_version[:]
+        assert_equal(main.DescriptionCache(cachedir).gccxml_version(), 
+                     'GCC-XML version 0.9.0')
+        assert_equal(main.autodescribe._gccxml_version, [])
+        # but is once it changes
+        os.utime(gccxml, (200, 200))
+        assert_equal(main.DescriptionCache(cachedir).gccxml_version(), 
+                     'GCC-XML version 0.9.1')
+    finally:
+        os.environ['PATH'] = path
+        del main.autodescribe._gccxml_version[:]
+
+
+def test_target_fingerprint():
+    rc = main.argparse.Namespace(package='pkg')
+    base = {'name': 'Base', 'parents': None, 'attrs': {'x': 'int32'}, 'methods': {}}
+    toaster = {'name': 'Toaster', 'parents': ['Base'], 'attrs': {'bread': 'Bread'}, 
+               'methods': {('toast', ('n', 'int32')): 'Bread'}}
+    mod = {'Toaster': toaster, 'docstring': 'toasty', 'extra': '', 
+           'pyx_filename': 'toaster.pyx'}
+    classes = {'Base': base, 'Toaster': toaster}
+    fp = main.target_fingerprint(mod, classes, rc)
+    assert_equal(fp, main.target_fingerprint(dict(mod), dict(classes), rc))
+    # sidecar content
+    assert_true(fp != main.target_fingerprint(dict(mod, docstring='crispy'), 
+                                              classes, rc))
+    # descriptions of parent classes
+    classes2 = dict(classes, Base=dict(base, attrs={'x': 'float64'}))
+    assert_true(fp != main.target_fingerprint(mod, classes2, rc))
+    # relevant type system registrations, and only those
+    main.ts.register_class('Crumb', cython_c_type='cpp_crumb.Crumb', 
+                           cython_cy_type='crumb.Crumb', cython_c2py='{var}', 
+                           cython_py2c='{var}')
+    try:
+        assert_equal(fp, main.target_fingerprint(mod, classes, rc))
+    finally:
+        main.ts.deregister_class('Crumb')
+    main.ts.register_class('Bread', cython_c_type='cpp_bread.Bread', 
+                           cython_cy_type='bread.Bread', cython_c2py='{var}', 
+                           cython_py2c='{var}')
+    try:
+        assert_true(fp != main.target_fingerprint(mod, classes, rc))
+    finally:
+        main.ts.deregister_class('Bread')
+    assert_equal(fp, main.target_fingerprint(mod, classes, rc))
+
+
+@with_setup(make_srcs, rm_srcs)
+def test_typesystem_snapshot():
+    d = tmpdir[-1]
+    sidecar = os.path.join(d, 'toaster.py')
+    with open(sidecar, 'w') as f:
+        f.write("mod = {'docstring': 'toasty'}\n")
+    rc = main.argparse.Namespace(package='pkg', packagedir='pkg', sourcedir=d, 
+                                 builddir=os.path.join(d, 'build'), 
+                                 classes=[('Toaster', 'toaster')], functions=[],
+                                 extra_types='xdress_extra_types', stlcontainers=[],
+                                 stlcontainers_module='stlcontainers', 
+                                 typesystem_snapshot=True, 
+                                 typesystem_snapshot_memo=True)
+    cache = main.cache
+    main.cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+    try:
+        assert_false(main.resolve_targets(None, rc))
+        assert_equal(rc.classes, [('Toaster', 'toaster', 'toaster')])
+        main.register_class_type('Toaster', 'toaster', 'toaster', rc)
+        main.dump_typesystem_snapshot(rc)
+        main.ts.deregister_class('Toaster')
+        main.pysrcenv.clear()
+        # nothing changed, the registrations and sidecars are restored
+        assert_true(main.resolve_targets(None, rc))
+        assert_true('Toaster' in main.ts.base_types)
+        assert_equal(main.pysrcenv['toaster'], {'docstring': 'toasty'})
+        # but not once a sidecar has changed
+        with open(sidecar, 'a') as f:
+            f.write("mod['extra'] = ''\n")
+        main.cache.forget_hashes()
+        assert_false(main.load_typesystem_snapshot(rc))
+    finally:
+        main.ts.deregister_class('Toaster')
+        main.pysrcenv.clear()
+        main.cache = cache
+
+
+def _plan(ns, rc):
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        main.plan(ns, rc)
+        return sys.stdout.getvalue()
+    finally:
+        sys.stdout = stdout
+
+@with_setup(make_srcs, rm_srcs)
+def test_plan_offline():
+    d = tmpdir[-1]
+    sidecar = os.path.join(d, 'toaster.py')
+    with open(sidecar, 'w') as f:
+        f.write("raise RuntimeError('sidecar run')\n")
+    bindir = os.path.join(d, 'bin')
+    os.mkdir(bindir)
+    ran = os.path.join(d, 'gccxml.ran')
+    gccxml = os.path.join(bindir, 'gccxml')
+    with open(gccxml, 'w') as f:
+        f.write('#!/bin/sh\ntouch {0}\necho GCC-XML version 0.9.0\n'.format(ran))
+    os.chmod(gccxml, 0755)
+    rc = main.argparse.Namespace(package=os.path.join(d, 'pkg'), packagedir='pkg', 
+                                 sourcedir=d, builddir=os.path.join(d, 'build'), 
+                                 classes=[('Toaster', 'toaster')], functions=[],
+                                 includes=[], extra_types='xdress_extra_types', 
+                                 stlcontainers=[], stlcontainers_module='stlcontainers')
+    ns = main.argparse.Namespace(includes=[], stlcont=False, cython=True)
+    cpp = os.path.join(d, 'toaster.cpp')
+    cache = main.cache
+    path = os.environ['PATH']
+    try:
+        # a fresh checkout, GCC-XML is not asked for its version
+        os.environ['PATH'] = bindir
+        main.cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+        out = _plan(ns, rc)
+        assert_false(os.path.exists(ran))
+        assert_true('class Toaster from {0}: unknown (no cache)'.format(cpp) in out)
+        assert_true('toaster: unknown (no cache)' in out)
+        # without gccxml on the path, the cache and recorded inputs are used
+        os.environ['PATH'] = d
+        main.cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+        desc = {'name': 'Toaster', 'parents': None, 'cpp_filename': 'toaster.cpp'}
+        main.cache.set(('Toaster', cpp, 'class'), desc, [], 
+                       [os.path.join(d, 'bread.h')])
+        main.cache.dump()
+        mod = dict(main._target_filenames('toaster'), Toaster=desc)
+        fp = main.target_fingerprint(mod, {'Toaster': desc}, rc)
+        main.dump_fingerprints({'toaster': dict(fp, **main.target_inputs(mod, 
+                                {'Toaster': desc}, rc))}, rc)
+        main.cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+        out = _plan(ns, rc)
+        assert_true('re-describe 0 of 1' in out)
+        assert_true('toaster: outputs missing' in out)
+        with open(sidecar, 'a') as f:
+            f.write('# changed\n')
+        with open(os.path.join(d, 'bread.h'), 'a') as f:
+            f.write('class Crumb {};\n')
+        main.cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+        out = _plan(ns, rc)
+        assert_true('{0}: {1} changed'.format(cpp, os.path.join(d, 'bread.h')) in out)
+        assert_true('toaster: descriptions of Toaster will be recomputed' in out)
+        # with the sources as they were, only the sidecar has changed
+        main.cache.set(('Toaster', cpp, 'class'), desc, [], 
+                       [os.path.join(d, 'bread.h')])
+        main.cache.dump()
+        main.dump_fingerprints({'toaster': dict(fp, **main.target_inputs(mod, 
+                                {'Toaster': desc}, rc))}, rc)
+        with open(sidecar, 'a') as f:
+            f.write('# changed again\n')
+        main.cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+        out = _plan(ns, rc)
+        assert_true('toaster: run control or sidecars changed, outputs missing' in out)
+        assert_equal(main.pysrcenv, {})
+    finally:
+        os.environ['PATH'] = path
+        main.cache = cache
+
+
+def _func_target(name):
+    desc = {'name': name, 'namespace': None, 'header_filename': name + '.h', 
+            'cpppxd_filename': 'cpp_' + name + '.pxd', 
+            'pxd_filename': name + '.pxd', 'pyx_filename': name + '.pyx', 
+            'signatures': {(name, ('n', 'int32')): 'float64'}}
+    return {name: desc, 'docstring': name, 'extra': '', 
+            'cpppxd_filename': desc['cpppxd_filename'], 
+            'pxd_filename': desc['pxd_filename'], 
+            'pyx_filename': desc['pyx_filename']}
+
+def _read_dir(d):
+    files = {}
+    for name in os.listdir(d):
+        with open(os.path.join(d, name)) as f:
+            files[name] = f.read()
+    return files
+
+@with_setup(make_srcs, rm_srcs)
+def test_generate_parallel():
+    d = tmpdir[-1]
+    targets = dict([(name, _func_target(name)) for name in 
+                    ['toast', 'bake', 'fry', 'boil']])
+    serial, parallel = os.path.join(d, 'serial'), os.path.join(d, 'parallel')
+    os.mkdir(serial)
+    os.mkdir(parallel)
+    main.generate_serial(targets, {}, main.argparse.Namespace(package=serial))
+    ns = main.argparse.Namespace(jobs=3)
+    enabled, events = main.profiler.enabled, main.profiler.pop_events()
+    main.profiler.enable()
+    try:
+        with main.profiler.stage('earlier stage', 'earlier'):
+            pass
+        main.generate_parallel(targets, {}, ns, 
+                               main.argparse.Namespace(package=parallel))
+        cats = [e['cat'] for e in main.profiler.events]
+    finally:
+        main.profiler.enabled = enabled
+        main.profiler.events = events
+    assert_equal(cats.count('earlier'), 1)
+    for cat in ['gencpppxd', 'genpxd', 'genpyx']:
+        assert_equal(cats.count(cat), 4)
+    assert_equal(cats.count('write'), 12)
+    files = _read_dir(serial)
+    assert_equal(len(files), 12)
+    assert_equal(files, _read_dir(parallel))
+    for name in targets:
+        assert_true(('generate', name) in main.timings)
+    # unchanged outputs are left alone
+    mtimes = dict([(name, os.path.getmtime(os.path.join(parallel, name))) 
+                   for name in files])
+    time.sleep(0.01)
+    main.generate_parallel(targets, {}, ns, main.argparse.Namespace(package=parallel))
+    for name, mtime in mtimes.items():
+        assert_equal(mtime, os.path.getmtime(os.path.join(parallel, name)))
+    # modified outputs are found and regenerated, and their records kept
+    bake = os.path.join(parallel, 'bake.pyx')
+    with open(bake, 'a') as f:
+        f.write('# baked\n')
+    assert_true(main.manifest.ismodified(bake))
+    main.generate_parallel(targets, {}, ns, main.argparse.Namespace(package=parallel))
+    assert_equal(files, _read_dir(parallel))
+    del main.manifest.modified[:]
+    for name in files:
+        fname = os.path.join(parallel, name)
+        assert_false(main.manifest.ismodified(fname))
+        assert_equal(main.manifest.check(fname), filedigest(fname))
+
+
+@with_setup(make_srcs, rm_srcs)
+def test_genbindings_twice():
+    d = tmpdir[-1]
+    bindir = os.path.join(d, 'bin')
+    os.mkdir(bindir)
+    ran = os.path.join(d, 'gccxml.ran')
+    gccxml = os.path.join(bindir, 'gccxml')
+    with open(gccxml, 'w') as f:
+        f.write('#!/bin/sh\nif [ "$1" = --version ]; then\n'
+                '  echo GCC-XML version 0.9.0\nelse\n  touch {0}\n  exit 1\n'
+                'fi\n'.format(ran))
+    os.chmod(gccxml, 0755)
+    pkg = os.path.join(d, 'pkg')
+    rc = main.argparse.Namespace(**dict(main.defaultrc, package=pkg, 
+            packagedir=pkg, sourcedir=d, builddir=os.path.join(d, 'build'), 
+            classes=[], functions=[('toast', 'toaster')], includes=[], 
+            stlcontainers=[('set', 'int32')]))
+    ns = main.argparse.Namespace(includes=[], verbose=False, jobs=1, cython=True, 
+                                 cyclus=False)
+    cpp = os.path.join(d, 'toaster.cpp')
+    desc = {'name': 'toast', 'namespace': None, 
+            'signatures': {('toast', ('n', 'int32')): 'float64'}}
+    cache, path = main.cache, os.environ['PATH']
+    enabled, events = main.profiler.enabled, main.profiler.pop_events()
+    manifestfile = os.path.join(rc.builddir, 'manifest.pkl')
+    try:
+        os.environ['PATH'] = bindir
+        main.profiler.enable()
+        # the description is cached, GCC-XML is only asked for its version
+        main.cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+        main.cache.set(('toast', cpp, 'func'), desc, [], 
+                       [os.path.join(d, 'toaster.h')])
+        main.cache.dump()
+        main.manifest.load(manifestfile)
+        main.genstlcontainers(ns, rc)
+        main.genbindings(ns, rc)
+        cats = [e['cat'] for e in main.profiler.pop_events()]
+        assert_equal(cats.count('stlwrap'), 1)
+        assert_equal(cats.count('genpyx'), 1)
+        outputs = [os.path.join(root, name) for root, dirs, names in os.walk(pkg) 
+                   for name in names]
+        assert_true(os.path.join(pkg, 'toaster.pyx') in outputs)
+        assert_true(os.path.join(pkg, 'stlcontainers.pyx') in outputs)
+        # as if the second run came well after the first, past the window in 
+        # which the manifest does not trust the stat of what it recorded
+        for f in outputs + [os.path.join(rc.builddir, 'fingerprints.pkl')]:
+            os.utime(f, (time.time() - 10.0, time.time() - 10.0))
+            main.manifest.check(f)
+        main.manifest.dump()
+        mtimes = dict([(f, os.path.getmtime(f)) for f in outputs])
+        fpmtime = os.path.getmtime(os.path.join(rc.builddir, 'fingerprints.pkl'))
+        # a second run, with nothing changed, generates and writes nothing
+        main.pysrcenv.clear()
+        main.cache = main.DescriptionCache(os.path.join(d, 'desccache'))
+        main.manifest.load(manifestfile)
+        main.manifest.pop_updates()
+        main.genstlcontainers(ns, rc)
+        main.genbindings(ns, rc)
+        cats = [e['cat'] for e in main.profiler.pop_events()]
+        for cat in ['stlwrap', 'gencpppxd', 'genpxd', 'genpyx', 'write']:
+            assert_equal(cats.count(cat), 0)
+        assert_equal(main.manifest.pop_updates(), ({}, []))
+        for f, mtime in mtimes.items():
+            assert_equal(mtime, os.path.getmtime(f))
+        assert_equal(fpmtime, os.path.getmtime(os.path.join(rc.builddir, 
+                                                            'fingerprints.pkl')))
+        assert_false(os.path.exists(ran))
+    finally:
+        os.environ['PATH'] = path
+        main.cache = cache
+        main.pysrcenv.clear()
+        main.manifest.load(None)
+        main.profiler.enabled = enabled
+        main.profiler.events = events
+
+
+def _work(i):
+    with main.profiler.stage('work {0}'.format(i), 'work'):
+        pass
+    return main.profiler.pop_events()
+
+def test_worker_events():
+    enabled, events = main.profiler.enabled, main.profiler.pop_events()
+    main.profiler.enable()
+    try:
+        with main.profiler.stage('earlier stage', 'earlier'):
+            pass
+        pool = main.worker_pool(2)
+        try:
+            for e in pool.imap(_work, range(4)):
+                main.profiler.events += e
+        finally:
+            pool.close()
+            pool.join()
+        cats = [e['cat'] for e in main.profiler.events]
+        assert_equal(cats.count('earlier'), 1)
+        assert_equal(cats.count('work'), 4)
+    finally:
+        main.profiler.enabled = enabled
+        main.profiler.events = events
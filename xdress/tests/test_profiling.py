@@ -0,0 +1,83 @@
+import os
+import json
+import tempfile
+
+from xdress.profiling import Profiler, MemoryProfiler, tracemalloc
+
+from nose.tools import assert_equal, assert_true
+
+
+def test_stage():
+    p = Profiler()
+    with p.stage('describe Toaster', 'describe'):
+        pass
+    assert_equal(p.events, [])
+    p.enable()
+    with p.stage('describe Toaster', 'describe', file='toaster.cpp'):
+        with p.stage('visit Toaster', 'visit'):
+            pass
+    assert_equal([e['name'] for e in p.events], ['visit Toaster', 'describe Toaster'])
+    outer, inner = p.events[1], p.events[0]
+    assert_true(outer['ts'] <= inner['ts'])
+    assert_true(inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur'])
+    assert_equal(outer['args']['file'], 'toaster.cpp')
+    if 'peak_rss' in outer['args']:
+        assert_true(0 < outer['args']['peak_rss'])
+        assert_true(0 <= inner['args']['peak_rss_growth'] <= 
+                    outer['args']['peak_rss_growth'])
+    assert_true(p.summary().splitlines()[1].startswith('describe'))
+
+
+def test_write_trace():
+    p = Profiler()
+    p.enable()
+    with p.stage('genpyx toaster', 'genpyx'):
+        pass
+    f = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+    f.close()
+    try:
+        p.write_trace(f.name)
+        with open(f.name) as f:
+            trace = json.load(f)
+    finally:
+        os.remove(f.name)
+    assert_equal(len(trace['traceEvents']), 1)
+    event = trace['traceEvents'][0]
+    assert_equal(event['ph'], 'X')
+    assert_equal(event['cat'], 'genpyx')
+    assert_equal(p.pop_events()[0]['name'], 'genpyx toaster')
+    assert_equal(p.events, [])
+
+
+def test_memprofile():
+    mp = MemoryProfiler(ntop=3)
+    mp.snapshot('start')
+    assert_equal(mp.records, [])
+    mp.enable()
+    pyxs = {'toaster': 'x' * 1000, 'oven': 'y' * 24}
+    mp.snapshot('after genpyx', pyxs=pyxs)
+    rec = mp.records[0]
+    assert_equal(rec['label'], 'after genpyx')
+    assert_equal(rec['held'], {'pyxs': 1024})
+    if tracemalloc is None:
+        assert_equal(rec['top'], [])
+        assert_true('no allocation sites' in mp.summary())
+    else:
+        assert_true(0 < len(rec['top']) <= 3)
+    assert_true(rec['peak_rss'] is None or 0 < rec['peak_rss'])
+    f = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+    f.close()
+    try:
+        mp.write(f.name)
+        with open(f.name) as f:
+            prof = json.load(f)
+    finally:
+        os.remove(f.name)
+    assert_equal(prof['snapshots'][0]['held'], {'pyxs': 1024})
+    assert_equal(mp.summary().splitlines()[1].split()[:2], ['after', 'genpyx'])
+    # the stages which raised the peak RSS
+    events = [{'name': 'genpyx toaster', 'args': {'peak_rss_growth': 3 * 2**20}}, 
+              {'name': 'genpyx oven', 'args': {'peak_rss_growth': 0}}]
+    lines = mp.summary(events).splitlines()
+    assert_equal(lines[-1].split(), ['3.0', 'MiB', 'genpyx', 'toaster'])
+    assert_equal(lines[-2], 'stages raising the peak RSS:')
@@ -1,6 +1,10 @@
-from bright.apigen import typesystem as ts
+import pickle
+import threading
 
-from nose.tools import assert_equal, with_setup
+from xdress import typesystem as ts
+
+from nose.tools import assert_equal, assert_true, assert_false, assert_raises, \
+    with_setup
 
 # setup and teardown new refinement cases
 new_refined = {
@@ -382,3 +386,200 @@ def test_cython_py2c():
     for (name, t, inst_name), exp in cases:
         yield check_cython_py2c, name, t, inst_name, exp  # Check that the case works,
 
+
+
+def test_memo_stats():
+    ts.clearmemo()
+    ts.clear_memo_stats()
+    ts.cython_ctype(('vector', 'float64'))
+    ts.cython_ctype(('vector', 'float64'))
+    stats = ts.memo_stats()
+    assert_equal(stats['cython_ctype']['hits'], 1)
+    assert_equal(stats['cython_ctype']['misses'], 2)  # and float64 within
+    # seen sets are not hashable, but the tuples of each type are still memoized
+    seen = set()
+    ts.cython_cimport_tuples(('set', 'str'), seen)
+    ts.cython_cimport_tuples(('set', 'str'), seen)
+    stats = ts.memo_stats()
+    assert_equal(stats['_cython_cimport_tuples']['hits'], 1)
+    assert_equal(ts.cython_cimport_tuples(('set', 'str')), seen)
+    ts.cython_cimports(seen)
+    assert_equal(ts.memo_stats()['cython_cimports']['bypasses'], 1)
+
+def test_memo_maxsize():
+    ts.clearmemo()
+    ts.clear_memo_stats()
+    ts.set_memo_maxsize(2)
+    try:
+        for t in ['int32', 'float64', 'str', 'int32']:
+            ts.cython_pytype(t)
+        stats = ts.memo_stats()['cython_pytype']
+        assert_equal(stats['size'], 2)
+        assert_equal(stats['evictions'], 2)
+        assert_equal(stats['hits'], 0)
+        # least recently used goes first
+        ts.cython_pytype('str')
+        ts.cython_pytype('float64')
+        assert_equal(ts.memo_stats()['cython_pytype']['hits'], 1)
+        assert_equal(ts.memo_cache('cython_pytype').keys(), [('str',), ('float64',)])
+    finally:
+        ts.set_memo_maxsize(None)
+    assert_equal(ts.memo_stats()['cython_pytype']['maxsize'], None)
+
+@with_setup(add_new_refined, del_new_refined)
+def test_resolve_dependent_type_pure():
+    ts.clearmemo()
+    aliases = dict(ts.type_aliases)
+    ts.clear_memo_stats()
+    assert_equal(ts.canon(('range', 'float64', 1, 2)),
+                 ('float64', ('range', 'float64', ('low', 'float64', 1),
+                                                  ('high', 'float64', 2))))
+    # the template parameters are not registered along the way, so nothing
+    # that was memoized meanwhile is invalidated
+    assert_equal(dict(ts.type_aliases), aliases)
+    stats = ts.memo_stats()
+    assert_equal(sum([st['invalidations'] for st in stats.values()]), 0)
+
+def test_memo_invalidation():
+    ts.clearmemo()
+    ts.clear_memo_stats()
+    ts.register_class('Toaster', cython_c_type='cpp_toaster.Toaster', 
+                      cython_cy_type='toaster.Toaster', cython_c2py='{var}', 
+                      cython_py2c='{var}')
+    try:
+        assert_equal(ts.cython_ctype(('vector', 'Toaster')), 
+                     'cpp_vector[cpp_toaster.Toaster]')
+        ts.cython_ctype(('set', 'int32'))
+    finally:
+        ts.deregister_class('Toaster')
+    # only results which depend on the class are evicted
+    assert_true((('set', 'int32'),) in ts.memo_cache('cython_ctype'))
+    assert_true(('int32',) in ts.memo_cache('canon'))
+    assert_false(('Toaster',) in ts.memo_cache('cython_ctype'))
+    assert_false((('vector', 'Toaster'),) in ts.memo_cache('cython_ctype'))
+    assert_raises(TypeError, ts.cython_ctype, ('vector', 'Toaster'))
+    # as are those which depend on the module name of the STL containers
+    assert_equal(ts.cython_pytype(('set', 'int32')), 'stlcontainers.SetInt')
+    with ts.swap_stlcontainers('conv'):
+        assert_true((('set', 'int32'),) in ts.memo_cache('cython_ctype'))
+        assert_equal(ts.cython_pytype(('set', 'int32')), 'conv.SetInt')
+    assert_equal(ts.cython_pytype(('set', 'int32')), 'stlcontainers.SetInt')
+    assert_true(0 < ts.memo_stats()['cython_pytype']['invalidations'])
+
+def test_lazy_dict_views():
+    d = ts._LazyConfigDict({'set': '{stlcontainers}SetInt'})
+    assert_equal(d['set'], 'stlcontainers.SetInt')
+    with ts.swap_stlcontainers('conv'):
+        assert_equal(d['set'], 'conv.SetInt')
+    assert_equal(len(d._views), 2)
+    # changes show up in every view
+    d['set'] = '{stlcontainers}SetStr'
+    assert_equal(d['set'], 'stlcontainers.SetStr')
+    with ts.swap_stlcontainers('conv'):
+        assert_equal(d['set'], 'conv.SetStr')
+    del d['set']
+    assert_raises(KeyError, d.__getitem__, 'set')
+
+def test_intern_type():
+    t = ts.canon(('map', 'int32', ('map', 'int32', ('vector', 'float64'))))
+    assert_equal(t, ('map', 'int32', ('map', 'int32', ('vector', 'float64', 0), 0), 0))
+    # equal types are the same object, as are their parts
+    u = ts.intern_type(('map', 'int32', ('map', 'int32', ('vector', 'float64', 0), 0), 0))
+    assert_true(t is u)
+    assert_true(t[2][2] is ts.canon(('vector', 'float64')))
+    assert_true(ts.intern_type('int32') == 'int32')
+    ntypes, size = ts.intern_stats()
+    assert_true(3 <= ntypes)
+    assert_true(0 < size)
+
+del_toaster_bread = lambda: [ts.deregister_class(name) for name in ('Toaster', 'Bread')
+                             if name in ts.base_types]
+
+@with_setup(None, del_toaster_bread)
+def test_snapshot_restore():
+    ts.register_class('Toaster', cython_c_type='cpp_toaster.Toaster', 
+                      cython_cy_type='toaster.Toaster', cython_py_type='Toaster',
+                      cython_c2py='{var}', cython_py2c='{var}')
+    ts.cython_ctype(('vector', 'Toaster'))
+    snap = pickle.loads(pickle.dumps(ts.snapshot(memo=True), 2))
+    ts.register_class('Bread', cython_c_type='cpp_bread.Bread', 
+                      cython_c2py='{var}', cython_py2c='{var}')
+    ts.clearmemo()
+    assert_true(ts.restore(snap))
+    assert_false('Bread' in ts.base_types)
+    assert_true('Toaster' in ts.base_types)
+    assert_true((('vector', 'Toaster'),) in ts.memo_cache('cython_ctype'))
+    assert_equal(ts.cython_ctype('Toaster'), 'cpp_toaster.Toaster')
+    # restored memos are still invalidated by changes
+    ts.register_class('Toaster', cython_c_type='cpp_toaster.Crumb', 
+                      cython_c2py='{var}', cython_py2c='{var}')
+    assert_false((('vector', 'Toaster'),) in ts.memo_cache('cython_ctype'))
+    # snapshots of other versions are refused
+    snap['version'] = -1
+    assert_false(ts.restore(snap))
+    assert_equal(ts.cython_ctype('Toaster'), 'cpp_toaster.Crumb')
+
+del_crumpet = lambda: [ts.deregister_class(name) for name in ['Crumpet'] 
+                       if name in ts.base_types]
+
+@with_setup(None, del_crumpet)
+def test_fork():
+    ts.clearmemo()
+    assert_equal(ts.cython_ctype(('set', 'int32')), 'cpp_set[int]')
+    t = ts.current().fork()
+    # forks start out with the memoized results of their parent
+    assert_true((('set', 'int32'),) in t.memo_cache('cython_ctype'))
+    t.register_class('Bagel', cython_c_type='cpp_bagel.Bagel')
+    assert_equal(t.cython_ctype(('vector', 'Bagel')), 'cpp_vector[cpp_bagel.Bagel]')
+    assert_false('Bagel' in ts.base_types)
+    assert_raises(TypeError, ts.cython_ctype, ('vector', 'Bagel'))
+    # and changes to the parent do not show up in the fork either
+    ts.register_class('Crumpet', cython_c_type='cpp_crumpet.Crumpet', 
+                      cython_c2py='{var}', cython_py2c='{var}')
+    assert_equal(ts.cython_ctype('Crumpet'), 'cpp_crumpet.Crumpet')
+    assert_raises(TypeError, t.cython_ctype, 'Crumpet')
+    conv = t.fork(stlcontainers='conv')
+    assert_equal(conv.cython_pytype(('set', 'int32')), 'conv.SetInt')
+    assert_equal(conv.cython_ctype('Bagel'), 'cpp_bagel.Bagel')
+    assert_equal(t.cython_pytype(('set', 'int32')), 'stlcontainers.SetInt')
+
+del_muffin = lambda: [ts.deregister_class(name) for name in ['Muffin'] 
+                      if name in ts.base_types]
+
+@with_setup(None, del_muffin)
+def test_enter():
+    ts.register_class('Muffin', cython_c_type='cpp_muffin.Muffin', 
+                      cython_c2py='{var}', cython_py2c='{var}')
+    t = ts.TypeSystem(stlcontainers='conv')
+    assert_false(ts.current() is t)
+    with t:
+        assert_true(ts.current() is t)
+        with t:
+            assert_equal(ts.cython_pytype(('set', 'int32')), 'conv.SetInt')
+        assert_true(ts.current() is t)
+        # new type systems only have the built in types
+        assert_raises(TypeError, ts.canon, 'Muffin')
+    assert_false(ts.current() is t)
+    assert_equal(ts.canon('Muffin'), 'Muffin')
+
+def test_threads():
+    types = [('set', 'int32'), ('map', 'str', 'float64'), ('vector', 'int32'),
+             ('map', 'int32', ('set', 'str'))]
+    mods = ['mod{0}'.format(i) for i in range(8)]
+    expected = dict([(mod, [ts.current().fork(stlcontainers=mod).cython_c2py('x', t) 
+                            for t in types]) for mod in mods])
+    results = {}
+    def run(mod):
+        with ts.current().fork(stlcontainers=mod) as fork:
+            for i in range(20):
+                ts.clearmemo()
+                with fork.swap_stlcontainers(None):
+                    ts.cython_pytype(types[0])
+                results[mod] = [ts.cython_c2py('x', t) for t in types]
+    threads = [threading.Thread(target=run, args=(mod,)) for mod in mods]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert_equal(results, expected)
+    assert_equal(ts.current().stlcontainers, 'stlcontainers')
@@ -0,0 +1,154 @@
+import os
+import time
+import shutil
+import tempfile
+from hashlib import md5
+
+from xdress.utils import Emitter, Manifest, filedigest, newoverwrite
+
+from nose.tools import assert_equal, assert_true, assert_false, assert_raises, \
+    with_setup
+
+tmpdir = []
+
+def make_dir():
+    tmpdir.append(tempfile.mkdtemp())
+
+def rm_dir():
+    shutil.rmtree(tmpdir.pop())
+
+
+@with_setup(make_dir, rm_dir)
+def test_emitter():
+    d = tmpdir[-1]
+    fname = os.path.join(d, 'pkg', 'toaster.pyx')
+    with Emitter(fname) as f:
+        f.write('cdef class Toaster:\n')
+        f.writelines(['    pass', '\n'])
+    with open(fname) as f:
+        assert_equal(f.read(), 'cdef class Toaster:\n    pass\n')
+    assert_equal(os.listdir(os.path.join(d, 'pkg')), ['toaster.pyx'])
+    # the same contents are not written
+    os.utime(fname, (1, 1))
+    e = Emitter(fname)
+    e.write('cdef class Toaster:\n    pass\n')
+    assert_false(e.commit())
+    assert_equal(os.path.getmtime(fname), 1)
+    assert_equal(e.digest, filedigest(fname))
+    # other contents, even of the same size, are
+    e = Emitter(fname)
+    e.write('cdef class Roaster:\n    pass\n')
+    assert_true(e.commit())
+    with open(fname) as f:
+        assert_equal(f.read(), 'cdef class Roaster:\n    pass\n')
+    assert_equal(os.listdir(os.path.join(d, 'pkg')), ['toaster.pyx'])
+
+
+@with_setup(make_dir, rm_dir)
+def test_emitter_discard():
+    d = tmpdir[-1]
+    fname = os.path.join(d, 'toaster.pyx')
+    with open(fname, 'w') as f:
+        f.write('old')
+    def emit():
+        with Emitter(fname) as f:
+            f.write('new')
+            raise ValueError
+    assert_raises(ValueError, emit)
+    with open(fname) as f:
+        assert_equal(f.read(), 'old')
+    assert_equal(os.listdir(d), ['toaster.pyx'])
+
+
+@with_setup(make_dir, rm_dir)
+def test_manifest():
+    d = tmpdir[-1]
+    fname = os.path.join(d, 'toaster.pyx')
+    mfile = os.path.join(d, 'build', 'manifest.pkl')
+    m = Manifest(mfile)
+    assert_equal(m.check(fname), None)
+    with open(fname, 'w') as f:
+        f.write('toast')
+    os.utime(fname, (100, 100))
+    digest = md5('toast').hexdigest()
+    # files of another size are only read once recorded
+    assert_equal(m.check(fname, 3), None)
+    assert_equal(m.check(fname), digest)
+    # recorded files are not read while their stat is unchanged
+    with open(fname, 'w') as f:
+        f.write('roast')
+    os.utime(fname, (100, 100))
+    assert_equal(m.check(fname, 3), digest)
+    assert_false(m.ismodified(fname))
+    # but are once it changes
+    os.utime(fname, (200, 200))
+    assert_true(m.ismodified(fname))
+    assert_equal(m.check(fname), md5('roast').hexdigest())
+    assert_equal(m.modified, [os.path.abspath(fname)])
+    m.dump()
+    assert_equal(Manifest(mfile).entries, m.entries)
+    # updates made by workers
+    m2 = Manifest()
+    m2.merge(m.pop_updates())
+    assert_equal(m2.entries, m.entries)
+    assert_equal(m2.modified, [os.path.abspath(fname)])
+    assert_equal(m.modified, [])
+
+
+@with_setup(make_dir, rm_dir)
+def test_manifest_racy():
+    d = tmpdir[-1]
+    fname = os.path.join(d, 'toaster.pyx')
+    m = Manifest()
+    now = int(time.time())
+    with open(fname, 'w') as f:
+        f.write('toast')
+    os.utime(fname, (now, now))
+    assert_equal(m.check(fname), md5('toast').hexdigest())
+    # files recorded as soon as they were written are read again, since they
+    # may have changed within the same timestamp
+    with open(fname, 'w') as f:
+        f.write('roast')
+    os.utime(fname, (now, now))
+    assert_equal(m.check(fname), md5('roast').hexdigest())
+    assert_true(m.ismodified(fname))
+    # while still too new, confirming the contents changes nothing
+    m.pop_updates()
+    assert_equal(m.check(fname), md5('roast').hexdigest())
+    assert_equal(m.pop_updates(), ({}, []))
+
+
+@with_setup(make_dir, rm_dir)
+def test_manifest_racy_once():
+    d = tmpdir[-1]
+    fname = os.path.join(d, 'toaster.pyx')
+    m = Manifest()
+    with open(fname, 'w') as f:
+        f.write('toast')
+    os.utime(fname, (100, 100))
+    # a file recorded as soon as it was written, checked by a later run
+    m.record(fname, md5('toast').hexdigest())
+    key = os.path.abspath(fname)
+    m.entries[key] = m.entries[key][:3] + (100.5,)
+    assert_equal(m.check(fname), md5('toast').hexdigest())
+    assert_true(m.entries[key][3] > 100.5)
+    # is hashed again only once, its renewed record is trusted
+    with open(fname, 'w') as f:
+        f.write('roast')
+    os.utime(fname, (100, 100))
+    assert_equal(m.check(fname), md5('toast').hexdigest())
+    assert_false(m.ismodified(fname))
+
+
+@with_setup(make_dir, rm_dir)
+def test_newoverwrite():
+    d = tmpdir[-1]
+    fname = os.path.join(d, 'toaster.pyx')
+    newoverwrite('toast', fname)
+    os.utime(fname, (100, 100))
+    newoverwrite('toast', fname)
+    assert_equal(os.path.getmtime(fname), 100)
+    newoverwrite('roast', fname)
+    with open(fname) as f:
+        assert_equal(f.read(), 'roast')
+    assert_equal(os.listdir(d), ['toaster.pyx'])
@@ -213,64 +213,370 @@ above.  It is therefore recommended that users and developers write code that us
 the shorter versions, Note that ``canon()`` is guaranteed to return strings, tuples, 
 and integers only -- making the output of this function hashable.
 
+Type System Contexts
+--------------------
+The registries, the EXTRA_TYPES and STLCONTAINERS settings, and the memoized 
+results all belong to a ``TypeSystem``.  The module-level registries and settings
+are those of the default type system, and the module-level functions call the
+methods of the current type system of the thread.  That is the default one unless 
+another has been entered in a with-statement::
+
+    mystl = current().fork(stlcontainers='mystl')
+    with mystl:
+        cython_c2py('x', ('set', 'int'))  # filled in with mystl
+
+A fork starts out with the registrations, settings and memoized results of its 
+parent, and shares them until either one changes them, so forking is cheap.
+Since each thread has its own current type system, threads may generate code 
+concurrently as long as each enters its own fork.  ``TypeSystem()`` makes a new
+type system with only the built in types.
+
 Type System API
 ===============
 
 """
+import sys
+import weakref
 import functools
+import threading
+from hashlib import md5
 from contextlib import contextmanager
-from collections import Sequence, Set, Iterable, MutableMapping
-
-def _ishashable(x):
-    try:
-        hash(x)
-        return True
-    except TypeError:
-        return False 
-
-def _memoize(obj):
+from collections import OrderedDict
+from collections import Sequence, Set, MutableSet, Iterable, MutableMapping
+
+_memoized = []
+"""Names of the memoized methods of TypeSystem, indexed by their memo slots."""
+
+_ALL = object()
+"""Dependency key standing for every key of a registry, i.e. the registry was
+iterated over."""
+
+_SAME = object()
+"""Default of the settings arguments of TypeSystem.fork(), for keeping them."""
+
+_default_config = None
+"""The settings of the default type system, as of its memoized results."""
+
+class _State(threading.local):
+    """The state of each thread: the current type system, the stack of those
+    that it replaced on entering it, and the stack of the sets of dependencies
+    read by the memoized calls being computed."""
+
+    def __init__(self):
+        self.ts = _default
+        self.stack = []
+        self.frames = []
+
+def _depend(dep):
+    """Records that the memoized call being computed depends on dep, which is
+    either a (registry name, key) pair or a (setting name,) tuple."""
+    frames = _state.frames
+    if frames:
+        frames[-1].add(dep)
+
+
+class _Memo(object):
+    """The memoized results of one method in one type system.  The cache is a dict,
+    or an OrderedDict in least recently used order when its size is bounded by
+    maxsize.  The deps map keys to the dependencies of their results, and counts
+    holds the numbers of hits, misses, bypasses (calls with unhashable arguments,
+    which are not cached), evictions and invalidations."""
+
+    __slots__ = ('cache', 'deps', 'counts', 'maxsize')
+
+    def __init__(self, maxsize=None):
+        self.cache = {} if maxsize is None else OrderedDict()
+        self.deps = {}
+        self.counts = [0, 0, 0, 0, 0]
+        self.maxsize = maxsize
+
+    def copy(self, maxsize=None):
+        """A copy of the results, without the counts, bounded by maxsize."""
+        memo = _Memo(maxsize)
+        memo.cache.update(self.cache)
+        memo.deps.update(self.deps)
+        memo.resize(maxsize)
+        return memo
+
+    def resize(self, maxsize):
+        """Bounds the results by maxsize, evicting the least recently used ones."""
+        if maxsize is None:
+            self.cache = dict(self.cache)
+        else:
+            self.cache = OrderedDict(self.cache)
+            while 0 < len(self.cache) and maxsize < len(self.cache):
+                self.deps.pop(self.cache.popitem(last=False)[0], None)
+                self.counts[3] += 1
+        self.maxsize = maxsize
+
+def _memoize(meth):
+    """Caches the return values of a method of TypeSystem by its arguments,
+    separately in each type system.  See TypeSystem.set_memo_maxsize() and
+    TypeSystem.memo_stats().
+
+    While a result is computed, the registry keys and settings that it reads are
+    recorded as its dependencies, including those read by the memoized methods
+    that it calls.  Changing a registry or setting then invalidates only the
+    results which depend on it.
+    """
     # based off code from http://wiki.python.org/moin/PythonDecoratorLibrary
-    cache = obj.cache = {}
-    @functools.wraps(obj)
-    def memoizer(*args, **kwargs):
-        key = args + tuple(sorted(kwargs.items()))
-        hashable = _ishashable(key)
-        if hashable:
-            if key not in cache:
-                cache[key] = obj(*args, **kwargs)
-            return cache[key]
+    slot = len(_memoized)
+    _memoized.append(meth.__name__)
+
+    @functools.wraps(meth)
+    def memoizer(self, *args, **kwargs):
+        # the dependencies being recorded by the memoized calls of this thread
+        frames = _state.frames
+        if not frames and self is _default and \
+           (EXTRA_TYPES, STLCONTAINERS) != _default_config:
+            # nested calls go by the settings of the outermost one
+            self._set_config(EXTRA_TYPES, STLCONTAINERS)
+        memo = self._memos[slot] or self._inherit_memo(slot)
+        key = args + tuple(sorted(kwargs.items())) if kwargs else args
+        cache = memo.cache
+        try:
+            rtn = cache[key]
+        except TypeError:
+            memo.counts[2] += 1
+            return meth(self, *args, **kwargs)
+        except KeyError:
+            pass
         else:
-            return obj(*args, **kwargs)
+            memo.counts[0] += 1
+            if frames:
+                frames[-1].update(memo.deps.get(key, ()))
+            if memo.maxsize is not None:
+                with self._lock:
+                    if key in cache:
+                        del cache[key]
+                        cache[key] = rtn
+            return rtn
+        memo.counts[1] += 1
+        frames.append(set())
+        try:
+            rtn = meth(self, *args, **kwargs)
+        finally:
+            deps = frames.pop()
+        if frames:
+            frames[-1].update(deps)
+        with self._lock:
+            memo = self._memos[slot]
+            cache = memo.cache
+            if memo.maxsize is not None:
+                while 0 < len(cache) and memo.maxsize <= len(cache):
+                    memo.deps.pop(cache.popitem(last=False)[0], None)
+                    memo.counts[3] += 1
+                if memo.maxsize <= 0:
+                    return rtn
+            cache[key] = rtn
+            memo.deps[key] = deps
+            dependents = self._dependents
+            for dep in deps:
+                if dep in dependents:
+                    dependents[dep].add((slot, key))
+                else:
+                    dependents[dep] = set([(slot, key)])
+        return rtn
     return memoizer
 
 
-base_types = set(['char', 'str', 'int32', 'int64', 'uint32', 'uint64', 'float32', 
-                  'float64', 'complex128', 'void', 'bool'])
+class _Registry(object):
+    """Base of the registries of a type system.  Reads are recorded as
+    dependencies of memoized results, on (registry name, key) pairs, and changes
+    invalidate those results.  The contents are kept in _d, which is shared
+    copy-on-write between the registries of a type system and of its forks."""
+
+    _shared = False
+    _ts = None
+
+    def __init__(self, items=()):
+        self._replace(items)
+        self._name = id(self)
+
+    def _adopt(self, ts, name):
+        """Makes this the registry called name of the type system ts."""
+        self._ts = ts
+        self._name = name
+
+    def _fork(self, ts):
+        """Returns a registry of ts sharing the contents of this one."""
+        new = object.__new__(type(self))
+        new.__dict__.update(self.__dict__)
+        new._ts = ts
+        self._shared = new._shared = True
+        return new
+
+    def _own(self):
+        """Copies the contents, if shared, ahead of changing them."""
+        if self._shared:
+            self._copy()
+            self._shared = False
+
+    def _copy(self):
+        self._d = self._d.copy()
+
+    def _changed(self, key=_ALL):
+        (self._ts or _state.ts)._changed(self._name, key)
+
+    def __len__(self):
+        return len(self._d)
+
+    def __repr__(self):
+        return "{0}({1!r})".format(self.__class__.__name__, self._d)
+
+
+class _RegistrySet(_Registry, MutableSet):
+    """A set registry."""
+
+    def _replace(self, items):
+        """Replaces the contents, without invalidating anything."""
+        self._d = set(items)
+        self._shared = False
+
+    def __contains__(self, key):
+        frames = _state.frames
+        if frames:
+            frames[-1].add((self._name, key))
+        return key in self._d
+
+    def __iter__(self):
+        _depend((self._name, _ALL))
+        return iter(self._d)
+
+    def add(self, key):
+        self._own()
+        self._d.add(key)
+        self._changed(key)
+
+    def remove(self, key):
+        self._own()
+        self._d.remove(key)
+        self._changed(key)
+
+    def discard(self, key):
+        self._own()
+        self._d.discard(key)
+        self._changed(key)
+
+    def update(self, *others):
+        keys = set().union(*others)
+        self._own()
+        self._d.update(keys)
+        for key in keys:
+            self._changed(key)
+
+    def clear(self):
+        self._own()
+        self._d.clear()
+        self._changed()
+
+
+class _RegistryDict(_Registry, MutableMapping):
+    """A dict registry."""
+
+    def _replace(self, items):
+        """Replaces the contents, without invalidating anything."""
+        self._d = dict(items)
+        self._shared = False
+
+    def __contains__(self, key):
+        frames = _state.frames
+        if frames:
+            frames[-1].add((self._name, key))
+        return key in self._d
+
+    def __getitem__(self, key):
+        frames = _state.frames
+        if frames:
+            frames[-1].add((self._name, key))
+        return self._d[key]
+
+    def get(self, key, default=None):
+        frames = _state.frames
+        if frames:
+            frames[-1].add((self._name, key))
+        return self._d.get(key, default)
+
+    def __iter__(self):
+        _depend((self._name, _ALL))
+        return iter(self._d)
+
+    def keys(self):
+        _depend((self._name, _ALL))
+        return self._d.keys()
+
+    def values(self):
+        _depend((self._name, _ALL))
+        return self._d.values()
+
+    def items(self):
+        _depend((self._name, _ALL))
+        return self._d.items()
+
+    def iterkeys(self):
+        return iter(self)
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def __setitem__(self, key, value):
+        self._own()
+        self._d[key] = value
+        self._changed(key)
+
+    def __delitem__(self, key):
+        self._own()
+        del self._d[key]
+        self._changed(key)
+
+    def pop(self, key, *default):
+        self._own()
+        rtn = self._d.pop(key, *default)
+        self._changed(key)
+        return rtn
+
+    def popitem(self):
+        self._own()
+        key, value = self._d.popitem()
+        self._changed(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self._d[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        self._own()
+        self._d.clear()
+        self._changed()
+
+
+base_types = _RegistrySet(['char', 'str', 'int32', 'int64', 'uint32', 'uint64', 
+                           'float32', 'float64', 'complex128', 'void', 'bool'])
 """Base types in the type system."""
 
-template_types = {
+template_types = _RegistryDict({
     'map': ('key_type', 'value_type'),
     'dict': ('key_type', 'value_type'),
     'pair': ('key_type', 'value_type'),
     'set': ('value_type',),
     'vector': ('value_type',),
-    }
+    })
 """Template types are types whose instantiations are based on meta-types.
 this dict maps their names to meta-type names in order."""
 
-@_memoize
-def istemplate(t):
-    """Returns whether t is a template type or not."""
-    if isinstance(t, basestring):
-        return t in template_types
-    if isinstance(t, Sequence):
-        return istemplate(t[0])
-    return False
-
-refined_types = {
+refined_types = _RegistryDict({
     'nucid': 'int32',
     'nucname': 'str',
-    }
+    })
 """This is a mapping from refinement type names to the parent types.
 The parent types may either be base types, compound types, template 
 types, or other refined types!"""
@@ -293,130 +599,29 @@ _humannames = {
     'vector': 'vector [ndarray] of {value_type}',
     }
 
-@_memoize
-def humanname(t, hnt=None):
-    """Computes human names for types."""
-    if hnt is None:
-        t = canon(t)
-        if isinstance(t, basestring):
-            return t, _humannames[t]
-        elif t[0] in base_types:
-            return t, _humannames[t[0]]
-        return humanname(t, _humannames[t[0]])
-    d = {}
-    for key, x in zip(template_types[t[0]], t[1:-1]):
-        if isinstance(x, basestring):
-            val = _humannames[x]
-        elif x[0] in base_types:
-            val = _humannames[x[0]]
-        else: 
-            val, _ = humanname(x, _humannames[x[0]])
-        d[key] = val
-    return t, hnt.format(**d)
-
-@_memoize
-def isdependent(t):
-    """Returns whether t is a dependent type or not."""
-    deptypes = set([k[0] for k in refined_types if not isinstance(k, basestring)])
-    if isinstance(t, basestring):
-        return t in deptypes
-    if isinstance(t, Sequence):
-        return isdependent(t[0])
-    return False
-
-
-@_memoize
-def isrefinement(t):
-    """Returns whether t is a refined type."""
-    if isinstance(t, basestring):
-        return t in refined_types
-    return isdependent(t)
-        
-
 def _raise_type_error(t):
     raise TypeError("type of {0!r} could not be determined".format(t))
 
-@_memoize
-def _resolve_dependent_type(tname, tinst=None):
-    depkey = [k for k in refined_types if k[0] == tname][0]
-    depval = refined_types[depkey]
-    istemplated = any([isinstance(x, basestring) for x in depkey[1:]])
-    if tinst is None:
-        return depkey
-    elif istemplated:
-        assert len(tinst) == len(depkey)
-        typemap = {k: tinst[i] for i, k in enumerate(depkey[1:], 1) \
-                                                    if isinstance(k, basestring)}
-        for k in typemap:
-            if k in type_aliases:
-                raise TypeError('template type {0} already exists'.format(k))
-        type_aliases.update(typemap)
-        resotype = canon(depval), (tname,) + \
-                        tuple([canon(k) for k in depkey[1:] if k in typemap]) + \
-                        tuple([(k[0], canon(k[1]), instval) \
-                            for k, instval in zip(depkey[1:], tinst[1:])
-                            if k not in typemap])
-        for k in typemap:
-            del type_aliases[k]
-            canon.cache.pop((k,), None)
-        return resotype
-    else:
-        assert len(tinst) == len(depkey)
-        return canon(depval), (tname,) + tuple([(kname, canon(ktype), instval) \
-                        for (kname, ktype), instval in zip(depkey[1:], tinst[1:])])
-
-@_memoize
-def canon(t):
-    """Turns the type into its canonical form. See module docs for more information."""
-    if isinstance(t, basestring):
-        if t in base_types:
-            return t
-        elif t in type_aliases:
-            return canon(type_aliases[t])
-        elif t in refined_types:
-            return (canon(refined_types[t]), t)
-        elif isdependent(t):
-            return _resolve_dependent_type(t)
-        else:
-            _raise_type_error(t)
-            # BELOW this would be for complicated string representations, 
-            # such as 'char *' or 'map<nucid, double>'.  Would need to write
-            # the parse_type() function and that might be a lot of work.
-            #parse_type(t)  
-    elif isinstance(t, Sequence):
-        t0 = t[0]
-        tlen = len(t)
-        if 0 == tlen:
-            _raise_type_error(t)
-        last_val = 0 if tlen == 1 else t[-1]
-        if isinstance(t0, basestring):
-            if t0 in template_types:
-                templen = len(template_types[t0])
-                last_val = 0 if tlen == 1 + templen else t[-1]
-                filledt = [t0] + [canon(tt) for tt in t[1:1+templen]] + [last_val]
-                return tuple(filledt)
-            elif isdependent(t0):
-                return _resolve_dependent_type(t0, t)
-            else:
-                #if 2 < tlen:
-                #    _raise_type_error(t)
-                return (canon(t0), last_val)
-        elif isinstance(t0, Sequence):
-            t00 = t0[0]
-            if isinstance(t00, basestring):
-                # template or independent refinement type
-                return (canon(t0), last_val)
-            elif isinstance(t00, Sequence):
-                # zOMG dependent type
-                return _resolve_dependent_type(t00, t0)
-            # BELOW is for possible compound types...
-            #return (tuple([canon(subt) for subt in t[0]]), last_val)
-        else:
-            _raise_type_error(t)
-    else:
-        _raise_type_error(t)
+_interned = {}
+"""The intern table of canonical types, mapping each to its one instance."""
 
-#################### Type System Above This Line ##########################
+def intern_type(t):
+    """Returns the unique interned instance of a type, built from interned 
+    instances of its subtypes.  Equal interned types are then the same object, so
+    that they compare in constant time (dict lookups and tuple comparisons check
+    identity first), and share their memory.  canon() always returns interned 
+    types.
+    """
+    if not isinstance(t, tuple):
+        return t
+    try:
+        return _interned[t]
+    except KeyError:
+        pass
+    except TypeError:
+        return t  # holds something unhashable, such as a default value
+    it = tuple([intern_type(x) for x in t])
+    return _interned.setdefault(it, it)
 
 EXTRA_TYPES = 'xdress_extra_types'
 
@@ -433,80 +638,116 @@ def _recurse_replace(x, a, b):
     else:
         return x
     
-class _LazyConfigDict(MutableMapping):
-    def __init__(self, items):
+def _substitute(x, typemap):
+    """Replaces the names of template parameters in a (possibly nested) type
+    with the types that typemap maps them to."""
+    if isinstance(x, basestring):
+        return typemap.get(x, x)
+    elif isinstance(x, Sequence):
+        return tuple([_substitute(y, typemap) for y in x])
+    else:
+        return x
+
+def _placeholders(x):
+    """The settings that a (possibly nested) registry value refers to, as
+    dependencies."""
+    if isinstance(x, basestring):
+        return set([(name,) for name, ph in (('EXTRA_TYPES', '{extra_types}'), 
+                    ('STLCONTAINERS', '{stlcontainers}')) if ph in x])
+    elif isinstance(x, Sequence):
+        return set().union(*[_placeholders(y) for y in x])
+    return set()
+
+class _LazyDict(_Registry, MutableMapping):
+    """Base for the registries whose values are filled in with the extra_types
+    and stlcontainers settings of their type system when looked up.  The filled
+    in values are kept in a resolved view for each (extra_types, stlcontainers)
+    pair, so that each value is resolved once per configuration and lookups are
+    plain dict accesses.  Subclasses fill in values with _resolve().
+
+    Lookups are recorded as dependencies of memoized results, on the key and on
+    the settings that the value refers to, and changes invalidate those results.
+    """
+
+    def _replace(self, items):
+        """Replaces the contents, without invalidating anything."""
         self._d = dict(items)
+        self._globs = dict([(k, _placeholders(v)) for k, v in self._d.items()])
+        self._views = {}
+        self._cv = (_ALL, None)
+        self._shared = False
 
-    def __len__(self):
-        return len(self._d)
+    def _copy(self):
+        self._d = dict(self._d)
+        self._globs = dict(self._globs)
+        self._views = dict([(k, dict(v)) for k, v in self._views.items()])
+        self._cv = (_ALL, None)
 
     def __contains__(self, key):
+        frames = _state.frames
+        if frames:
+            frames[-1].add((self._name, key))
         return key in self._d
 
     def __iter__(self):
+        _depend((self._name, _ALL))
         for k in self._d:
             yield k
 
     def __getitem__(self, key):
-        value = self._d[key]
-        kw = {'extra_types': _ensuremoddot(EXTRA_TYPES),
-              'stlcontainers': _ensuremoddot(STLCONTAINERS),}
-        for k, v in kw.items():
-            value = _recurse_replace(value, '{' + k + '}', v)
-        return value
+        frames = _state.frames
+        if frames:
+            frames[-1].add((self._name, key))
+            frames[-1].update(self._globs.get(key, ()))
+        ts = self._ts or _state.ts
+        config = (EXTRA_TYPES, STLCONTAINERS) if ts is _default else ts._config
+        cv = self._cv
+        if config != cv[0]:
+            # the configuration and its view are swapped together, for threads
+            cv = self._cv = (config, self._views.setdefault(config, {}))
+        view = cv[1]
+        try:
+            return view[key]
+        except KeyError:
+            value = view[key] = self._resolve(self._d[key], *config)
+            return value
 
     def __setitem__(self, key, value):
+        self._own()
         self._d[key] = value
+        self._globs[key] = _placeholders(value)
+        for view in self._views.values():
+            view.pop(key, None)
+        self._changed(key)
 
     def __delitem__(self, key):
+        self._own()
         del self._d[key]
+        del self._globs[key]
+        for view in self._views.values():
+            view.pop(key, None)
+        self._changed(key)
+
+class _LazyConfigDict(_LazyDict):
+    def _resolve(self, value, extra_types, stlcontainers):
+        kw = {'extra_types': _ensuremoddot(extra_types),
+              'stlcontainers': _ensuremoddot(stlcontainers),}
+        for k, v in kw.items():
+            value = _recurse_replace(value, '{' + k + '}', v)
+        return value
 
-class _LazyImportDict(MutableMapping):
-    def __init__(self, items):
-        self._d = dict(items)
-
-    def __len__(self):
-        return len(self._d)
-
-    def __contains__(self, key):
-        return key in self._d
-
-    def __iter__(self):
-        for k in self._d:
-            yield k
-
-    def __getitem__(self, key):
-        value = self._d[key]
-        kw = {'extra_types': _ensuremod(EXTRA_TYPES),
-              'stlcontainers': _ensuremod(STLCONTAINERS),}
+class _LazyImportDict(_LazyDict):
+    def _resolve(self, value, extra_types, stlcontainers):
+        kw = {'extra_types': _ensuremod(extra_types),
+              'stlcontainers': _ensuremod(stlcontainers),}
         newvalue = tuple(tuple(x.format(**kw) or None for x in imp if x is not None) \
                             for imp in value if imp is not None) or (None,)
         return newvalue
 
-    def __setitem__(self, key, value):
-        self._d[key] = value
-
-    def __delitem__(self, key):
-        del self._d[key]
-
-class _LazyConverterDict(MutableMapping):
-    def __init__(self, items):
-        self._d = dict(items)
-
-    def __len__(self):
-        return len(self._d)
-
-    def __contains__(self, key):
-        return key in self._d
-
-    def __iter__(self):
-        for k in self._d:
-            yield k
-
-    def __getitem__(self, key):
-        value = self._d[key]
-        kw = {'extra_types': _ensuremoddot(EXTRA_TYPES),
-              'stlcontainers': _ensuremoddot(STLCONTAINERS),}
+class _LazyConverterDict(_LazyDict):
+    def _resolve(self, value, extra_types, stlcontainers):
+        kw = {'extra_types': _ensuremoddot(extra_types),
+              'stlcontainers': _ensuremoddot(stlcontainers),}
         newvalue = []
         for x in value:
             newx = x
@@ -516,12 +757,6 @@ class _LazyConverterDict(MutableMapping):
             newvalue.append(newx)
         return tuple(newvalue)
 
-    def __setitem__(self, key, value):
-        self._d[key] = value
-
-    def __delitem__(self, key):
-        del self._d[key]
-
 type_aliases = _LazyConfigDict({
     'i': 'int32',
     'i4': 'int32',
@@ -584,36 +819,6 @@ _cython_ctypes = _LazyConfigDict({
     'vector': 'cpp_vector',
     })
 
-@_memoize
-def cython_ctype(t):
-    """Given a type t, returns the cooresponding Cython C type declaration."""
-    t = canon(t)
-    if isinstance(t, basestring):
-        if  t in base_types:
-            return _cython_ctypes[t]
-    # must be tuple below this line
-    tlen = len(t)
-    if 2 == tlen:
-        if 0 == t[1]:
-            return cython_ctype(t[0])
-        elif isrefinement(t[1]):
-            return cython_ctype(t[0])
-        else:
-            last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
-            return cython_ctype(t[0]) + ' {0}'.format(last)
-    elif 3 <= tlen:
-        assert t[0] in template_types
-        assert len(t) == len(template_types[t[0]]) + 2
-        template_name = _cython_ctypes[t[0]]
-        assert template_name is not NotImplemented
-        template_filling = ', '.join([cython_ctype(x) for x in t[1:-1]])
-        cyct = '{0}[{1}]'.format(template_name, template_filling)
-        if 0 != t[-1]:
-            last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
-            cyct += ' {0}'.format(last)
-        return cyct
-
-
 _cython_cimports = _LazyImportDict({
     'char': (None,),
     'str': (('libcpp.string', 'string', 'std_string'),),
@@ -652,53 +857,6 @@ _cython_cyimports = _LazyImportDict({
     'nucname': (('pyne', 'nucname'),),
     })
 
-@_memoize
-def cython_cimport_tuples(t, seen=None, inc=frozenset(['c', 'cy'])):
-    """Given a type t, and possibily previously seen cimport tuples (set), 
-    return the set of all seen cimport tuples.  These tuple have four possible 
-    interpretations based on the length and values:
-
-    * ``(module-name,)`` becomes ``cimport {module-name}``
-    * ``(module-name, var-or-mod)`` becomes 
-      ``from {module-name} cimport {var-or-mod}``
-    * ``(module-name, var-or-mod, alias)`` becomes 
-      ``from {module-name} cimport {var-or-mod} as {alias}``
-    * ``(module-name, 'as', alias)`` becomes ``cimport {module-name} as {alias}``
-
-    """
-    t = canon(t)
-    if seen is None:
-        seen = set()
-    if isinstance(t, basestring):
-        if t in base_types:
-            if 'c' in inc:
-                seen.update(_cython_cimports[t])
-            if 'cy' in inc:
-                seen.update(_cython_cyimports[t])
-            seen -= set((None, (None,)))
-            return seen        
-    # must be tuple below this line
-    tlen = len(t)
-    if 2 == tlen:
-        if 'c' in inc:
-            seen.update(_cython_cimports.get(t[0], (None,)))
-            seen.update(_cython_cimports.get(t[1], (None,)))
-        if 'cy' in inc:
-            seen.update(_cython_cyimports.get(t[0], (None,)))
-            seen.update(_cython_cyimports.get(t[1], (None,)))
-        seen -= set((None, (None,)))
-        return cython_cimport_tuples(t[0], seen, inc)
-    elif 3 <= tlen:
-        assert t[0] in template_types
-        if 'c' in inc:
-            seen.update(_cython_cimports[t[0]])
-        if 'cy' in inc:
-            seen.update(_cython_cyimports[t[0]])
-        for x in t[1:-1]:
-            cython_cimport_tuples(x, seen, inc)
-        seen -= set((None, (None,)))
-        return seen
-
 _cython_cimport_cases = {
     1: lambda tup: "cimport {0}".format(*tup),
     2: lambda tup: "from {0} cimport {1}".format(*tup),
@@ -706,16 +864,6 @@ _cython_cimport_cases = {
                     "from {0} cimport {1} as {2}".format(*tup)),
     }
 
-@_memoize
-def cython_cimports(x, inc=frozenset(['c', 'cy'])):
-    """Retuns the cimport lines associtated with a type or a set of seen tuples.
-    """
-    if not isinstance(x, Set):
-        x = cython_cimport_tuples(x, inc=inc)
-    return set([_cython_cimport_cases[len(tup)](tup) for tup in x if 0 != len(tup)])
-
-
-
 _cython_pyimports = _LazyImportDict({
     'char': (None,),
     'str': (None,),
@@ -735,43 +883,6 @@ _cython_pyimports = _LazyImportDict({
     'nucname': (('pyne', 'nucname'),),
     })
 
-@_memoize
-def cython_import_tuples(t, seen=None):
-    """Given a type t, and possibily previously seen import tuples (set), 
-    return the set of all seen import tuples.  These tuple have four possible 
-    interpretations based on the length and values:
-
-    * ``(module-name,)`` becomes ``import {module-name}``
-    * ``(module-name, var-or-mod)`` becomes 
-      ``from {module-name} import {var-or-mod}``
-    * ``(module-name, var-or-mod, alias)`` becomes 
-      ``from {module-name} import {var-or-mod} as {alias}``
-    * ``(module-name, 'as', alias)`` becomes ``import {module-name} as {alias}``
-
-    """
-    t = canon(t)
-    if seen is None:
-        seen = set()
-    if isinstance(t, basestring):
-        if  t in base_types:
-            seen.update(_cython_pyimports[t])
-            seen -= set((None, (None,)))
-            return seen
-    # must be tuple below this line
-    tlen = len(t)
-    if 2 == tlen:
-        seen.update(_cython_pyimports.get(t[0], (None,)))
-        seen.update(_cython_pyimports.get(t[1], (None,)))
-        seen -= set((None, (None,)))
-        return cython_import_tuples(t[0], seen)
-    elif 3 <= tlen:
-        assert t[0] in template_types
-        seen.update(_cython_pyimports[t[0]])
-        for x in t[1:-1]:
-            cython_import_tuples(x, seen)
-        seen -= set((None, (None,)))
-        return seen
-
 _cython_import_cases = {
     1: lambda tup: "import {0}".format(*tup),
     2: lambda tup: "from {0} import {1}".format(*tup),
@@ -779,16 +890,6 @@ _cython_import_cases = {
                     "from {0} import {1} as {2}".format(*tup)),
     }
 
-@_memoize
-def cython_imports(x):
-    """Retuns the import lines associtated with a type or a set of seen tuples.
-    """
-    if not isinstance(x, Set):
-        x = cython_import_tuples(x)
-    x = [tup for tup in x if 0 < len(tup)]
-    return set([_cython_import_cases[len(tup)](tup) for tup in x])
-
-
 _cython_cytypes = _LazyConfigDict({
     'char': 'char *',
     'str': 'char *',
@@ -827,29 +928,6 @@ _cython_functionnames = _LazyConfigDict({
     'nucname': 'nucname',
     })
 
-@_memoize
-def cython_functionname(t, cycyt=None):
-    """Computes variable or function names for cython types."""
-    if cycyt is None:
-        t = canon(t)
-        if isinstance(t, basestring):
-            return t, _cython_functionnames[t]
-        elif t[0] in base_types:
-            return t, _cython_functionnames[t[0]]
-        return cython_functionname(t, _cython_functionnames[t[0]])
-    d = {}
-    for key, x in zip(template_types[t[0]], t[1:-1]):
-        if isinstance(x, basestring):
-            val = _cython_functionnames[x]
-        elif x[0] in base_types:
-            val = _cython_functionnames[x[0]]
-        else: 
-            _, val = cython_functionname(x, _cython_functionnames[x[0]])
-        d[key] = val
-    return t, cycyt.format(**d)
-
-cython_variablename = cython_functionname
-
 _cython_classnames = _LazyConfigDict({
     # base types
     'char': 'Char',
@@ -871,74 +949,6 @@ _cython_classnames = _LazyConfigDict({
     'nucname': 'Nucname',
     })
 
-@_memoize
-def _fill_cycyt(cycyt, t):
-    """Helper for cython_cytype()."""
-    d = {}
-    for key, x in zip(template_types[t[0]], t[1:-1]):
-        if isinstance(x, basestring):
-            val = _cython_classnames[x]
-        elif x[0] in base_types:
-            val = _cython_classnames[x[0]]
-        else: 
-            val, _ = _fill_cycyt(_cython_classnames[x[0]], x)
-        d[key] = val
-    return cycyt.format(**d), t
-    
-@_memoize
-def cython_classname(t, cycyt=None):
-    """Computes classnames for cython types."""
-    if cycyt is None:
-        t = canon(t)
-        if isinstance(t, basestring):
-            return t, _cython_classnames[t]
-        elif t[0] in base_types:
-            return t, _cython_classnames[t[0]]
-        return cython_classname(t, _cython_classnames[t[0]])
-    d = {}
-    for key, x in zip(template_types[t[0]], t[1:-1]):
-        if isinstance(x, basestring):
-            val = _cython_classnames[x]
-        elif x[0] in base_types:
-            val = _cython_classnames[x[0]]
-        else: 
-            _, val = cython_classname(x, _cython_classnames[x[0]])
-        d[key] = val
-    return t, cycyt.format(**d)
-    
-
-@_memoize
-def cython_cytype(t):
-    """Given a type t, returns the cooresponding Cython type."""
-    t = canon(t)
-    if isinstance(t, basestring):
-        if  t in base_types:
-            return _cython_cytypes[t]
-    # must be tuple below this line
-    tlen = len(t)
-    if 2 == tlen:
-        if 0 == t[1]:
-            return cython_cytype(t[0])
-        elif isrefinement(t[1]):
-            return cython_cytype(t[0])
-        else:
-            last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
-            return cython_cytype(t[0]) + ' {0}'.format(last)
-    elif 3 <= tlen:
-        if t in _cython_cytypes:
-            return _cython_cytypes[t]
-        assert t[0] in template_types
-        assert len(t) == len(template_types[t[0]]) + 2
-        template_name = _cython_cytypes[t[0]]
-        assert template_name is not NotImplemented        
-        cycyt = _cython_cytypes[t[0]]
-        cycyt, t = _fill_cycyt(cycyt, t)
-        if 0 != t[-1]:
-            last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
-            cycyt += ' {0}'.format(last)
-        return cycyt
-
-
 _cython_pytypes = _LazyConfigDict({
     'char': 'str',
     'str': 'str',
@@ -956,58 +966,6 @@ _cython_pytypes = _LazyConfigDict({
     'vector': '{stlcontainers}Vector{value_type}',
     })
 
-@_memoize
-def _fill_cypyt(cypyt, t):
-    """Helper for cython_pytype()."""
-    d = {}
-    for key, x in zip(template_types[t[0]], t[1:-1]):
-        if isinstance(x, basestring):
-            val = _cython_classnames[x]
-        elif x[0] in base_types:
-            val = _cython_classnames[x[0]]
-        else: 
-            val, _ = _fill_cypyt(_cython_classnames[x[0]], x)
-        d[key] = val
-    return cypyt.format(**d), t
-    
-
-@_memoize
-def cython_pytype(t):
-    """Given a type t, returns the cooresponding Python type."""
-    t = canon(t)
-    if isinstance(t, basestring):
-        if  t in base_types:
-            return _cython_pytypes[t]
-    # must be tuple below this line
-    tlen = len(t)
-    if 2 == tlen:
-        if 0 == t[1]:
-            return cython_pytype(t[0])
-        elif isrefinement(t[1]):
-            return cython_pytype(t[0])
-        else:
-            # FIXME last is ignored for strings, but what about other types?
-            #last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
-            #return cython_pytype(t[0]) + ' {0}'.format(last)
-            return cython_pytype(t[0])
-    elif 3 <= tlen:
-        if t in _cython_pytypes:
-            return _cython_pytypes[t]
-        assert t[0] in template_types
-        assert len(t) == len(template_types[t[0]]) + 2
-        template_name = _cython_pytypes[t[0]]
-        assert template_name is not NotImplemented        
-        cypyt = _cython_pytypes[t[0]]
-        cypyt, t = _fill_cypyt(cypyt, t)
-        # FIXME last is ignored for strings, but what about other types?
-        #if 0 != t[-1]:
-        #    last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
-        #    cypyt += ' {0}'.format(last)
-        return cypyt
-
-
-
-
 _numpy_types = _LazyConfigDict({
     'char': 'np.NPY_BYTE',
     #'str': 'np.NPY_STRING',
@@ -1020,28 +978,6 @@ _numpy_types = _LazyConfigDict({
     'void': 'np.NPY_VOID',     
     })
 
-@_memoize
-def cython_nptype(t):
-    """Given a type t, returns the cooresponding NumPy type."""
-    t = canon(t)
-    if isinstance(t, basestring):
-        return _numpy_types[t] if t in _numpy_types else 'np.NPY_OBJECT'
-    # must be tuple below this line
-    tlen = len(t)
-    if 2 == tlen:
-        if 0 == t[1]:
-            return cython_nptype(t[0])
-        elif isrefinement(t[1]):
-            return cython_nptype(t[0])
-        else:
-            # FIXME last is ignored for strings, but what about other types?
-            #last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
-            #return cython_pytype(t[0]) + ' {0}'.format(last)
-            return cython_nptype(t[0])
-    elif 3 <= tlen:
-        return _numpy_types[t] if t in _numpy_types else 'np.NPY_OBJECT'
-        #return _numpy_types.get(t, 'np.NPY_OBJECT')
-
 _cython_c2py_conv = _LazyConverterDict({
     # Has tuple form of (copy, [view, [cached_view]])
     # base types
@@ -1146,59 +1082,6 @@ from_pytypes = {
     }
 
 
-@_memoize
-def cython_c2py(name, t, view=True, cached=True, inst_name=None, proxy_name=None, 
-                cache_name=None, cache_prefix='self', existing_name=None):
-    """Given a varibale name and type, returns cython code (declaration, body, 
-    and return statements) to convert the variable from C/C++ to Python."""
-    tkey = canon(t)
-    #while not isinstance(tkey, basestring):
-    while tkey not in _cython_c2py_conv and not isinstance(tkey, basestring):
-        tkey = tkey[0]
-    c2pyt = _cython_c2py_conv[tkey]
-    ind = int(view) + int(cached)
-    if cached and not view:
-        raise ValueError('cached views require view=True.')
-    if c2pyt is NotImplemented:
-        raise NotImplementedError('conversion from C/C++ to Python for ' + \
-                                  t + 'has not been implemented for when ' + \
-                                  'view={0}, cached={1}'.format(view, cached))
-    ct = cython_ctype(t)
-    cyt = cython_cytype(t)
-    pyt = cython_pytype(t)
-    if istemplate(t) and (2 == len(t) or 3 == len(t) and t[-1] == 0):
-        npt = cython_nptype(t[1])
-    else:
-        npt = cython_nptype(t)
-    var = name if inst_name is None else "{0}.{1}".format(inst_name, name)
-    var = existing_name or var
-    cache_name = "_{0}".format(name) if cache_name is None else cache_name
-    cache_name = cache_name if cache_prefix is None else "{0}.{1}".format(cache_prefix, cache_name)
-    proxy_name = "{0}_proxy".format(name) if proxy_name is None else proxy_name
-    iscached = False
-    if 1 == len(c2pyt) or ind == 0:
-        decl = body = None
-        rtn = c2pyt[0].format(var=var, ctype=ct, cytype=cyt, pytype=pyt, nptype=npt)
-    elif ind == 1:
-        decl = "cdef {0} {1}".format(cyt, proxy_name)
-        body = c2pyt[1].format(var=var, ctype=ct, cytype=cyt, pytype=pyt, nptype=npt, 
-                               proxy_name=proxy_name)
-        rtn = proxy_name
-    elif ind == 2:
-        decl = "cdef {0} {1}".format(cyt, proxy_name)
-        body = c2pyt[2].format(var=var, cache_name=cache_name, ctype=ct, cytype=cyt, 
-                               pytype=pyt, proxy_name=proxy_name, nptype=npt)
-        rtn = cache_name
-        iscached = True
-    if body is not None and 'np.npy_intp' in body:
-        decl = decl or ''
-        decl += "\ncdef np.npy_intp {proxy_name}_shape[1]".format(proxy_name=proxy_name)
-    if decl is not None and body is not None:
-        decl += '\n'+"\n".join([l for l in body.splitlines() if l.startswith('cdef')])
-        body = "\n".join([l for l in body.splitlines() if not l.startswith('cdef')])
-    return decl, body, rtn, iscached
-
-
 _cython_py2c_conv = _LazyConverterDict({
     # Has tuple form of (body or return,  return or False)
     # base types
@@ -1254,285 +1137,1287 @@ _cython_py2c_conv = _LazyConverterDict({
     'nucname': ('nucname.name({var})', False),
     })
 
-@_memoize
-def cython_py2c(name, t, inst_name=None, proxy_name=None):
-    """Given a varibale name and type, returns cython code (declaration, body, 
-    and return statement) to convert the variable from Python to C/C++."""
-    t = canon(t)
-    if isinstance(t, basestring) or 0 == t[-1] or isrefinement(t[-1]):
-        last = ''
-    elif isinstance(t[-1], int):
-        last = ' [{0}]'.format(t[-1])
-    else:
-        last = ' ' + t[-1]
-    tkey = t
-    tinst = None
-    while tkey not in _cython_py2c_conv and not isinstance(tkey, basestring):
-        tinst = tkey
-        tkey = tkey[1] if (0 < len(tkey) and isrefinement(tkey[1])) else tkey[0]
-    py2ct = _cython_py2c_conv[tkey]
-    if py2ct is NotImplemented or py2ct is None:
-        raise NotImplementedError('conversion from Python to C/C++ for ' + \
-                                  t + 'has not been implemented.')
-    body_template, rtn_template = py2ct
-    ct = cython_ctype(t)
-    cyt = cython_cytype(t)
-    pyt = cython_pytype(t)
-    if istemplate(t) and 1 == len(template_types.get(tkey, ())):
-        npt = cython_nptype(t[1])
-    else:
-        npt = cython_nptype(t)
-    npct = cython_ctype(npt)
-    var = name if inst_name is None else "{0}.{1}".format(inst_name, name)
-    proxy_name = "{0}_proxy".format(name) if proxy_name is None else proxy_name
-    template_kw = dict(var=var, proxy_name=proxy_name, pytype=pyt, cytype=cyt, 
-                       ctype=ct, last=last, nptype=npt, npctype=npct)
-    nested = False
-    if isdependent(tkey):
-        tsig = [ts for ts in refined_types if ts[0] == tkey][0]
-        for ts, ti in zip(tsig[1:], tinst[1:]):
-            if isinstance(ts, basestring):
-                template_kw[ts] = cython_ctype(ti)
-            else:
-                template_kw[ti[0]] = ti[2]
-        vartype = refined_types[tsig]
-        if vartype in tsig[1:]:
-            vartype = tinst[tsig.index(vartype)][1]
-        if isrefinement(vartype):
-            nested = True
-            vdecl, vbody, vrtn = cython_py2c(var, vartype)
-            template_kw['var'] = vrtn
-    body_filled = body_template.format(**template_kw)
-    if rtn_template:
-        deft = ct if '{ctype}'in body_template else cyt
-        decl = "cdef {0} {1}".format(deft, proxy_name)
-        body = body_filled
-        rtn = rtn_template.format(**template_kw)
-        decl += '\n'+"\n".join([l for l in body.splitlines() if l.startswith('cdef')])
-        body = "\n".join([l for l in body.splitlines() if not l.startswith('cdef')])
-    else:
-        decl = body = None
-        rtn = body_filled
-    if nested:
-        decl = '' if decl is None else decl
-        vdecl = '' if vdecl is None else vdecl
-        decl = (vdecl + '\n' + decl).strip()
-        decl = None if 0 == len(decl) else decl
-        body = '' if body is None else body
-        vbody = '' if vbody is None else vbody
-        body = (vbody + '\n' + body).strip()
-        body = None if 0 == len(body) else body
-    return decl, body, rtn
- 
+def _typenames(x, names):
+    """Adds all of the strings in a (possibly nested) type to names."""
+    if isinstance(x, basestring):
+        names.add(x)
+    elif isinstance(x, Sequence):
+        for y in x:
+            _typenames(y, names)
+    return names
 
 
-######################  Some utility functions for the typesystem #############
+SNAPSHOT_VERSION = 1
+"""Version of the layout of snapshot(), bumped whenever it changes."""
 
-@_memoize
-def _ensure_importable(x):
-    if isinstance(x, basestring) or x is None:
-        r = ((x,),)
-    elif isinstance(x, Iterable) and (isinstance(x[0], basestring) or x[0] is None):
-        r = (x,)
-    else:
-        r = x
-    return r
+#################### Type system contexts ######################################
 
-def register_class(name, template_args=None, cython_c_type=None, 
-                   cython_cimport=None, cython_cy_type=None, cython_py_type=None,
-                   cython_template_class_name=None, cython_cyimport=None, 
-                   cython_pyimport=None, cython_c2py=None, cython_py2c=None):
-    """Classes are user specified types.  This function will add a class to 
-    the type system so that it may be used normally with the rest of the 
-    type system.
+_REGISTRIES = ['base_types', 'template_types', 'refined_types', 'type_aliases',
+               '_cython_ctypes', '_cython_cytypes', '_cython_pytypes',
+               '_cython_cimports', '_cython_cyimports', '_cython_pyimports',
+               '_cython_functionnames', '_cython_classnames', '_numpy_types',
+               '_cython_c2py_conv', '_cython_py2c_conv']
+"""Attribute names of the registries of a type system.  Snapshots and
+fingerprints name them without the leading underscore."""
 
+class TypeSystem(object):
+    """A type system: the registries, the extra_types and stlcontainers settings,
+    and the memoized results computed from them.  The module-level functions call
+    the methods of the current() type system.  Entering a type system in a
+    with-statement makes it the current one of the thread until exiting, and
+    type systems may be entered any number of times.
+
+    Use fork() to get a type system to change or to use from another thread.
     """
-    # register the class name
-    isbase = True
-    if template_args is None: 
-        base_types.add(name)  # normal class        
-    elif isinstance(template_args, Sequence):
-        if 0 == len(template_args):
-            base_types.add(name)  # normal class
-        elif isinstance(template_args, basestring):
-            _raise_type_error(name)
+
+    def __init__(self, extra_types='xdress_extra_types',
+                 stlcontainers='stlcontainers'):
+        """Parameters
+        ----------
+        extra_types : str, optional
+            Module of the extra types, filled in for {extra_types} in the
+            registries.
+        stlcontainers : str, optional
+            Module of the STL container wrappers, filled in for
+            {stlcontainers} in the registries.
+
+        A new type system knows only of the built in types.
+        """
+        self._setup(_builtin, (extra_types, stlcontainers))
+
+    def _setup(self, source, config, parent=None):
+        """Sets up the registries, shared with those of source, and the memos,
+        which are inherited from parent if given, as they are used."""
+        self._lock = threading.Lock()
+        for name in _REGISTRIES:
+            setattr(self, name, getattr(source, name)._fork(self))
+        self._config = config
+        self._maxsize = source._maxsize
+        if parent is None:
+            self._memos = [_Memo(self._maxsize) for name in _memoized]
+        else:
+            self._memos = [None] * len(_memoized)
+            parent._forks.add(self)
+        self._parent = parent
+        self._forks = weakref.WeakSet()
+        self._dependents = {}
+
+    def fork(self, extra_types=_SAME, stlcontainers=_SAME):
+        """Returns a copy of this type system, with other settings if given.  The
+        copy shares the registries and memoized results of this one until either
+        changes them, so that forking is cheap.
+
+        Parameters
+        ----------
+        extra_types : str, optional
+        stlcontainers : str, optional
+
+        Returns
+        -------
+        ts : TypeSystem
+
+        """
+        config = (self.extra_types if extra_types is _SAME else extra_types,
+                  self.stlcontainers if stlcontainers is _SAME else stlcontainers)
+        ts = TypeSystem.__new__(TypeSystem)
+        ts._setup(self, config, self if config == self._config else None)
+        return ts
+
+    def __enter__(self):
+        _state.stack.append(_state.ts)
+        _state.ts = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _state.ts = _state.stack.pop()
+
+    @property
+    def extra_types(self):
+        """Module of the extra types, filled in for {extra_types}."""
+        return self._config[0]
+
+    @extra_types.setter
+    def extra_types(self, value):
+        self._set_config(value, self._config[1])
+
+    @property
+    def stlcontainers(self):
+        """Module of the STL container wrappers, filled in for {stlcontainers}."""
+        return self._config[1]
+
+    @stlcontainers.setter
+    def stlcontainers(self, value):
+        self._set_config(self._config[0], value)
+
+    @contextmanager
+    def swap_stlcontainers(self, s):
+        """A context manager for temporarily swapping out the stlcontainers value
+        with a new value and replacing the original value before exiting.  Only the
+        memoized results which depend on it are recomputed."""
+        old = self.stlcontainers
+        self.stlcontainers = s
+        try:
+            yield
+        finally:
+            self.stlcontainers = old
+
+    def _set_config(self, extra_types, stlcontainers):
+        """Changes the settings, invalidating the results which depend on them."""
+        old = self._config
+        self._config = (extra_types, stlcontainers)
+        changed = [name for name, a, b in [('EXTRA_TYPES', old[0], extra_types),
+                   ('STLCONTAINERS', old[1], stlcontainers)] if a != b]
+        if 0 < len(changed):
+            self._detach()
+            with self._lock:
+                for name in changed:
+                    self._invalidate((name,))
+
+    def _inherit_memo(self, slot):
+        """Returns the memo of a slot that has not been used since forking, a
+        copy of that of the parent."""
+        parent = self._parent
+        if parent is None:
+            memo = _Memo(self._maxsize)
         else:
-            template_types[name] = tuple(template_args)  # templated class...
-            isbase = False
+            pmemo = parent._memos[slot] or parent._inherit_memo(slot)
+            with parent._lock:
+                memo = pmemo.copy(self._maxsize)
+        with self._lock:
+            if self._memos[slot] is not None:
+                return self._memos[slot]
+            self._memos[slot] = memo
+            dependents = self._dependents
+            for key, deps in memo.deps.iteritems():
+                for dep in deps:
+                    dependents.setdefault(dep, set()).add((slot, key))
+        return memo
+
+    def _invalidate(self, dep):
+        """Evicts the memoized results which depend on dep.  The lock is held."""
+        memos = self._memos
+        for slot, key in self._dependents.pop(dep, ()):
+            memo = memos[slot]
+            if memo is not None and key in memo.cache:
+                del memo.cache[key]
+                memo.deps.pop(key, None)
+                memo.counts[4] += 1
+
+    def _changed(self, name, key=_ALL):
+        """Evicts the memoized results which depend on a key of a registry, or on
+        any of its keys when key is not given."""
+        self._detach()
+        if not self._dependents:
+            return
+        with self._lock:
+            if key is _ALL:
+                for dep in [d for d in self._dependents if d[0] == name]:
+                    self._invalidate(dep)
+            else:
+                self._invalidate((name, key))
+                self._invalidate((name, _ALL))
+
+    def _detach(self):
+        """Stops inheriting memoized results from the parent, and the forks from
+        inheriting them from this type system, ahead of a change."""
+        if self._parent is not None:
+            self._orphan()
+        if 0 < len(self._forks):
+            for ts in list(self._forks):
+                if ts._parent is self:
+                    ts._orphan()
+            self._forks.clear()
+
+    def _orphan(self):
+        with self._lock:
+            self._memos[:] = [memo or _Memo(self._maxsize) for memo in self._memos]
+            self._parent = None
+
+    @_memoize
+    def istemplate(self, t):
+        """Returns whether t is a template type or not."""
+        if isinstance(t, basestring):
+            return t in self.template_types
+        if isinstance(t, Sequence):
+            return self.istemplate(t[0])
+        return False
+
+    @_memoize
+    def humanname(self, t, hnt=None):
+        """Computes human names for types."""
+        if hnt is None:
+            t = self.canon(t)
+            if isinstance(t, basestring):
+                return t, _humannames[t]
+            elif t[0] in self.base_types:
+                return t, _humannames[t[0]]
+            return self.humanname(t, _humannames[t[0]])
+        d = {}
+        for key, x in zip(self.template_types[t[0]], t[1:-1]):
+            if isinstance(x, basestring):
+                val = _humannames[x]
+            elif x[0] in self.base_types:
+                val = _humannames[x[0]]
+            else: 
+                val, _ = self.humanname(x, _humannames[x[0]])
+            d[key] = val
+        return t, hnt.format(**d)
+
+    @_memoize
+    def isdependent(self, t):
+        """Returns whether t is a dependent type or not."""
+        deptypes = set([k[0] for k in self.refined_types if not isinstance(k, basestring)])
+        if isinstance(t, basestring):
+            return t in deptypes
+        if isinstance(t, Sequence):
+            return self.isdependent(t[0])
+        return False
+
+    @_memoize
+    def isrefinement(self, t):
+        """Returns whether t is a refined type."""
+        if isinstance(t, basestring):
+            return t in self.refined_types
+        return self.isdependent(t)
+
+    @_memoize
+    def _resolve_dependent_type(self, tname, tinst=None):
+        depkey = [k for k in self.refined_types if k[0] == tname][0]
+        depval = self.refined_types[depkey]
+        istemplated = any([isinstance(x, basestring) for x in depkey[1:]])
+        if tinst is None:
+            return depkey
+        elif istemplated:
+            assert len(tinst) == len(depkey)
+            typemap = {k: tinst[i] for i, k in enumerate(depkey[1:], 1) \
+                                                        if isinstance(k, basestring)}
+            for k in typemap:
+                if k in self.type_aliases:
+                    raise TypeError('template type {0} already exists'.format(k))
+            sub = lambda x: self.canon(_substitute(x, typemap))
+            return sub(depval), (tname,) + \
+                            tuple([sub(k) for k in depkey[1:] if k in typemap]) + \
+                            tuple([(k[0], sub(k[1]), instval) \
+                                for k, instval in zip(depkey[1:], tinst[1:])
+                                if k not in typemap])
+        else:
+            assert len(tinst) == len(depkey)
+            return self.canon(depval), (tname,) + tuple([(kname, self.canon(ktype), instval) \
+                            for (kname, ktype), instval in zip(depkey[1:], tinst[1:])])
 
-    # Register with Cython C/C++ types
-    if (cython_c_type is not None) or (cython_cy_type is not None):
-        cython_cimport = _ensure_importable(cython_cimport)
-        cython_cyimport = _ensure_importable(cython_cyimport)
-        cython_pyimport = _ensure_importable(cython_pyimport)
+    @_memoize
+    def canon(self, t):
+        """Turns the type into its canonical form. See module docs for more information.
+        Canonical forms are interned, see intern_type()."""
+        return intern_type(self._canon(t))
 
-        if isinstance(cython_c2py, basestring):
-            cython_c2py = (cython_c2py,)
-        cython_c2py = None if cython_c2py is None else tuple(cython_c2py)
+    def _canon(self, t):
+        if isinstance(t, basestring):
+            if t in self.base_types:
+                return t
+            elif t in self.type_aliases:
+                return self.canon(self.type_aliases[t])
+            elif t in self.refined_types:
+                return (self.canon(self.refined_types[t]), t)
+            elif self.isdependent(t):
+                return self._resolve_dependent_type(t)
+            else:
+                _raise_type_error(t)
+                # BELOW this would be for complicated string representations, 
+                # such as 'char *' or 'map<nucid, double>'.  Would need to write
+                # the parse_type() function and that might be a lot of work.
+                #parse_type(t)  
+        elif isinstance(t, Sequence):
+            t0 = t[0]
+            tlen = len(t)
+            if 0 == tlen:
+                _raise_type_error(t)
+            last_val = 0 if tlen == 1 else t[-1]
+            if isinstance(t0, basestring):
+                if t0 in self.template_types:
+                    templen = len(self.template_types[t0])
+                    last_val = 0 if tlen == 1 + templen else t[-1]
+                    filledt = [t0] + [self.canon(tt) for tt in t[1:1+templen]] + [last_val]
+                    return tuple(filledt)
+                elif self.isdependent(t0):
+                    return self._resolve_dependent_type(t0, t)
+                else:
+                    #if 2 < tlen:
+                    #    _raise_type_error(t)
+                    return (self.canon(t0), last_val)
+            elif isinstance(t0, Sequence):
+                t00 = t0[0]
+                if isinstance(t00, basestring):
+                    # template or independent refinement type
+                    return (self.canon(t0), last_val)
+                elif isinstance(t00, Sequence):
+                    # zOMG dependent type
+                    return self._resolve_dependent_type(t00, t0)
+                # BELOW is for possible compound types...
+                #return (tuple([canon(subt) for subt in t[0]]), last_val)
+            else:
+                _raise_type_error(t)
+        else:
+            _raise_type_error(t)
 
-        if isinstance(cython_py2c, basestring):
-            cython_py2c = (cython_py2c, False)
+    #################### Type System Above This Line ##########################
+
+    @_memoize
+    def cython_ctype(self, t):
+        """Given a type t, returns the cooresponding Cython C type declaration."""
+        t = self.canon(t)
+        if isinstance(t, basestring):
+            if  t in self.base_types:
+                return self._cython_ctypes[t]
+        # must be tuple below this line
+        tlen = len(t)
+        if 2 == tlen:
+            if 0 == t[1]:
+                return self.cython_ctype(t[0])
+            elif self.isrefinement(t[1]):
+                return self.cython_ctype(t[0])
+            else:
+                last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
+                return self.cython_ctype(t[0]) + ' {0}'.format(last)
+        elif 3 <= tlen:
+            assert t[0] in self.template_types
+            assert len(t) == len(self.template_types[t[0]]) + 2
+            template_name = self._cython_ctypes[t[0]]
+            assert template_name is not NotImplemented
+            template_filling = ', '.join([self.cython_ctype(x) for x in t[1:-1]])
+            cyct = '{0}[{1}]'.format(template_name, template_filling)
+            if 0 != t[-1]:
+                last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
+                cyct += ' {0}'.format(last)
+            return cyct
+
+    def cython_cimport_tuples(self, t, seen=None, inc=frozenset(['c', 'cy'])):
+        """Given a type t, and possibily previously seen cimport tuples (set), 
+        return the set of all seen cimport tuples.  These tuple have four possible 
+        interpretations based on the length and values:
+
+        * ``(module-name,)`` becomes ``cimport {module-name}``
+        * ``(module-name, var-or-mod)`` becomes 
+          ``from {module-name} cimport {var-or-mod}``
+        * ``(module-name, var-or-mod, alias)`` becomes 
+          ``from {module-name} cimport {var-or-mod} as {alias}``
+        * ``(module-name, 'as', alias)`` becomes ``cimport {module-name} as {alias}``
+
+        """
+        tups = self._cython_cimport_tuples(t, frozenset(inc))
+        if seen is None:
+            return set(tups)
+        seen.update(tups)
+        seen -= set((None, (None,)))
+        return seen
+
+    @_memoize
+    def _cython_cimport_tuples(self, t, inc):
+        """The cimport tuples of the type t alone, as a frozenset.  This is what is 
+        memoized, since the seen sets are not hashable."""
+        t = self.canon(t)
+        seen = set()
+        if isinstance(t, basestring):
+            if t in self.base_types:
+                if 'c' in inc:
+                    seen.update(self._cython_cimports[t])
+                if 'cy' in inc:
+                    seen.update(self._cython_cyimports[t])
+                seen -= set((None, (None,)))
+                return frozenset(seen)
+        # must be tuple below this line
+        tlen = len(t)
+        if 2 == tlen:
+            if 'c' in inc:
+                seen.update(self._cython_cimports.get(t[0], (None,)))
+                seen.update(self._cython_cimports.get(t[1], (None,)))
+            if 'cy' in inc:
+                seen.update(self._cython_cyimports.get(t[0], (None,)))
+                seen.update(self._cython_cyimports.get(t[1], (None,)))
+            seen.update(self._cython_cimport_tuples(t[0], inc))
+        elif 3 <= tlen:
+            assert t[0] in self.template_types
+            if 'c' in inc:
+                seen.update(self._cython_cimports[t[0]])
+            if 'cy' in inc:
+                seen.update(self._cython_cyimports[t[0]])
+            for x in t[1:-1]:
+                seen.update(self._cython_cimport_tuples(x, inc))
+        seen -= set((None, (None,)))
+        return frozenset(seen)
+
+    @_memoize
+    def cython_cimports(self, x, inc=frozenset(['c', 'cy'])):
+        """Retuns the cimport lines associtated with a type or a set of seen tuples.
+        """
+        if not isinstance(x, Set):
+            x = self.cython_cimport_tuples(x, inc=inc)
+        return set([_cython_cimport_cases[len(tup)](tup) for tup in x if 0 != len(tup)])
+
+    def cython_import_tuples(self, t, seen=None):
+        """Given a type t, and possibily previously seen import tuples (set), 
+        return the set of all seen import tuples.  These tuple have four possible 
+        interpretations based on the length and values:
+
+        * ``(module-name,)`` becomes ``import {module-name}``
+        * ``(module-name, var-or-mod)`` becomes 
+          ``from {module-name} import {var-or-mod}``
+        * ``(module-name, var-or-mod, alias)`` becomes 
+          ``from {module-name} import {var-or-mod} as {alias}``
+        * ``(module-name, 'as', alias)`` becomes ``import {module-name} as {alias}``
+
+        """
+        tups = self._cython_import_tuples(t)
+        if seen is None:
+            return set(tups)
+        seen.update(tups)
+        seen -= set((None, (None,)))
+        return seen
+
+    @_memoize
+    def _cython_import_tuples(self, t):
+        """The import tuples of the type t alone, as a frozenset."""
+        t = self.canon(t)
+        seen = set()
+        if isinstance(t, basestring):
+            if  t in self.base_types:
+                seen.update(self._cython_pyimports[t])
+                seen -= set((None, (None,)))
+                return frozenset(seen)
+        # must be tuple below this line
+        tlen = len(t)
+        if 2 == tlen:
+            seen.update(self._cython_pyimports.get(t[0], (None,)))
+            seen.update(self._cython_pyimports.get(t[1], (None,)))
+            seen.update(self._cython_import_tuples(t[0]))
+        elif 3 <= tlen:
+            assert t[0] in self.template_types
+            seen.update(self._cython_pyimports[t[0]])
+            for x in t[1:-1]:
+                seen.update(self._cython_import_tuples(x))
+        seen -= set((None, (None,)))
+        return frozenset(seen)
+
+    @_memoize
+    def cython_imports(self, x):
+        """Retuns the import lines associtated with a type or a set of seen tuples.
+        """
+        if not isinstance(x, Set):
+            x = self.cython_import_tuples(x)
+        x = [tup for tup in x if 0 < len(tup)]
+        return set([_cython_import_cases[len(tup)](tup) for tup in x])
+
+    @_memoize
+    def cython_functionname(self, t, cycyt=None):
+        """Computes variable or function names for cython types."""
+        if cycyt is None:
+            t = self.canon(t)
+            if isinstance(t, basestring):
+                return t, self._cython_functionnames[t]
+            elif t[0] in self.base_types:
+                return t, self._cython_functionnames[t[0]]
+            return self.cython_functionname(t, self._cython_functionnames[t[0]])
+        d = {}
+        for key, x in zip(self.template_types[t[0]], t[1:-1]):
+            if isinstance(x, basestring):
+                val = self._cython_functionnames[x]
+            elif x[0] in self.base_types:
+                val = self._cython_functionnames[x[0]]
+            else: 
+                _, val = self.cython_functionname(x, self._cython_functionnames[x[0]])
+            d[key] = val
+        return t, cycyt.format(**d)
+
+    cython_variablename = cython_functionname
+
+    @_memoize
+    def _fill_cycyt(self, cycyt, t):
+        """Helper for cython_cytype()."""
+        d = {}
+        for key, x in zip(self.template_types[t[0]], t[1:-1]):
+            if isinstance(x, basestring):
+                val = self._cython_classnames[x]
+            elif x[0] in self.base_types:
+                val = self._cython_classnames[x[0]]
+            else: 
+                val, _ = self._fill_cycyt(self._cython_classnames[x[0]], x)
+            d[key] = val
+        return cycyt.format(**d), t
+
+    @_memoize
+    def cython_classname(self, t, cycyt=None):
+        """Computes classnames for cython types."""
+        if cycyt is None:
+            t = self.canon(t)
+            if isinstance(t, basestring):
+                return t, self._cython_classnames[t]
+            elif t[0] in self.base_types:
+                return t, self._cython_classnames[t[0]]
+            return self.cython_classname(t, self._cython_classnames[t[0]])
+        d = {}
+        for key, x in zip(self.template_types[t[0]], t[1:-1]):
+            if isinstance(x, basestring):
+                val = self._cython_classnames[x]
+            elif x[0] in self.base_types:
+                val = self._cython_classnames[x[0]]
+            else: 
+                _, val = self.cython_classname(x, self._cython_classnames[x[0]])
+            d[key] = val
+        return t, cycyt.format(**d)
+
+    @_memoize
+    def cython_cytype(self, t):
+        """Given a type t, returns the cooresponding Cython type."""
+        t = self.canon(t)
+        if isinstance(t, basestring):
+            if  t in self.base_types:
+                return self._cython_cytypes[t]
+        # must be tuple below this line
+        tlen = len(t)
+        if 2 == tlen:
+            if 0 == t[1]:
+                return self.cython_cytype(t[0])
+            elif self.isrefinement(t[1]):
+                return self.cython_cytype(t[0])
+            else:
+                last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
+                return self.cython_cytype(t[0]) + ' {0}'.format(last)
+        elif 3 <= tlen:
+            if t in self._cython_cytypes:
+                return self._cython_cytypes[t]
+            assert t[0] in self.template_types
+            assert len(t) == len(self.template_types[t[0]]) + 2
+            template_name = self._cython_cytypes[t[0]]
+            assert template_name is not NotImplemented        
+            cycyt = self._cython_cytypes[t[0]]
+            cycyt, t = self._fill_cycyt(cycyt, t)
+            if 0 != t[-1]:
+                last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
+                cycyt += ' {0}'.format(last)
+            return cycyt
+
+    @_memoize
+    def _fill_cypyt(self, cypyt, t):
+        """Helper for cython_pytype()."""
+        d = {}
+        for key, x in zip(self.template_types[t[0]], t[1:-1]):
+            if isinstance(x, basestring):
+                val = self._cython_classnames[x]
+            elif x[0] in self.base_types:
+                val = self._cython_classnames[x[0]]
+            else: 
+                val, _ = self._fill_cypyt(self._cython_classnames[x[0]], x)
+            d[key] = val
+        return cypyt.format(**d), t
+
+    @_memoize
+    def cython_pytype(self, t):
+        """Given a type t, returns the cooresponding Python type."""
+        t = self.canon(t)
+        if isinstance(t, basestring):
+            if  t in self.base_types:
+                return self._cython_pytypes[t]
+        # must be tuple below this line
+        tlen = len(t)
+        if 2 == tlen:
+            if 0 == t[1]:
+                return self.cython_pytype(t[0])
+            elif self.isrefinement(t[1]):
+                return self.cython_pytype(t[0])
+            else:
+                # FIXME last is ignored for strings, but what about other types?
+                #last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
+                #return cython_pytype(t[0]) + ' {0}'.format(last)
+                return self.cython_pytype(t[0])
+        elif 3 <= tlen:
+            if t in self._cython_pytypes:
+                return self._cython_pytypes[t]
+            assert t[0] in self.template_types
+            assert len(t) == len(self.template_types[t[0]]) + 2
+            template_name = self._cython_pytypes[t[0]]
+            assert template_name is not NotImplemented        
+            cypyt = self._cython_pytypes[t[0]]
+            cypyt, t = self._fill_cypyt(cypyt, t)
+            # FIXME last is ignored for strings, but what about other types?
+            #if 0 != t[-1]:
+            #    last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
+            #    cypyt += ' {0}'.format(last)
+            return cypyt
+
+    @_memoize
+    def cython_nptype(self, t):
+        """Given a type t, returns the cooresponding NumPy type."""
+        t = self.canon(t)
+        if isinstance(t, basestring):
+            return self._numpy_types[t] if t in self._numpy_types else 'np.NPY_OBJECT'
+        # must be tuple below this line
+        tlen = len(t)
+        if 2 == tlen:
+            if 0 == t[1]:
+                return self.cython_nptype(t[0])
+            elif self.isrefinement(t[1]):
+                return self.cython_nptype(t[0])
+            else:
+                # FIXME last is ignored for strings, but what about other types?
+                #last = '[{0}]'.format(t[-1]) if isinstance(t[-1], int) else t[-1]
+                #return cython_pytype(t[0]) + ' {0}'.format(last)
+                return self.cython_nptype(t[0])
+        elif 3 <= tlen:
+            return self._numpy_types[t] if t in self._numpy_types else 'np.NPY_OBJECT'
+            #return _numpy_types.get(t, 'np.NPY_OBJECT')
+
+    @_memoize
+    def cython_c2py(self, name, t, view=True, cached=True, inst_name=None, proxy_name=None, 
+                    cache_name=None, cache_prefix='self', existing_name=None):
+        """Given a varibale name and type, returns cython code (declaration, body, 
+        and return statements) to convert the variable from C/C++ to Python."""
+        tkey = self.canon(t)
+        #while not isinstance(tkey, basestring):
+        while tkey not in self._cython_c2py_conv and not isinstance(tkey, basestring):
+            tkey = tkey[0]
+        c2pyt = self._cython_c2py_conv[tkey]
+        ind = int(view) + int(cached)
+        if cached and not view:
+            raise ValueError('cached views require view=True.')
+        if c2pyt is NotImplemented:
+            raise NotImplementedError('conversion from C/C++ to Python for ' + \
+                                      t + 'has not been implemented for when ' + \
+                                      'view={0}, cached={1}'.format(view, cached))
+        ct = self.cython_ctype(t)
+        cyt = self.cython_cytype(t)
+        pyt = self.cython_pytype(t)
+        if self.istemplate(t) and (2 == len(t) or 3 == len(t) and t[-1] == 0):
+            npt = self.cython_nptype(t[1])
+        else:
+            npt = self.cython_nptype(t)
+        var = name if inst_name is None else "{0}.{1}".format(inst_name, name)
+        var = existing_name or var
+        cache_name = "_{0}".format(name) if cache_name is None else cache_name
+        cache_name = cache_name if cache_prefix is None else "{0}.{1}".format(cache_prefix, cache_name)
+        proxy_name = "{0}_proxy".format(name) if proxy_name is None else proxy_name
+        iscached = False
+        if 1 == len(c2pyt) or ind == 0:
+            decl = body = None
+            rtn = c2pyt[0].format(var=var, ctype=ct, cytype=cyt, pytype=pyt, nptype=npt)
+        elif ind == 1:
+            decl = "cdef {0} {1}".format(cyt, proxy_name)
+            body = c2pyt[1].format(var=var, ctype=ct, cytype=cyt, pytype=pyt, nptype=npt, 
+                                   proxy_name=proxy_name)
+            rtn = proxy_name
+        elif ind == 2:
+            decl = "cdef {0} {1}".format(cyt, proxy_name)
+            body = c2pyt[2].format(var=var, cache_name=cache_name, ctype=ct, cytype=cyt, 
+                                   pytype=pyt, proxy_name=proxy_name, nptype=npt)
+            rtn = cache_name
+            iscached = True
+        if body is not None and 'np.npy_intp' in body:
+            decl = decl or ''
+            decl += "\ncdef np.npy_intp {proxy_name}_shape[1]".format(proxy_name=proxy_name)
+        if decl is not None and body is not None:
+            decl += '\n'+"\n".join([l for l in body.splitlines() if l.startswith('cdef')])
+            body = "\n".join([l for l in body.splitlines() if not l.startswith('cdef')])
+        return decl, body, rtn, iscached
+
+    @_memoize
+    def cython_py2c(self, name, t, inst_name=None, proxy_name=None):
+        """Given a varibale name and type, returns cython code (declaration, body, 
+        and return statement) to convert the variable from Python to C/C++."""
+        t = self.canon(t)
+        if isinstance(t, basestring) or 0 == t[-1] or self.isrefinement(t[-1]):
+            last = ''
+        elif isinstance(t[-1], int):
+            last = ' [{0}]'.format(t[-1])
+        else:
+            last = ' ' + t[-1]
+        tkey = t
+        tinst = None
+        while tkey not in self._cython_py2c_conv and not isinstance(tkey, basestring):
+            tinst = tkey
+            tkey = tkey[1] if (0 < len(tkey) and self.isrefinement(tkey[1])) else tkey[0]
+        py2ct = self._cython_py2c_conv[tkey]
+        if py2ct is NotImplemented or py2ct is None:
+            raise NotImplementedError('conversion from Python to C/C++ for ' + \
+                                      t + 'has not been implemented.')
+        body_template, rtn_template = py2ct
+        ct = self.cython_ctype(t)
+        cyt = self.cython_cytype(t)
+        pyt = self.cython_pytype(t)
+        if self.istemplate(t) and 1 == len(self.template_types.get(tkey, ())):
+            npt = self.cython_nptype(t[1])
+        else:
+            npt = self.cython_nptype(t)
+        npct = self.cython_ctype(npt)
+        var = name if inst_name is None else "{0}.{1}".format(inst_name, name)
+        proxy_name = "{0}_proxy".format(name) if proxy_name is None else proxy_name
+        template_kw = dict(var=var, proxy_name=proxy_name, pytype=pyt, cytype=cyt, 
+                           ctype=ct, last=last, nptype=npt, npctype=npct)
+        nested = False
+        if self.isdependent(tkey):
+            tsig = [ts for ts in self.refined_types if ts[0] == tkey][0]
+            for ts, ti in zip(tsig[1:], tinst[1:]):
+                if isinstance(ts, basestring):
+                    template_kw[ts] = self.cython_ctype(ti)
+                else:
+                    template_kw[ti[0]] = ti[2]
+            vartype = self.refined_types[tsig]
+            if vartype in tsig[1:]:
+                vartype = tinst[tsig.index(vartype)][1]
+            if self.isrefinement(vartype):
+                nested = True
+                vdecl, vbody, vrtn = self.cython_py2c(var, vartype)
+                template_kw['var'] = vrtn
+        body_filled = body_template.format(**template_kw)
+        if rtn_template:
+            deft = ct if '{ctype}'in body_template else cyt
+            decl = "cdef {0} {1}".format(deft, proxy_name)
+            body = body_filled
+            rtn = rtn_template.format(**template_kw)
+            decl += '\n'+"\n".join([l for l in body.splitlines() if l.startswith('cdef')])
+            body = "\n".join([l for l in body.splitlines() if not l.startswith('cdef')])
+        else:
+            decl = body = None
+            rtn = body_filled
+        if nested:
+            decl = '' if decl is None else decl
+            vdecl = '' if vdecl is None else vdecl
+            decl = (vdecl + '\n' + decl).strip()
+            decl = None if 0 == len(decl) else decl
+            body = '' if body is None else body
+            vbody = '' if vbody is None else vbody
+            body = (vbody + '\n' + body).strip()
+            body = None if 0 == len(body) else body
+        return decl, body, rtn
+ 
 
-        _cython_ctypes[name] = cython_c_type
-        _cython_cytypes[name] = cython_cy_type
-        _cython_pytypes[name] = cython_py_type
-        _cython_cimports[name] = cython_cimport
-        _cython_cyimports[name] = cython_cyimport
-        _cython_pyimports[name] = cython_pyimport
 
-        _cython_c2py_conv[name] = cython_c2py
-        _cython_py2c_conv[name] = cython_py2c
-        _cython_classnames[name] = cython_template_class_name
+    ######################  Some utility functions for the typesystem #############
 
+    @_memoize
+    def _ensure_importable(self, x):
+        if isinstance(x, basestring) or x is None:
+            r = ((x,),)
+        elif isinstance(x, Iterable) and (isinstance(x[0], basestring) or x[0] is None):
+            r = (x,)
+        else:
+            r = x
+        return r
+
+    def register_class(self, name, template_args=None, cython_c_type=None, 
+                       cython_cimport=None, cython_cy_type=None, cython_py_type=None,
+                       cython_template_class_name=None, cython_cyimport=None, 
+                       cython_pyimport=None, cython_c2py=None, cython_py2c=None):
+        """Classes are user specified types.  This function will add a class to 
+        the type system so that it may be used normally with the rest of the 
+        type system.
+
+        """
+        # register the class name
+        isbase = True
+        if template_args is None: 
+            self.base_types.add(name)  # normal class        
+        elif isinstance(template_args, Sequence):
+            if 0 == len(template_args):
+                self.base_types.add(name)  # normal class
+            elif isinstance(template_args, basestring):
+                _raise_type_error(name)
+            else:
+                self.template_types[name] = tuple(template_args)  # templated class...
+                isbase = False
+
+        # Register with Cython C/C++ types
+        if (cython_c_type is not None) or (cython_cy_type is not None):
+            cython_cimport = self._ensure_importable(cython_cimport)
+            cython_cyimport = self._ensure_importable(cython_cyimport)
+            cython_pyimport = self._ensure_importable(cython_pyimport)
+
+            if isinstance(cython_c2py, basestring):
+                cython_c2py = (cython_c2py,)
+            cython_c2py = None if cython_c2py is None else tuple(cython_c2py)
+
+            if isinstance(cython_py2c, basestring):
+                cython_py2c = (cython_py2c, False)
+
+            self._cython_ctypes[name] = cython_c_type
+            self._cython_cytypes[name] = cython_cy_type
+            self._cython_pytypes[name] = cython_py_type
+            self._cython_cimports[name] = cython_cimport
+            self._cython_cyimports[name] = cython_cyimport
+            self._cython_pyimports[name] = cython_pyimport
+
+            self._cython_c2py_conv[name] = cython_c2py
+            self._cython_py2c_conv[name] = cython_py2c
+            self._cython_classnames[name] = cython_template_class_name
+
+    def deregister_class(self, name):
+        """This function will remove a previously registered class from the type system.
+        """
+        isbase = name in self.base_types
+        if not isbase and name not in self.template_types:
+            _raise_type_error(name)
 
-def deregister_class(name):
-    """This function will remove a previously registered class from the type system.
-    """
-    isbase = name in base_types
-    if not isbase and name not in template_types:
-        _raise_type_error(name)
+        if isbase:
+            self.base_types.remove(name)
+        else:
+            self.template_types.pop(name, None)
 
-    if isbase:
-        base_types.remove(name)
-    else:
-        template_types.pop(name, None)
-
-    _cython_ctypes.pop(name, None)
-    _cython_cytypes.pop(name, None)
-    _cython_pytypes.pop(name, None)
-    _cython_cimports.pop(name, None)
-    _cython_cyimports.pop(name, None)
-    _cython_pyimports.pop(name, None)
-
-    _cython_c2py_conv.pop(name, None)
-    _cython_py2c_conv.pop(name, None)
-    _cython_classnames.pop(name, None)
-
-    # clear all caches
-    funcs = [isdependent, isrefinement, _resolve_dependent_type, canon, 
-             cython_ctype, cython_cimport_tuples, cython_cimports, _fill_cycyt,
-             cython_cytype, _fill_cypyt, cython_pytype, cython_c2py, cython_py2c]
-    for f in funcs:
-        f.cache.clear()
-
-
-def register_refinement(name, refinementof, cython_cimport=None, cython_cyimport=None, 
-                        cython_pyimport=None, cython_c2py=None, cython_py2c=None):
-    """This function will add a refinement to the type system so that it may be used 
-    normally with the rest of the type system.
-    """
-    refined_types[name] = refinementof
+        self._cython_ctypes.pop(name, None)
+        self._cython_cytypes.pop(name, None)
+        self._cython_pytypes.pop(name, None)
+        self._cython_cimports.pop(name, None)
+        self._cython_cyimports.pop(name, None)
+        self._cython_pyimports.pop(name, None)
+
+        self._cython_c2py_conv.pop(name, None)
+        self._cython_py2c_conv.pop(name, None)
+        self._cython_classnames.pop(name, None)
+
+    def register_refinement(self, name, refinementof, cython_cimport=None, cython_cyimport=None, 
+                            cython_pyimport=None, cython_c2py=None, cython_py2c=None):
+        """This function will add a refinement to the type system so that it may be used 
+        normally with the rest of the type system.
+        """
+        self.refined_types[name] = refinementof
 
-    cyci = _ensure_importable(cython_cimport)
-    _cython_cimports[name] = _cython_cimports[name] = cyci
+        cyci = self._ensure_importable(cython_cimport)
+        self._cython_cimports[name] = self._cython_cimports[name] = cyci
 
-    cycyi = _ensure_importable(cython_cyimport)
-    _cython_cyimports[name] = _cython_cyimports[name] = cycyi
+        cycyi = self._ensure_importable(cython_cyimport)
+        self._cython_cyimports[name] = self._cython_cyimports[name] = cycyi
 
-    cypyi = _ensure_importable(cython_pyimport)
-    _cython_pyimports[name] = _cython_pyimports[name] = cypyi
+        cypyi = self._ensure_importable(cython_pyimport)
+        self._cython_pyimports[name] = self._cython_pyimports[name] = cypyi
 
-    if isinstance(cython_c2py, basestring):
-        cython_c2py = (cython_c2py,)
-    cython_c2py = None if cython_c2py is None else tuple(cython_c2py)
-    if cython_c2py is not None:
-        _cython_c2py_conv[name] = cython_c2py
+        if isinstance(cython_c2py, basestring):
+            cython_c2py = (cython_c2py,)
+        cython_c2py = None if cython_c2py is None else tuple(cython_c2py)
+        if cython_c2py is not None:
+            self._cython_c2py_conv[name] = cython_c2py
 
-    if isinstance(cython_py2c, basestring):
-        cython_py2c = (cython_py2c, False)
-    if cython_py2c is not None:
-        _cython_py2c_conv[name] = cython_py2c
+        if isinstance(cython_py2c, basestring):
+            cython_py2c = (cython_py2c, False)
+        if cython_py2c is not None:
+            self._cython_py2c_conv[name] = cython_py2c
+
+    def deregister_refinement(self, name):
+        """This function will remove a previously registered refinement from the type
+        system.
+        """
+        self.refined_types.pop(name, None)
+        self._cython_c2py_conv.pop(name, None)
+        self._cython_py2c_conv.pop(name, None)
+        self._cython_cimports.pop(name, None)
+        self._cython_cyimports.pop(name, None)
+        self._cython_pyimports.pop(name, None)
+
+    def register_specialization(self, t, cython_c_type=None, cython_cy_type=None, 
+                                cython_py_type=None, cython_cimport=None, 
+                                cython_cyimport=None, cython_pyimport=None):
+        """This function will add a template specialization so that it may be used 
+        normally with the rest of the type system.
+        """
+        t = self.canon(t)
+        if cython_c_type is not None:
+            self._cython_ctypes[t] = cython_c_type
+        if cython_cy_type is not None:
+            self._cython_cytypes[t] = cython_cy_type
+        if cython_py_type is not None:
+            self._cython_pytypes[t] = cython_py_type
+        if cython_cimport is not None:
+            self._cython_cimports[t] = cython_cimport
+        if cython_cyimport is not None:
+            self._cython_cyimports[t] = cython_cyimport
+        if cython_pyimport is not None:
+            self._cython_pyimports[t] = cython_pyimport
+
+    def deregister_specialization(self, t):
+        """This function will remove previously registered template specialization."""
+        t = self.canon(t)
+        self._cython_ctypes.pop(t, None)
+        self._cython_cytypes.pop(t, None)
+        self._cython_pytypes.pop(t, None)
+        self._cython_cimports.pop(t, None)
+        self._cython_cyimports.pop(t, None)
+        self._cython_pyimports.pop(t, None)
+
+    def register_numpy_dtype(self, t, cython_cimport=None, cython_cyimport=None, cython_pyimport=None):
+        """This function will add a type to the system as numpy dtype that lives in
+        the stlcontainers module.
+        """
+        t = self.canon(t)
+        if t in self._numpy_types:
+            return
+        varname = self.cython_variablename(t)[1]
+        self._numpy_types[t] = '{stlcontainers}xd_' + varname + '.num'
+        self.type_aliases[self._numpy_types[t]] = t
+        self.type_aliases['xd_' + varname] = t
+        self.type_aliases['xd_' + varname + '.num'] = t
+        self.type_aliases['{stlcontainers}xd_' + varname] = t
+        self.type_aliases['{stlcontainers}xd_' + varname + '.num'] = t
+        if cython_cimport is not None:
+            x = self._ensure_importable(self._cython_cimports._d.get(t, None))
+            x = x + self._ensure_importable(cython_cimport)
+            self._cython_cimports[t] = x
+        # cython imports
+        x = (('{stlcontainers}',),)
+        x = x + self._ensure_importable(self._cython_cyimports._d.get(t, None))
+        x = x + self._ensure_importable(cython_cyimport)
+        self._cython_cyimports[t] = x
+        # python imports
+        x = (('{stlcontainers}',),)
+        x = x + self._ensure_importable(self._cython_pyimports._d.get(t, None))
+        x = x + self._ensure_importable(cython_pyimport)
+        self._cython_pyimports[t] = x
+
+    #################### Type system helpers ###################################
+
+    def _registries(self):
+        """The registries as (name, raw dict) pairs."""
+        return [(name.lstrip('_'), dict.fromkeys(r._d, True) if isinstance(r, Set)
+                 else r._d) for name, r in
+                [(name, getattr(self, name)) for name in _REGISTRIES]]
+
+    def fingerprint(self, names=None):
+        """Computes a digest of the type system registrations.  Code generated
+        for a set of types is the same as long as their fingerprint is.
+
+        Parameters
+        ----------
+        names : set of str, optional
+            Type names to consider.  Registrations for types which are or contain
+            these names are included, as are those of any types which they in turn
+            refer to.  If None, all registrations are included.
+
+        Returns
+        -------
+        fp : str
+            Hex digest.
+
+        """
+        registries = self._registries()
+        entries = []
+        if names is None:
+            for rname, r in registries:
+                entries += [(rname, repr(k), repr(v)) for k, v in r.items()]
+        else:
+            names = set(names)
+            seen = set()
+            nnames = -1
+            while nnames != len(names):
+                nnames = len(names)
+                for rname, r in registries:
+                    for k, v in r.items():
+                        if (rname, k) in seen or not (_typenames(k, set()) & names):
+                            continue
+                        seen.add((rname, k))
+                        entries.append((rname, repr(k), repr(v)))
+                        _typenames(v, names)
+        entries.sort()
+        entries.append((self.extra_types, self.stlcontainers))
+        return md5(repr(entries)).hexdigest()
+
+    def snapshot(self, memo=False):
+        """Returns the state of the type system, i.e. the contents of all of the
+        registries and the extra_types and stlcontainers settings, as a dict of
+        plain, picklable data.  This may be saved and handed to restore() later,
+        even by another process, in place of registering everything anew.
+
+        Parameters
+        ----------
+        memo : bool, optional
+            Whether to include the memoized results, along with their dependencies
+            and the interned types, so that restoring starts warm.
+
+        Returns
+        -------
+        snap : dict
+
+        """
+        snap = {'version': SNAPSHOT_VERSION, 'extra_types': self.extra_types,
+                'stlcontainers': self.stlcontainers, 'memo': None, 'interned': None,
+                'registries': dict([(name.lstrip('_'), set(r._d) if isinstance(r, Set)
+                                     else dict(r._d)) for name, r in
+                                    [(name, getattr(self, name))
+                                     for name in _REGISTRIES]])}
+        if memo:
+            snap['memo'] = memos = {}
+            for slot, fname in enumerate(_memoized):
+                m = self._memos[slot] or self._inherit_memo(slot)
+                entries = memos[fname] = []
+                for key, value in m.cache.items():
+                    deps = []
+                    for dep in m.deps.get(key, ()):
+                        if len(dep) == 1:
+                            deps.append(dep)
+                        elif dep[0] not in _REGISTRIES:
+                            break  # on a registry made elsewhere, cannot be kept
+                        elif dep[1] is _ALL:
+                            deps.append((dep[0].lstrip('_'), False))
+                        else:
+                            deps.append((dep[0].lstrip('_'), True, dep[1]))
+                    else:
+                        entries.append((key, value, deps))
+            snap['interned'] = list(_interned)
+        return snap
+
+    def restore(self, snap):
+        """Restores the state of the type system from a snapshot(), replacing the
+        contents of all of the registries and the memoized results.  The registries
+        themselves stay the same objects.
+
+        Parameters
+        ----------
+        snap : dict
+            A snapshot, as returned by snapshot().
+
+        Returns
+        -------
+        restored : bool
+            False, with nothing changed, if the snapshot is of another version.
+
+        """
+        if snap.get('version', None) != SNAPSHOT_VERSION:
+            return False
+        self._detach()
+        self.extra_types = snap['extra_types']
+        self.stlcontainers = snap['stlcontainers']
+        names = dict([(name.lstrip('_'), name) for name in _REGISTRIES])
+        for name, value in snap['registries'].items():
+            getattr(self, names[name])._replace(value)
+        self.clearmemo()
+        if snap['memo'] is None:
+            return True
+        for t in snap['interned']:
+            _interned.setdefault(t, t)
+        slots = dict([(fname, slot) for slot, fname in enumerate(_memoized)])
+        dependents = self._dependents
+        for fname, entries in snap['memo'].items():
+            if fname not in slots:
+                continue
+            slot = slots[fname]
+            m = self._memos[slot]
+            for key, value, deps in entries:
+                if m.maxsize is not None and m.maxsize <= len(m.cache):
+                    break
+                deps = set([dep if len(dep) == 1 else (names[dep[0]], dep[2])
+                            if dep[1] else (names[dep[0]], _ALL) for dep in deps])
+                m.cache[key] = value
+                m.deps[key] = deps
+                for dep in deps:
+                    dependents.setdefault(dep, set()).add((slot, key))
+        return True
 
+    def clearmemo(self):
+        """Clears all of the memoized results.  Interned types are kept, since
+        they may be held anywhere."""
+        with self._lock:
+            self._memos[:] = [memo or _Memo(self._maxsize) for memo in self._memos]
+            self._parent = None
+            for memo in self._memos:
+                memo.cache.clear()
+                memo.deps.clear()
+            self._dependents.clear()
+
+    def set_memo_maxsize(self, maxsize=None):
+        """Bounds the number of entries memoized by each method, evicting the least
+        recently used entries beyond that.  None means unbounded, which is the
+        default.  Forks start out with the bound of their parent.
+        """
+        with self._lock:
+            self._maxsize = maxsize
+            for memo in self._memos:
+                if memo is not None:
+                    memo.resize(maxsize)
+
+    def memo_stats(self):
+        """Returns a dict mapping the names of memoized methods to dicts of their
+        numbers of hits, misses, bypasses (calls with unhashable arguments),
+        evictions (by the size bound), invalidations (by changes to the registries
+        or settings), and current and maximum cache sizes."""
+        stats = {}
+        for fname, memo in zip(_memoized, self._memos):
+            memo = memo or _Memo(self._maxsize)
+            hits, misses, bypasses, evictions, invalidations = memo.counts
+            stats[fname] = {'hits': hits, 'misses': misses, 'bypasses': bypasses,
+                            'evictions': evictions, 'invalidations': invalidations,
+                            'size': len(memo.cache), 'maxsize': memo.maxsize}
+        return stats
+
+    def memo_cache(self, fname):
+        """Returns the cache of the memoized method called fname, mapping argument
+        tuples to results."""
+        slot = _memoized.index(fname)
+        return (self._memos[slot] or self._inherit_memo(slot)).cache
+
+    def clear_memo_stats(self):
+        """Resets the counts of memoization hits, misses, bypasses, evictions and
+        invalidations."""
+        for memo in self._memos:
+            if memo is not None:
+                memo.counts[:] = [0, 0, 0, 0, 0]
+
+    def memo_summary(self, stats=None):
+        """Returns a table of the memoization statistics of the methods which
+        have been called, busiest first, as a string."""
+        stats = self.memo_stats() if stats is None else stats
+        lines = ["{0:<26} {1:>9} {2:>9} {3:>9} {4:>9} {5:>7} {6:>7} {7:>7}".format(
+                 "function", "calls", "hits", "misses", "bypasses", "hit %",
+                 "invalid", "size")]
+        total = dict([(k, 0) for k in ('hits', 'misses', 'bypasses',
+                                       'invalidations', 'size')])
+        for name, st in sorted(stats.items(), key=lambda x: (-x[1]['hits'] -
+                               x[1]['misses'] - x[1]['bypasses'], x[0])):
+            if st['hits'] + st['misses'] + st['bypasses'] == 0:
+                continue
+            for k in total:
+                total[k] += st[k]
+            lines.append(_memo_line(name, st))
+        lines.append(_memo_line("total", total))
+        ntypes, size = intern_stats()
+        lines.append("")
+        lines.append("interned types: {0}, {1:.1f} KiB".format(ntypes, size / 1024.0))
+        return "\n".join(lines)
+
+
+class _DefaultTypeSystem(TypeSystem):
+    """The type system of threads which have not entered another one.  Its
+    registries are the module-level ones and its settings are the EXTRA_TYPES and
+    STLCONTAINERS module variables."""
+
+    def __init__(self):
+        global _default_config
+        self._lock = threading.Lock()
+        for name in _REGISTRIES:
+            registry = globals()[name]
+            registry._adopt(self, name)
+            setattr(self, name, registry)
+        self._config = _default_config = (EXTRA_TYPES, STLCONTAINERS)
+        self._maxsize = None
+        self._memos = [_Memo() for name in _memoized]
+        self._parent = None
+        self._forks = weakref.WeakSet()
+        self._dependents = {}
+
+    @property
+    def extra_types(self):
+        return EXTRA_TYPES
+
+    @extra_types.setter
+    def extra_types(self, value):
+        global EXTRA_TYPES
+        EXTRA_TYPES = value
+        self._set_config(EXTRA_TYPES, STLCONTAINERS)
+
+    @property
+    def stlcontainers(self):
+        return STLCONTAINERS
+
+    @stlcontainers.setter
+    def stlcontainers(self, value):
+        global STLCONTAINERS
+        STLCONTAINERS = value
+        self._set_config(EXTRA_TYPES, STLCONTAINERS)
+
+    def _set_config(self, extra_types, stlcontainers):
+        global _default_config
+        TypeSystem._set_config(self, extra_types, stlcontainers)
+        _default_config = self._config
+
+
+def intern_stats():
+    """Returns the number of interned types and the memory that they and the
+    intern table take up [bytes], as a (count, size) tuple.  Strings and
+    numbers within the types are not counted, since they are shared."""
+    return len(_interned), sys.getsizeof(_interned) + sum(map(sys.getsizeof,
+                                                               _interned))
+
+def _memo_line(name, st):
+    calls = st['hits'] + st['misses'] + st['bypasses']
+    rate = 100.0 * st['hits'] / calls if 0 < calls else float('nan')
+    return "{0:<26} {1:>9} {2:>9} {3:>9} {4:>9} {5:>7.1f} {6:>7} {7:>7}".format(
+           name, calls, st['hits'], st['misses'], st['bypasses'], rate,
+           st['invalidations'], st['size'])
+
+
+_default = _DefaultTypeSystem()
+"""The default type system."""
+
+_builtin = _default.fork()
+"""A pristine fork of the default type system, with only the built in types,
+that new type systems start out from."""
+
+_state = _State()
+
+def current():
+    """Returns the current type system of this thread: the one last entered in a
+    with-statement and not yet exited, or else the default one."""
+    return _state.ts
+
+def _delegate(name):
+    """Returns a module-level function which calls the TypeSystem method called 
+    name on the current type system."""
+    method = TypeSystem.__dict__[name]
+    def f(*args, **kwargs):
+        if kwargs:
+            return method(_state.ts, *args, **kwargs)
+        return method(_state.ts, *args)
+    return functools.update_wrapper(f, method)
+
+istemplate = _delegate('istemplate')
+humanname = _delegate('humanname')
+isdependent = _delegate('isdependent')
+isrefinement = _delegate('isrefinement')
+canon = _delegate('canon')
+cython_ctype = _delegate('cython_ctype')
+_cython_cimport_tuples = _delegate('_cython_cimport_tuples')
+cython_cimports = _delegate('cython_cimports')
+_cython_import_tuples = _delegate('_cython_import_tuples')
+cython_imports = _delegate('cython_imports')
+cython_functionname = _delegate('cython_functionname')
+cython_variablename = _delegate('cython_variablename')
+cython_classname = _delegate('cython_classname')
+cython_cytype = _delegate('cython_cytype')
+cython_pytype = _delegate('cython_pytype')
+cython_nptype = _delegate('cython_nptype')
+cython_c2py = _delegate('cython_c2py')
+cython_py2c = _delegate('cython_py2c')
+register_class = _delegate('register_class')
+deregister_class = _delegate('deregister_class')
+register_refinement = _delegate('register_refinement')
+deregister_refinement = _delegate('deregister_refinement')
+register_specialization = _delegate('register_specialization')
+deregister_specialization = _delegate('deregister_specialization')
+register_numpy_dtype = _delegate('register_numpy_dtype')
+fingerprint = _delegate('fingerprint')
+snapshot = _delegate('snapshot')
+restore = _delegate('restore')
+clearmemo = _delegate('clearmemo')
+set_memo_maxsize = _delegate('set_memo_maxsize')
+memo_stats = _delegate('memo_stats')
+memo_cache = _delegate('memo_cache')
+clear_memo_stats = _delegate('clear_memo_stats')
+memo_summary = _delegate('memo_summary')
+swap_stlcontainers = _delegate('swap_stlcontainers')
+
+# These are called for every type that code generation meets, so they are spelled 
+# out rather than delegated, to save a call.
+
+def cython_cimport_tuples(t, seen=None, inc=frozenset(['c', 'cy'])):
+    tups = _cython_cimport_tuples(t, frozenset(inc))
+    if seen is None:
+        return set(tups)
+    seen.update(tups)
+    seen -= set((None, (None,)))
+    return seen
+
+def cython_import_tuples(t, seen=None):
+    tups = _cython_import_tuples(t)
+    if seen is None:
+        return set(tups)
+    seen.update(tups)
+    seen -= set((None, (None,)))
+    return seen
+
+for f in (cython_cimport_tuples, cython_import_tuples):
+    f.__doc__ = TypeSystem.__dict__[f.__name__].__doc__
+del f
 
-def deregister_refinement(name):
-    """This function will remove a previously registered refinement from the type
-    system.
-    """
-    refined_types.pop(name, None)
-    _cython_c2py_conv.pop(name, None)
-    _cython_py2c_conv.pop(name, None)
-    _cython_cimports.pop(name, None)
-    _cython_cyimports.pop(name, None)
-    _cython_pyimports.pop(name, None)
-
-
-def register_specialization(t, cython_c_type=None, cython_cy_type=None, 
-                            cython_py_type=None, cython_cimport=None, 
-                            cython_cyimport=None, cython_pyimport=None):
-    """This function will add a template specialization so that it may be used 
-    normally with the rest of the type system.
-    """
-    t = canon(t)
-    if cython_c_type is not None:
-        _cython_ctypes[t] = cython_c_type
-    if cython_cy_type is not None:
-        _cython_cytypes[t] = cython_cy_type
-    if cython_py_type is not None:
-        _cython_pytypes[t] = cython_py_type
-    if cython_cimport is not None:
-        _cython_cimports[t] = cython_cimport
-    if cython_cyimport is not None:
-        _cython_cyimports[t] = cython_cyimport
-    if cython_pyimport is not None:
-        _cython_pyimports[t] = cython_pyimport
-
-def deregister_specialization(t):
-    """This function will remove previously registered template specialization."""
-    t = canon(t)
-    _cython_ctypes.pop(t, None)
-    _cython_cytypes.pop(t, None)
-    _cython_pytypes.pop(t, None)
-    _cython_cimports.pop(t, None)
-    _cython_cyimports.pop(t, None)
-    _cython_pyimports.pop(t, None)
-
-
-def register_numpy_dtype(t, cython_cimport=None, cython_cyimport=None, cython_pyimport=None):
-    """This function will add a type to the system as numpy dtype that lives in
-    the stlcontainers module.
-    """
-    t = canon(t)
-    if t in _numpy_types:
-        return
-    varname = cython_variablename(t)[1]
-    _numpy_types[t] = '{stlcontainers}xd_' + varname + '.num'
-    type_aliases[_numpy_types[t]] = t
-    type_aliases['xd_' + varname] = t
-    type_aliases['xd_' + varname + '.num'] = t
-    type_aliases['{stlcontainers}xd_' + varname] = t
-    type_aliases['{stlcontainers}xd_' + varname + '.num'] = t
-    if cython_cimport is not None:
-        x = _ensure_importable(_cython_cimports._d.get(t, None))
-        x = x + _ensure_importable(cython_cimport)
-        _cython_cimports[t] = x
-    # cython imports
-    x = (('{stlcontainers}',),)
-    x = x + _ensure_importable(_cython_cyimports._d.get(t, None))
-    x = x + _ensure_importable(cython_cyimport)
-    _cython_cyimports[t] = x
-    # python imports
-    x = (('{stlcontainers}',),)
-    x = x + _ensure_importable(_cython_pyimports._d.get(t, None))
-    x = x + _ensure_importable(cython_pyimport)
-    _cython_pyimports[t] = x
-
-
-#################### Type system helpers #######################################
-
-def clearmemo():
-    """Clears all function memoizations."""
-    for x in globals().itervalues():
-        if callable(x) and hasattr(x, 'cache'):
-            x.cache.clear()
-
-@contextmanager
-def swap_stlcontainers(s):
-    """A context manager for temporarily swapping out the STLCONTAINERS value
-    with a new value and replacing the original value before exiting."""
-    global STLCONTAINERS
-    old = STLCONTAINERS
-    STLCONTAINERS = s
-    clearmemo()
-    yield
-    clearmemo()
-    STLCONTAINERS = old
@@ -1,6 +1,13 @@
 """Helper functions for bright API generation."""
 
 import os
+import time
+import tempfile
+from hashlib import md5
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 
 def indent(s, n=4, join=True):
     """Indents all lines in the string or list s by n spaces."""
@@ -41,7 +48,10 @@ def expand_default_args(methods):
 def newoverwrite(s, filename):
     """Useful for not forcing re-compiles and thus playing nicely with the 
     build system.  This is acomplished by not writing the file if the existsing
-    contents are exactly the same as what would be written out.
+    contents are exactly the same as what would be written out.  Whether they 
+    are is told from the manifest without opening the file, unless it has 
+    changed since it was recorded.  The file is replaced atomically, see 
+    Emitter.
 
     Parameters
     ----------
@@ -51,13 +61,10 @@ def newoverwrite(s, filename):
         Path to file.
 
     """
-    if os.path.isfile(filename):
-        with open(filename, 'r') as f:
-            old = f.read()
-        if s == old:
-            return
-    with open(filename, 'w') as f:
-        f.write(s)
+    if manifest.check(filename, len(s)) == md5(s).hexdigest():
+        return
+    with Emitter(filename) as e:
+        e.write(s)
 
 def newcopyover(f1, f2):
     """Useful for not forcing re-compiles and thus playing nicely with the 
@@ -80,8 +87,310 @@ def newcopyover(f1, f2):
 def ensuredirs(f):
     """For a file path, ensure that its directory path exists."""
     d = os.path.split(f)[0]
-    if not os.path.isdir(d):
-        os.makedirs(d)
+    if len(d) > 0 and not os.path.isdir(d):
+        try:
+            os.makedirs(d)
+        except OSError:
+            if not os.path.isdir(d):  # may have been made concurrently
+                raise
+
+def atomicwrite(s, filename):
+    """Writes a string to a file such that readers (and later runs) see 
+    either the old contents or all of the new contents, never a partial 
+    file.  The string is written to a temporary file in the same directory 
+    which is then renamed over the target.
+
+    Parameters
+    ----------
+    s : str
+        string contents of file
+    filename : str
+        Path to file.
+
+    """
+    ensuredirs(filename)
+    d = os.path.split(filename)[0] or '.'
+    f = tempfile.NamedTemporaryFile(dir=d, prefix='.' + os.path.basename(filename), 
+                                    suffix='.tmp', delete=False)
+    try:
+        with f:
+            f.write(s)
+        os.rename(f.name, filename)
+    except:
+        if os.path.exists(f.name):
+            os.remove(f.name)
+        raise
+
+
+# the mode of new files, which temporary files are given before being renamed
+_umask = os.umask(0)
+os.umask(_umask)
+
+def filedigest(filename, blocksize=1 << 16):
+    """Computes the md5 hex digest of the contents of a file, reading it in 
+    blocks rather than all at once."""
+    h = md5()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), ''):
+            h.update(block)
+    return h.hexdigest()
+
+def lruevict(entries, maxsize=None, maxage=None, bound='size bound'):
+    """Picks the files to evict from a store whose files are touched whenever 
+    they are used, so that their modification times are the times they were 
+    last used.  Files not used within maxage are evicted, then the least 
+    recently used ones until the rest fit within maxsize.
+
+    Parameters
+    ----------
+    entries : list of (mtime, size, key, path) tuples
+        The files of the store.
+    maxsize : int, optional
+        Maximum total size of the files which are kept [bytes].
+    maxage : float, optional
+        Maximum time since a file was last used [seconds].
+    bound : str, optional
+        The reason given for the files evicted by the size bound.
+
+    Returns
+    -------
+    evicted : list of (key, size, reason, path) tuples
+        The files to evict, which are left for the caller to remove.
+
+    """
+    now = time.time()
+    evicted = []
+    live = []
+    for mtime, size, key, path in sorted(entries):
+        if maxage is not None and mtime < now - maxage:
+            reason = 'not used in {0:.0f} days'.format((now - mtime) / 86400.0)
+            evicted.append((key, size, reason, path))
+        else:
+            live.append((mtime, size, key, path))
+    if maxsize is not None:
+        total = sum([size for mtime, size, key, path in live])
+        for mtime, size, key, path in live:
+            if total <= maxsize:
+                break
+            total -= size
+            evicted.append((key, size, bound, path))
+    return evicted
+
+class Emitter(object):
+    """A file-like writer of generated sources which streams the chunks that 
+    are written to it into a temporary file next to the target, hashing them 
+    along the way.  Committing then replaces the target with the temporary 
+    file, only if their contents differ, as in newoverwrite().  The existing 
+    target is compared by its digest in the manifest, and read only if it has 
+    no up to date record and the same size.  Readers see either the old or 
+    the new contents, never a partial file.
+
+    Used in a with-statement, the emitter is committed on leaving the block, 
+    or discarded if it raised.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the target file.
+
+    """
+
+    def __init__(self, filename):
+        ensuredirs(filename)
+        self.filename = filename
+        d = os.path.split(filename)[0] or '.'
+        self._f = tempfile.NamedTemporaryFile(dir=d, suffix='.tmp', delete=False,
+                                              prefix='.' + os.path.basename(filename))
+        self._md5 = md5()
+        self.size = 0
+        self.digest = None
+
+    def write(self, s):
+        """Writes a chunk."""
+        self._f.write(s)
+        self._md5.update(s)
+        self.size += len(s)
+
+    def writelines(self, lines):
+        """Writes each string of an iterable in turn."""
+        for s in lines:
+            self.write(s)
+
+    def close(self):
+        """Finishes writing, without touching the target yet.  This releases the
+        temporary file handle, so that many emitters may wait to be committed."""
+        if self.digest is None:
+            self._f.close()
+            self.digest = self._md5.hexdigest()
+
+    def commit(self):
+        """Replaces the target with what has been written, unless the contents 
+        are the same.  Returns whether the target was replaced."""
+        self.close()
+        tmpname = self._f.name
+        try:
+            if manifest.check(self.filename, self.size) == self.digest:
+                os.remove(tmpname)
+                return False
+            if os.path.isfile(self.filename):
+                os.chmod(tmpname, os.stat(self.filename).st_mode & 0o7777)
+            else:
+                os.chmod(tmpname, 0o666 & ~_umask)
+            os.rename(tmpname, self.filename)
+        except:
+            self.discard()
+            raise
+        manifest.record(self.filename, self.digest)
+        return True
+
+    def discard(self):
+        """Throws away what has been written, leaving the target as it was."""
+        self._f.close()
+        if os.path.exists(self._f.name):
+            os.remove(self._f.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+
+
+class Manifest(object):
+    """A record of the size, md5 digest and mtime of each generated file, and of
+    when it was recorded, so that whether a file still holds some contents is 
+    told from its stat alone.  Files whose size or mtime differ from their 
+    record, or which were recorded within the timestamp resolution of their 
+    mtime, are read and hashed again, and those whose contents differ were
+    modified since they were written; their paths are collected in the 
+    modified list.  Confirming the contents of a file renews its record, so
+    that it is hashed again only once.
+
+    Parameters
+    ----------
+    filename : str, optional
+        Path to the file that the manifest is loaded from and dumped to.  If 
+        None, it is only kept in memory.
+
+    """
+
+    def __init__(self, filename=None):
+        self.entries = {}
+        self.modified = []
+        self._updates = {}
+        self.load(filename)
+
+    def load(self, filename):
+        """Replaces the records with those in a manifest file, if it exists."""
+        self.filename = filename
+        self.entries = {}
+        if filename is not None and os.path.isfile(filename):
+            with open(filename, 'rb') as f:
+                self.entries = pickle.load(f)
+
+    def dump(self):
+        """Writes out the records, dropping those of files which are gone."""
+        if self.filename is None:
+            return
+        self.entries = dict([(k, v) for k, v in self.entries.items() 
+                             if os.path.isfile(k)])
+        atomicwrite(pickle.dumps(self.entries, pickle.HIGHEST_PROTOCOL), 
+                    self.filename)
+
+    def record(self, filename, digest, st=None):
+        """Records that a file holds contents with the given digest."""
+        st = os.stat(filename) if st is None else st
+        key = os.path.abspath(filename)
+        self.entries[key] = self._updates[key] = (st.st_size, digest, st.st_mtime,
+                                                  time.time())
+
+    def check(self, filename, size=None):
+        """Returns the digest of the contents of a file, from its record if its
+        size and mtime match, or else by reading it.
+
+        Parameters
+        ----------
+        filename : str
+            Path to file.
+        size : int, optional
+            Size of the contents that the file is to be compared with.  A file 
+            of another size which has no record is not read.
+
+        Returns
+        -------
+        digest : str or None
+            Hex digest, or None if there is no such file or if it was not read.
+
+        """
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        key = os.path.abspath(filename)
+        entry = self.entries.get(key, None)
+        # a file modified within the timestamp resolution of when it was 
+        # recorded may have changed again without changing its stat, so its 
+        # record is only trusted for files modified well before then
+        if entry is not None and entry[0] == st.st_size and \
+           entry[2] == st.st_mtime and entry[2] < entry[3] - 2.0:
+            return entry[1]
+        if entry is None and size is not None and size != st.st_size:
+            return None
+        digest = filedigest(filename)
+        if entry is not None and entry[1] != digest and key not in self.modified:
+            self.modified.append(key)
+        if entry is not None and entry[:3] == (st.st_size, digest, st.st_mtime):
+            # confirmed, so only the record time is refreshed, which makes the
+            # record trusted from now on unless the file is still too new
+            now = time.time()
+            if st.st_mtime < now - 2.0:
+                self.entries[key] = self._updates[key] = entry[:3] + (now,)
+        else:
+            self.record(filename, digest, st)
+        return digest
+
+    def ismodified(self, filename):
+        """Tests if a file was modified since it was recorded."""
+        self.check(filename)
+        return os.path.abspath(filename) in self.modified
+
+    def pop_updates(self):
+        """Removes and returns the records made and the modified files found 
+        since the last call, e.g. for sending them from a worker process back 
+        to the main one, see merge()."""
+        updates = (self._updates, self.modified)
+        self._updates = {}
+        self.modified = []
+        return updates
+
+    def merge(self, updates):
+        """Adds the records and modified files returned by pop_updates()."""
+        entries, modified = updates
+        self.entries.update(entries)
+        self._updates.update(entries)
+        self.modified += [m for m in modified if m not in self.modified]
+
+manifest = Manifest()
+"""The manifest of the generated files, which xdress loads from and dumps to
+the build directory."""
+
+
+def stablerepr(x):
+    """A repr() of nested dicts, sets, and sequences which is independent of
+    the ordering of dicts and sets, and so suitable for hashing."""
+    if isinstance(x, dict):
+        items = sorted([(stablerepr(k), stablerepr(v)) for k, v in x.items()])
+        return '{' + ', '.join([k + ': ' + v for k, v in items]) + '}'
+    elif isinstance(x, (set, frozenset)):
+        return 'set([' + ', '.join(sorted([stablerepr(y) for y in x])) + '])'
+    elif isinstance(x, (list, tuple)):
+        return '(' + ', '.join([stablerepr(y) for y in x]) + ',)'
+    else:
+        return repr(x)
 
 
 def isclassdesc(desc):
@@ -0,0 +1,4 @@
+"""Version information for xdress.  This is read by configure.py as well, so 
+it must not import anything."""
+
+xdress_version = '0.1-dev'